@@ -94,6 +94,46 @@ DATABASES = {
         conn_max_age=600
     )
 }
+# SQLite: espera hasta 20 s el bloqueo de escritura en lugar de fallar con
+# "database is locked" (los préstamos abren con BEGIN IMMEDIATE, ver circulacion.py).
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({'timeout': 20})
+
+
+# CACHÉ DE RESPUESTAS DEL CATÁLOGO (ver inventario/versiones.py)
+# Por defecto en memoria de cada proceso (LRU con MAX_ENTRIES).
+# Con CATALOGO_CACHE_DIR se usa una carpeta compartida entre workers (poda con CULL_FREQUENCY).
+CATALOGO_CACHE_DIR = os.environ.get('CATALOGO_CACHE_DIR')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogo': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if CATALOGO_CACHE_DIR
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': CATALOGO_CACHE_DIR or 'catalogo',
+        'TIMEOUT': int(os.environ.get('CATALOGO_CACHE_TIMEOUT', 3600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CATALOGO_CACHE_MAX_ENTRIES', 100)),
+            'CULL_FREQUENCY': int(os.environ.get('CATALOGO_CACHE_CULL_FREQUENCY', 3)),
+        },
+    },
+}
+# Respuestas más grandes que esto no se guardan (bytes)
+CATALOGO_CACHE_MAX_BYTES = int(os.environ.get('CATALOGO_CACHE_MAX_BYTES', 2 * 1024 * 1024))
+
+# BARRIDO DE PRÉSTAMOS VENCIDOS (ver inventario/vencimientos.py)
+# Segundos entre barridos dentro de cada proceso; 0 (por defecto) lo desactiva. Solo lo
+# activa gunicorn.conf.py para el servidor, así migrate, test, shell y los scripts no
+# arrancan el hilo. Con `manage.py marcar_atrasados` en cron se puede dejar en 0.
+BARRIDO_ATRASADOS_INTERVALO = int(os.environ.get('BARRIDO_ATRASADOS_INTERVALO', 0))
+
+# STREAM DE EVENTOS DEL KIOSCO (ver inventario/eventos.py y gunicorn.conf.py)
+# Streams SSE abiertos a la vez en cada proceso. Cada uno ocupa un hilo de gunicorn:
+# tiene que quedar por debajo de GUNICORN_THREADS para que el resto de la API siga atendiendo.
+EVENTOS_STREAMS_POR_PROCESO = int(os.environ.get('EVENTOS_STREAMS_POR_PROCESO', 8))
 
 
 # Password validation
@@ -21,7 +21,7 @@ from inventario.views import (
     LibroViewSet, TrabajoGradoViewSet, DashboardStatsView, 
     HistorialView, RestaurarRegistroView, SiguienteCodigoView, ListaSeccionesView,
     PerfilUsuarioView, ActivoViewSet, EstudianteViewSet, PrestamoViewSet,
-    activos_prestados_publico
+    AutocompletadoView, EstadisticasCirculacionView, activos_prestados_publico, eventos_prestados_publico
 )
 # Importamos las vistas de Token
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -38,7 +38,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('api/estadisticas/circulacion/', EstadisticasCirculacionView.as_view(), name='estadisticas-circulacion'),
     path('api/prestados-publico/', activos_prestados_publico, name='prestados-publico'),
+    path('api/prestados-publico/eventos/', eventos_prestados_publico, name='prestados-publico-eventos'),
     
     # RUTAS DE LOGIN
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -54,4 +56,7 @@ urlpatterns = [
     # RUTAS DE ASISTENTE DE UBICACIÓN INTELIGENTE
     path('api/siguiente-codigo/', SiguienteCodigoView.as_view(), name='siguiente-codigo'),
     path('api/secciones-disponibles/', ListaSeccionesView.as_view(), name='secciones-disponibles'),
+    
+    # AUTOCOMPLETADO (títulos, autores, tutores y códigos)
+    path('api/autocomplete/', AutocompletadoView.as_view(), name='autocomplete'),
 ]
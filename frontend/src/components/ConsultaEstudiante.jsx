@@ -5,7 +5,19 @@ import FilterBar from './FilterBar';
 
 // Utilidad para obtener ids de activos prestados
 const getPrestadosIds = (prestamos) => {
-  return prestamos.filter(p => p.estado === 'VIGENTE').map(p => p.activo);
+  return prestamos.filter(p => p.estado === 'VIGENTE' || p.estado === 'ATRASADO').map(p => p.activo);
+};
+
+// Reconstruye las filas de una respuesta ?format=columnar (nombres una vez, valores por columna)
+const desdeColumnar = ({ columnas, valores, diccionarios }) => {
+  const decodificadas = columnas.map((nombre, i) => {
+    const diccionario = diccionarios[nombre];
+    return diccionario ? valores[i].map(indice => diccionario[indice]) : valores[i];
+  });
+  const total = decodificadas.length ? decodificadas[0].length : 0;
+  return Array.from({ length: total }, (_, fila) =>
+    Object.fromEntries(columnas.map((nombre, i) => [nombre, decodificadas[i][fila]]))
+  );
 };
 
 const ConsultaEstudiante = () => {
@@ -21,18 +33,23 @@ const ConsultaEstudiante = () => {
     fetchData();
   }, [tab, busqueda, filtros]);
 
-  // Cargar ids de activos prestados desde endpoint público
+  // Disponibilidad en vivo: foto inicial de ids prestados y luego solo préstamos/devoluciones (SSE)
   useEffect(() => {
-    const fetchPrestados = async () => {
-      try {
-        const res = await axios.get('http://127.0.0.1:8000/api/prestados-publico/');
-        setPrestadosIds(res.data.prestados || []);
-      } catch (e) {
-        setPrestadosIds([]);
-      }
-    };
-    fetchPrestados();
-  }, [tab]);
+    const fuente = new EventSource('http://127.0.0.1:8000/api/prestados-publico/eventos/');
+    fuente.addEventListener('snapshot', (e) => {
+      setPrestadosIds(JSON.parse(e.data).prestados || []);
+    });
+    fuente.addEventListener('prestado', (e) => {
+      const { activo } = JSON.parse(e.data);
+      setPrestadosIds(ids => (ids.includes(activo) ? ids : [...ids, activo]));
+    });
+    fuente.addEventListener('devuelto', (e) => {
+      const { activo } = JSON.parse(e.data);
+      setPrestadosIds(ids => ids.filter(id => id !== activo));
+    });
+    // EventSource reconecta solo y vuelve a recibir la foto
+    return () => fuente.close();
+  }, []);
 
   const fetchData = async () => {
     setLoading(true);
@@ -40,13 +57,14 @@ const ConsultaEstudiante = () => {
       const token = localStorage.getItem('token');
       const config = { headers: { Authorization: `Bearer ${token}` } };
       if (tab === 'libros') {
-        const params = { search: busqueda, ...filtros };
+        // Solo las columnas que muestra la tabla, en formato columnar (menos bytes)
+        const params = { search: busqueda, ...filtros, fields: 'id,codigo_nuevo,titulo,autor,materia,anio,estado', format: 'columnar' };
         const res = await axios.get('http://127.0.0.1:8000/api/libros/', { params, ...config });
-        setLibros(res.data.results ? res.data.results : res.data);
+        setLibros(desdeColumnar(res.data.results ? res.data.results : res.data));
       } else {
-        const params = { search: busqueda, ...filtros };
+        const params = { search: busqueda, ...filtros, fields: 'id,codigo_nuevo,titulo,autor,modalidad,tutor,anio,estado', format: 'columnar' };
         const res = await axios.get('http://127.0.0.1:8000/api/tesis/', { params, ...config });
-        setTesis(res.data.results ? res.data.results : res.data);
+        setTesis(desdeColumnar(res.data.results ? res.data.results : res.data));
       }
     } catch (error) {
       // eslint-disable-next-line
@@ -179,6 +179,11 @@ const Estudiantes = () => {
                     }`}>
                       {est.prestamos_activos || 0} activos
                     </span>
+                    {est.prestamos_atrasados > 0 && (
+                      <span className="ml-1 px-2 py-1 rounded text-xs font-bold bg-red-100 text-red-700">
+                        {est.prestamos_atrasados} atrasados
+                      </span>
+                    )}
                   </td>
                   <td className="p-4">
                     <div className="flex gap-2">
@@ -7,18 +7,18 @@ const FilterBar = ({ type, onFilterApply }) => {
   
   // Estado inicial dinámico
   const initialState = type === 'libros' ? {
-    codigo_nuevo__icontains: '',
-    titulo__icontains: '',
-    materia__icontains: '',
+    codigo_nuevo__istartswith: '',
+    titulo: '',
+    materia: '',
     ubicacion_seccion: '',
     anio: '',
     estado: ''
   } : {
-    codigo_nuevo__icontains: '',
-    titulo__icontains: '',
-    autor__icontains: '',
-    carrera__icontains: '',
-    tutor__icontains: '',
+    codigo_nuevo__istartswith: '',
+    titulo: '',
+    autor: '',
+    carrera: '',
+    tutor: '',
     modalidad: '',
     anio: '',
     estado: ''
@@ -81,12 +81,12 @@ const FilterBar = ({ type, onFilterApply }) => {
             {/* CAMPOS COMUNES */}
             <div>
                 <label className="text-xs font-bold text-gray-500 uppercase">Código</label>
-                <input name="codigo_nuevo__icontains" value={filters.codigo_nuevo__icontains} onChange={handleChange} placeholder="Ej: IND-001" className="w-full p-2 border rounded text-sm focus:ring-2 focus:ring-primary" />
+                <input name="codigo_nuevo__istartswith" value={filters.codigo_nuevo__istartswith} onChange={handleChange} placeholder="Ej: IND-001" className="w-full p-2 border rounded text-sm focus:ring-2 focus:ring-primary" />
             </div>
             
             <div>
                 <label className="text-xs font-bold text-gray-500 uppercase">Título</label>
-                <input name="titulo__icontains" value={filters.titulo__icontains} onChange={handleChange} placeholder="Palabra clave..." className="w-full p-2 border rounded text-sm focus:ring-2 focus:ring-primary" />
+                <input name="titulo" value={filters.titulo} onChange={handleChange} placeholder="Comienzo del título..." className="w-full p-2 border rounded text-sm focus:ring-2 focus:ring-primary" />
             </div>
 
             {/* CAMPOS ESPECÍFICOS LIBROS */}
@@ -94,7 +94,7 @@ const FilterBar = ({ type, onFilterApply }) => {
               <>
                 <div>
                     <label className="text-xs font-bold text-gray-500 uppercase">Materia</label>
-                    <input name="materia__icontains" value={filters.materia__icontains} onChange={handleChange} placeholder="Ej: Calculo" className="w-full p-2 border rounded text-sm focus:ring-2 focus:ring-primary" />
+                    <input name="materia" value={filters.materia} onChange={handleChange} placeholder="Ej: Calculo" className="w-full p-2 border rounded text-sm focus:ring-2 focus:ring-primary" />
                 </div>
                 <div>
                     <label className="text-xs font-bold text-gray-500 uppercase">Ubicación (Sección)</label>
@@ -113,11 +113,11 @@ const FilterBar = ({ type, onFilterApply }) => {
                 <div className="grid grid-cols-2 gap-2">
                   <div>
                     <label className="text-xs font-bold text-gray-500 uppercase">Carrera</label>
-                    <input name="carrera__icontains" value={filters.carrera__icontains} onChange={handleChange} className="w-full p-2 border rounded text-sm" />
+                    <input name="carrera" value={filters.carrera} onChange={handleChange} className="w-full p-2 border rounded text-sm" />
                   </div>
                   <div>
                     <label className="text-xs font-bold text-gray-500 uppercase">Tutor</label>
-                    <input name="tutor__icontains" value={filters.tutor__icontains} onChange={handleChange} className="w-full p-2 border rounded text-sm" />
+                    <input name="tutor" value={filters.tutor} onChange={handleChange} className="w-full p-2 border rounded text-sm" />
                   </div>
                 </div>
                 <div>
@@ -13,7 +13,6 @@ const Libros = ({ onNavigateToPrestamos }) => {
   const [loading, setLoading] = useState(true);
   const [busqueda, setBusqueda] = useState('');
   const [filtrosActivos, setFiltrosActivos] = useState({});
-  const [prestamosActivos, setPrestamosActivos] = useState([]);
   
   // Estado para edición
   const [editModalOpen, setEditModalOpen] = useState(false);
@@ -35,11 +34,8 @@ const Libros = ({ onNavigateToPrestamos }) => {
       // Construimos los parámetros
       const params = { search: query, ...filters };
       
-      // Cargar libros Y préstamos activos en paralelo
-      const [resLibros, resPrestamos] = await Promise.all([
-        axios.get('http://127.0.0.1:8000/api/libros/', { params, ...config }),
-        axios.get('http://127.0.0.1:8000/api/prestamos/?estado=VIGENTE', config)
-      ]);
+      // Cada fila ya trae su préstamo actual (prestado, prestamo_tipo, prestamo_estudiante)
+      const resLibros = await axios.get('http://127.0.0.1:8000/api/libros/', { params, ...config });
       
       const data = resLibros.data.results ? resLibros.data.results : resLibros.data;
       
@@ -49,7 +45,6 @@ const Libros = ({ onNavigateToPrestamos }) => {
       // 2. Libros SIN código de sección al final
       
       setLibros(data);
-      setPrestamosActivos(resPrestamos.data);
     } catch (error) {
       console.error("Error cargando libros:", error);
     }
@@ -57,14 +52,13 @@ const Libros = ({ onNavigateToPrestamos }) => {
   };
 
   // Función para verificar si un libro está prestado
-  const getEstadoPrestamo = (libroId) => {
-    const prestamo = prestamosActivos.find(p => p.activo === libroId);
-    if (!prestamo) return null;
+  const getEstadoPrestamo = (item) => {
+    if (!item.prestado) return null;
     
     return {
-      tipo: prestamo.tipo,
-      label: prestamo.tipo === 'SALA' ? 'EN USO' : 'PRESTADO',
-      estudiante: prestamo.estudiante_nombre
+      tipo: item.prestamo_tipo,
+      label: item.prestamo_tipo === 'SALA' ? 'EN USO' : 'PRESTADO',
+      estudiante: item.prestamo_estudiante
     };
   };
 
@@ -244,7 +238,7 @@ const Libros = ({ onNavigateToPrestamos }) => {
             </thead>
             <tbody className="divide-y divide-gray-100 text-sm text-gray-600">
               {libros.map((libro) => {
-                const estadoPrestamo = getEstadoPrestamo(libro.id);
+                const estadoPrestamo = getEstadoPrestamo(libro);
                 const enCarrito = !!cart.find(c => c.id === libro.id);
                 const isPrestado = !!estadoPrestamo;
                 
@@ -27,7 +27,6 @@ const Prestamos = () => {
   const [libroSeleccionado, setLibroSeleccionado] = useState(null);
   
   // Catálogos
-  const [estudiantesDisponibles, setEstudiantesDisponibles] = useState([]);
   const [librosDisponibles, setLibrosDisponibles] = useState([]);
 
   // Carrito de préstamos
@@ -46,20 +45,27 @@ const Prestamos = () => {
     setLoading(false);
   };
 
-  // Cargar catálogos para los buscadores
-  const cargarCatalogos = async () => {
+  // Selector de materiales: el backend ordena (código exacto, prefijo, título) y limita a 10
+  useEffect(() => {
+      if (busquedaLibro.trim().length === 0) {
+          setLibrosDisponibles([]);
+          return;
+      }
       const token = localStorage.getItem('token');
       const config = { headers: { Authorization: `Bearer ${token}` } };
-      
-      try {
-        const [resEst, resLib] = await Promise.all([
-            axios.get('http://127.0.0.1:8000/api/estudiantes/', config),
-            axios.get('http://127.0.0.1:8000/api/activos/', config)
-        ]);
-        setEstudiantesDisponibles(resEst.data);
-        setLibrosDisponibles(resLib.data);
-      } catch (error) { console.error("Error cargando catálogos", error); }
-  };
+      const controller = new AbortController();
+      const timer = setTimeout(async () => {
+          try {
+              const res = await axios.get('http://127.0.0.1:8000/api/activos/selector/', {
+                  params: { q: busquedaLibro, limite: 10 }, signal: controller.signal, ...config
+              });
+              setLibrosDisponibles(res.data.activos);
+          } catch (error) {
+              if (!axios.isCancel(error)) console.error("Error buscando materiales", error);
+          }
+      }, 200);
+      return () => { clearTimeout(timer); controller.abort(); };
+  }, [busquedaLibro]);
 
   useEffect(() => { fetchPrestamos(); }, [busqueda]);
 
@@ -67,7 +73,6 @@ const Prestamos = () => {
   useEffect(() => {
       if (cart.length > 0 && !modalOpen) {
           setModalOpen(true);
-          cargarCatalogos();
       }
   }, [cart.length]);
 
@@ -80,24 +85,40 @@ const Prestamos = () => {
           return;
       }
 
-      // Buscamos en la lista local si el CI coincide
-      const encontrado = estudiantesDisponibles.find(e => e.ci.trim() === ciInput.trim());
+      // Buscamos el CI en el backend (prefijo indexado) en lugar de cargar todos los estudiantes
+      const token = localStorage.getItem('token');
+      const controller = new AbortController();
+      const timer = setTimeout(async () => {
+          let encontrado = null;
+          try {
+              const res = await axios.get('http://127.0.0.1:8000/api/estudiantes/', {
+                  params: { ci: ciInput.trim(), limite: 5 },
+                  headers: { Authorization: `Bearer ${token}` },
+                  signal: controller.signal
+              });
+              encontrado = res.data.results.find(e => e.ci.trim() === ciInput.trim()) || null;
+          } catch (error) {
+              if (axios.isCancel(error)) return;
+              console.error("Error buscando estudiante", error);
+          }
 
-      if (encontrado) {
-          // ¡ENCONTRADO! Rellenamos todo
-          setEstudianteEncontrado(encontrado);
-          setNombreInput(encontrado.nombre_completo);
-          setCarreraInput(encontrado.carrera || '');
-      } else {
-          // NO ENCONTRADO
-          if (estudianteEncontrado) {
-              setNombreInput('');
-              setCarreraInput('');
-              setEstudianteEncontrado(null);
+          if (encontrado) {
+              // ¡ENCONTRADO! Rellenamos todo
+              setEstudianteEncontrado(encontrado);
+              setNombreInput(encontrado.nombre_completo);
+              setCarreraInput(encontrado.carrera || '');
+          } else {
+              // NO ENCONTRADO
+              if (estudianteEncontrado) {
+                  setNombreInput('');
+                  setCarreraInput('');
+                  setEstudianteEncontrado(null);
+              }
+              // Si nunca hubo nadie seleccionado (estás creando uno desde cero), no borramos nada.
           }
-          // Si nunca hubo nadie seleccionado (estás creando uno desde cero), no borramos nada.
-      }
-  }, [ciInput, estudiantesDisponibles, estudianteEncontrado]);
+      }, 250);
+      return () => { clearTimeout(timer); controller.abort(); };
+  }, [ciInput]);
 
   // Resetear modal al abrir
   const abrirModal = () => {
@@ -111,7 +132,6 @@ const Prestamos = () => {
       setBusquedaLibro('');
       setObservaciones('');
       setCarreraInput('');
-      cargarCatalogos();
   };
 
   const handleCrearPrestamo = async (e) => {
@@ -133,62 +153,50 @@ const Prestamos = () => {
           // Preparar lista de materiales a prestar
           const materiales = cart.length > 0 ? cart : (libroSeleccionado ? [libroSeleccionado] : []);
           
-          let exitosos = 0;
-          let fallidos = 0;
+          // Un solo lote para todo el carrito: el backend responde un resultado por material
+          const payload = {
+              activos: materiales.map(material => material.id),
+              tipo: tipoPrestamo,
+              observaciones: observaciones
+          };
           
-          // Procesar cada material del carrito
-          for (const material of materiales) {
-              try {
-                  const payload = {
-                      activo: material.id,
-                      tipo: tipoPrestamo,
-                      observaciones: observaciones
-                  };
-                  
-                  // Si encontramos uno existente, mandamos su ID. Si no, mandamos datos para crear
-                  if (estudianteEncontrado) {
-                      payload.estudiante = estudianteEncontrado.id;
-                  } else {
-                      payload.nuevo_nombre = nombreInput;
-                      payload.nuevo_ci = ciInput;
-                      if (carreraInput && carreraInput.trim() !== '') {
-                        payload.nuevo_carrera = carreraInput.trim();
-                      }
-                  }
-                  
-                  await axios.post('http://127.0.0.1:8000/api/prestamos/', payload, {
-                      headers: { Authorization: `Bearer ${token}` }
-                  });
-                  
-                  exitosos++;
-              } catch (error) {
-                  console.error(`Error prestando ${material.titulo}:`, error);
-                  
-                  // Mostrar error específico si el backend envió detalles
-                  if (error.response?.data) {
-                      const { error: mensaje, detalle, tipo_prestamo, estudiante } = error.response.data;
-                      
-                      let texto = tipo_prestamo === 'SALA' 
-                        ? 'Este libro está siendo usado en sala de lectura' 
-                        : 'Este libro fue prestado a domicilio';
-                      
-                      await Swal.fire({
-                        icon: 'warning',
-                        title: 'Libro No Disponible',
-                        html: `
-                          <p class="text-gray-700 mb-2"><strong>${material.titulo}</strong></p>
-                          <p class="text-gray-600 mb-2">${texto}</p>
-                          <p class="text-sm text-gray-500">Prestado a: <strong>${estudiante}</strong></p>
-                        `,
-                        confirmButtonText: 'Entendido',
-                        confirmButtonColor: '#EF4444'
-                      });
-                  }
-                  
-                  fallidos++;
+          // Si encontramos uno existente, mandamos su ID. Si no, mandamos datos para crear
+          if (estudianteEncontrado) {
+              payload.estudiante = estudianteEncontrado.id;
+          } else {
+              payload.nuevo_nombre = nombreInput;
+              payload.nuevo_ci = ciInput;
+              if (carreraInput && carreraInput.trim() !== '') {
+                payload.nuevo_carrera = carreraInput.trim();
               }
           }
           
+          const res = await axios.post('http://127.0.0.1:8000/api/prestamos/lote/', payload, {
+              headers: { Authorization: `Bearer ${token}` }
+          });
+          
+          const exitosos = res.data.prestados;
+          const rechazados = res.data.resultados.filter(resultado => !resultado.ok);
+          const fallidos = rechazados.length;
+          
+          // Mostrar el motivo de cada material rechazado
+          if (fallidos > 0) {
+              const filas = rechazados.map(resultado => {
+                  const material = materiales.find(m => m.id === resultado.activo);
+                  const prestadoA = resultado.estudiante
+                    ? `<br><span class="text-sm text-gray-500">Prestado a: <strong>${resultado.estudiante}</strong></span>`
+                    : '';
+                  return `<p class="text-gray-700 mb-2"><strong>${material?.titulo || resultado.activo}</strong>: ${resultado.error}${prestadoA}</p>`;
+              }).join('');
+              await Swal.fire({
+                icon: 'warning',
+                title: 'Materiales No Disponibles',
+                html: filas,
+                confirmButtonText: 'Entendido',
+                confirmButtonColor: '#EF4444'
+              });
+          }
+          
           // Limpiar carrito y cerrar modal
           clearCart();
           setModalOpen(false);
@@ -231,17 +239,8 @@ const Prestamos = () => {
 
   // --- FILTRADO MEJORADO ---
   
-  // Filtrar libros por Título o CÓDIGO (Prioridad al código)
-  const librosFiltrados = busquedaLibro.length > 0
-      ? librosDisponibles.filter(l => {
-          const termino = busquedaLibro.toLowerCase();
-          const codigo = l.codigo_nuevo ? l.codigo_nuevo.toLowerCase() : '';
-          const titulo = l.titulo.toLowerCase();
-          
-          // Busca coincidencia en código o título
-          return codigo.includes(termino) || titulo.includes(termino);
-        }).slice(0, 10) // Aumentamos a 10 sugerencias para mayor visibilidad
-      : [];
+  // Sugerencias del selector (ya filtradas y ordenadas por el backend)
+  const librosFiltrados = busquedaLibro.trim().length > 0 ? librosDisponibles : [];
 
   // Función para formatear fecha y hora (Forzada a Bolivia)
   const formatDateTime = (dateString) => {
@@ -311,7 +310,8 @@ const Prestamos = () => {
                   <tr><td colSpan="5" className="p-8 text-center text-gray-400">No hay préstamos registrados.</td></tr>
                 ) : (
                   prestamos.map((p) => {
-                    const vencido = new Date() > new Date(p.fecha_devolucion_estimada) && p.estado === 'VIGENTE';
+                    // El barrido del backend marca ATRASADO; entre barridos se compara la fecha
+                    const vencido = p.estado === 'ATRASADO' || (p.estado === 'VIGENTE' && new Date() > new Date(p.fecha_devolucion_estimada));
                     return (
                     <tr key={p.id} className={p.estado === 'DEVUELTO' ? 'bg-gray-50 opacity-60' : 'hover:bg-blue-50'}>
                         <td className="p-4">
@@ -356,7 +356,8 @@ const Prestamos = () => {
                             </div>
                         </td>
                         <td className="p-4">
-                            {p.estado === 'VIGENTE' && <span className="text-blue-900 font-bold text-xs bg-blue-100 px-2 py-1 rounded flex items-center gap-1 w-fit"><Clock className="w-3 h-3" /> ACTIVO</span>}
+                            {p.estado !== 'DEVUELTO' && !vencido && <span className="text-blue-900 font-bold text-xs bg-blue-100 px-2 py-1 rounded flex items-center gap-1 w-fit"><Clock className="w-3 h-3" /> ACTIVO</span>}
+                            {vencido && <span className="text-red-700 font-bold text-xs bg-red-100 px-2 py-1 rounded flex items-center gap-1 w-fit"><AlertTriangle className="w-3 h-3" /> ATRASADO</span>}
                             {p.estado === 'DEVUELTO' && <span className="text-gray-500 font-bold text-xs bg-gray-100 px-2 py-1 rounded flex items-center gap-1 w-fit"><CheckCircle className="w-3 h-3" /> CERRADO</span>}
                         </td>
                         <td className="p-4 text-center">
@@ -544,6 +545,11 @@ const Prestamos = () => {
                                                 }`}>
                                                     {l.tipo}
                                                 </span>
+                                                {!l.disponible && (
+                                                    <span className="text-[10px] font-bold px-2 py-0.5 rounded border bg-red-100 text-red-700 border-red-200">
+                                                        PRESTADO
+                                                    </span>
+                                                )}
                                                 <span className="font-mono text-xs font-bold text-gray-600 bg-gray-100 px-2 rounded">
                                                     {l.codigo_nuevo || 'SIN CÓDIGO'}
                                                 </span>
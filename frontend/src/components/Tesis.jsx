@@ -13,7 +13,6 @@ const Tesis = ({ onNavigateToPrestamos }) => {
   const [loading, setLoading] = useState(true);
   const [busqueda, setBusqueda] = useState('');
   const [filtrosActivos, setFiltrosActivos] = useState({});
-  const [prestamosActivos, setPrestamosActivos] = useState([]);
   
   // Estado para edición
   const [editModalOpen, setEditModalOpen] = useState(false);
@@ -37,15 +36,11 @@ const Tesis = ({ onNavigateToPrestamos }) => {
         ...filters
       };
       
-      // Cargar tesis Y préstamos activos en paralelo
-      const [resTesis, resPrestamos] = await Promise.all([
-        axios.get('http://127.0.0.1:8000/api/tesis/', { params, ...config }),
-        axios.get('http://127.0.0.1:8000/api/prestamos/?estado=VIGENTE', config)
-      ]);
+      // Cada fila ya trae su préstamo actual (prestado, prestamo_tipo, prestamo_estudiante)
+      const resTesis = await axios.get('http://127.0.0.1:8000/api/tesis/', { params, ...config });
       
       const data = resTesis.data.results ? resTesis.data.results : resTesis.data;
       setTesis(data);
-      setPrestamosActivos(resPrestamos.data);
     } catch (error) {
       console.error("Error cargando tesis:", error);
     }
@@ -53,14 +48,13 @@ const Tesis = ({ onNavigateToPrestamos }) => {
   };
 
   // Función para verificar si una tesis está prestada
-  const getEstadoPrestamo = (tesisId) => {
-    const prestamo = prestamosActivos.find(p => p.activo === tesisId);
-    if (!prestamo) return null;
+  const getEstadoPrestamo = (item) => {
+    if (!item.prestado) return null;
     
     return {
-      tipo: prestamo.tipo,
-      label: prestamo.tipo === 'SALA' ? 'EN USO' : 'PRESTADO',
-      estudiante: prestamo.estudiante_nombre
+      tipo: item.prestamo_tipo,
+      label: item.prestamo_tipo === 'SALA' ? 'EN USO' : 'PRESTADO',
+      estudiante: item.prestamo_estudiante
     };
   };
 
@@ -230,8 +224,8 @@ const Tesis = ({ onNavigateToPrestamos }) => {
             </thead>
             <tbody className="divide-y divide-gray-100 text-sm text-gray-600">
               {tesis.map((item) => {
-                const isPrestado = !!getEstadoPrestamo(item.id);
-                const estadoPrestamo = getEstadoPrestamo(item.id) || {};
+                const isPrestado = !!getEstadoPrestamo(item);
+                const estadoPrestamo = getEstadoPrestamo(item) || {};
                 const enCarrito = cart.some((i) => i.id === item.id && i.tipo === 'TESIS');
                 return (
                   <tr key={item.id} onContextMenu={(e) => handleContextMenu(e, item)} className={`transition-colors cursor-pointer ${enCarrito ? 'bg-orange-50 border-l-4 border-orange-400' : isPrestado ? 'bg-red-50 opacity-75' : 'hover:bg-blue-50'}`}>
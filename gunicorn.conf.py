@@ -0,0 +1,20 @@
+"""
+Configuración de gunicorn para Render. gunicorn la lee sola al arrancar desde la
+raíz del proyecto (comando de inicio: `gunicorn core.wsgi`).
+
+Los kioscos mantienen abierto el stream SSE /api/prestados-publico/eventos/ (ver
+inventario/eventos.py). Con workers sync cada stream ocuparía un proceso entero y
+unos pocos kioscos dejarían sin workers al resto de la API; con gthread ocupa un
+hilo, y EVENTOS_STREAMS_POR_PROCESO (core/settings.py) deja hilos libres para el resto.
+"""
+import os
+
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# En gthread el timeout vigila que el proceso responda, no la duración de cada pedido
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# El barrido de préstamos vencidos corre solo en el servidor (ver core/settings.py);
+# BARRIDO_ATRASADOS_INTERVALO=0 en el entorno lo desactiva si se usa cron
+os.environ.setdefault('BARRIDO_ATRASADOS_INTERVALO', '300')
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        # Registrar señales (índices derivados del catálogo)
+        from . import signals  # noqa: F401
+
+        # Barrido periódico de préstamos vencidos: solo si el servidor lo activa (gunicorn.conf.py),
+        # nunca en migrate, test, shell ni scripts
+        intervalo = settings.BARRIDO_ATRASADOS_INTERVALO
+        if intervalo > 0:
+            from .vencimientos import barrido
+            barrido.iniciar(intervalo)
@@ -0,0 +1,183 @@
+"""
+Autocompletado de títulos, autores, tutores y códigos (/api/autocomplete/).
+
+El índice es la tabla EntradaAutocompletado: por cada activo se guarda una clave
+normalizada (sin tildes ni mayúsculas) por cada palabra de título, autor y tutor
+desde donde puede empezar a escribir el usuario ("introduccion a las redes",
+"las redes", "redes"), más una por código nuevo y código de sección. La consulta
+es un rango por prefijo sobre el índice (clave, peso DESC, activo_id), sin tocar
+la tabla de activos.
+
+Para acotar la latencia se leen como máximo MAX_CANDIDATOS entradas en el orden
+del índice (clave, luego peso) y el ranking se hace en Python sobre ellas. Si el
+prefijo tiene más entradas que eso (prefijos de una o dos letras) quedan las
+primeras claves en orden alfabético y el ranking solo es exacto dentro de ellas.
+Las entradas se regeneran desde las señales al guardar (ver signals.py).
+
+El mismo índice sirve al selector de activos del formulario de préstamos
+(/api/activos/selector/, ver seleccionar_activos).
+"""
+import re
+
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Min, Value, When
+from django.db.models.functions import Collate
+
+from .disponibilidad import anotaciones_prestamo
+from .models import ActivoBibliografico, EntradaAutocompletado, normalizar_texto
+
+
+LIMITE_POR_DEFECTO = 10
+LIMITE_MAXIMO = 20
+MAX_CANDIDATOS = 500
+
+PESO_TITULO = 30
+# (atributo, campo, peso): a igual prefijo, un código gana a un título y éste a un autor
+CAMPOS_AUTOCOMPLETADO = (
+    ('codigo_nuevo', 'CODIGO', 50),
+    ('codigo_seccion_full', 'SECCION', 45),
+    ('titulo', 'TITULO', PESO_TITULO),
+    ('autor', 'AUTOR', 20),
+    ('tutor', 'TUTOR', 10),
+)
+CAMPOS_CODIGO = ('CODIGO', 'SECCION')
+# Bono cuando el prefijo coincide con el inicio del valor y no con una palabra intermedia
+BONO_INICIO = 5
+# Las palabras más cortas ("de", "la") no inician claves, pero sí quedan dentro de ellas
+LARGO_MINIMO_PALABRA = 3
+LARGO_CLAVE = 255
+
+LIMITE_SELECTOR = 20
+LIMITE_SELECTOR_MAXIMO = 50
+# Rango de cada coincidencia en el selector (menor primero)
+RANGO_CODIGO_EXACTO = 0
+RANGO_CODIGO_PREFIJO = 1
+RANGO_TITULO_INICIO = 2
+RANGO_TITULO_PALABRA = 3
+CAMPOS_SELECTOR = ('id', 'titulo', 'codigo_nuevo', 'tipo_activo', 'autor', 'estado')
+
+
+def claves_autocompletado(activo):
+    """Genera (campo, clave, texto, peso) para cada entrada del activo"""
+    for atributo, campo, peso in CAMPOS_AUTOCOMPLETADO:
+        valor = (getattr(activo, atributo, None) or '').strip()
+        normalizado = normalizar_texto(valor)
+        if not normalizado:
+            continue
+        texto = valor[:LARGO_CLAVE]
+        yield campo, normalizado[:LARGO_CLAVE], texto, peso + BONO_INICIO
+        if campo in CAMPOS_CODIGO:
+            continue
+        vistas = {normalizado}
+        for palabra in re.finditer(r'\w+', normalizado):
+            clave = normalizado[palabra.start():][:LARGO_CLAVE]
+            if len(palabra.group()) >= LARGO_MINIMO_PALABRA and clave not in vistas:
+                vistas.add(clave)
+                yield campo, clave, texto, peso
+
+
+def indexar_autocompletado(activo, using='default'):
+    """Reemplaza las entradas del activo (DELETE + un solo INSERT)"""
+    entradas = EntradaAutocompletado.objects.using(using)
+    entradas.filter(activo_id=activo.pk).delete()
+    entradas.bulk_create([
+        EntradaAutocompletado(activo_id=activo.pk, campo=campo, clave=clave, texto=texto, peso=peso)
+        for campo, clave, texto, peso in claves_autocompletado(activo)
+    ])
+
+
+def clave_indexada(using):
+    """La clave tal como está en el índice compuesto (COLLATE "C" en PostgreSQL, ver migración 0019)"""
+    return Collate('clave', 'C') if connections[using].vendor == 'postgresql' else F('clave')
+
+
+def sugerencias(texto, limite=LIMITE_POR_DEFECTO, using='default'):
+    """
+    Sugerencias ordenadas: coincidencia exacta del valor completo, luego peso del
+    campo (códigos > títulos > autores > tutores, inicio > palabra intermedia),
+    luego cantidad de activos que la comparten y por último orden alfabético.
+    """
+    prefijo = normalizar_texto(texto)[:LARGO_CLAVE]
+    if not prefijo:
+        return []
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+
+    candidatos = (
+        EntradaAutocompletado.objects.using(using)
+        .alias(clave_indice=clave_indexada(using))
+        .filter(clave_indice__prefijo=prefijo)
+        # El orden del índice: recortar no obliga a ordenar todas las coincidencias
+        .order_by('clave_indice', '-peso', 'activo_id')
+        .values_list('campo', 'texto', 'peso', 'activo_id')[:MAX_CANDIDATOS]
+    )
+    grupos = {}
+    for campo, texto_sugerido, peso, activo_id in candidatos:
+        grupo = grupos.setdefault((campo, texto_sugerido), {'peso': 0, 'activos': set()})
+        grupo['peso'] = max(grupo['peso'], peso)
+        grupo['activos'].add(activo_id)
+
+    def orden(item):
+        (campo, texto_sugerido), grupo = item
+        exacta = normalizar_texto(texto_sugerido) == prefijo
+        return (not exacta, -grupo['peso'], -len(grupo['activos']), texto_sugerido)
+
+    return [
+        {
+            'texto': texto_sugerido,
+            'campo': campo,
+            'cantidad': len(grupo['activos']),
+            # Si la sugerencia identifica un solo activo se puede abrir directamente
+            'activo': next(iter(grupo['activos'])) if len(grupo['activos']) == 1 else None,
+        }
+        for (campo, texto_sugerido), grupo in sorted(grupos.items(), key=orden)[:limite]
+    ]
+
+
+def seleccionar_activos(texto, tipo=None, limite=LIMITE_SELECTOR, using='default'):
+    """
+    Activos para el selector de préstamos, con tope de `limite` filas: código
+    exacto, luego prefijo de código, luego títulos que empiezan con el texto y
+    por último títulos con una palabra que empieza con él. Devuelve
+    (filas, hay_mas) en dos consultas: el ranking agrupado sobre el índice y
+    los datos de los activos elegidos con su disponibilidad.
+    """
+    prefijo = normalizar_texto(texto)[:LARGO_CLAVE]
+    if not prefijo:
+        return [], False
+    limite = max(1, min(limite, LIMITE_SELECTOR_MAXIMO))
+
+    rango = Case(
+        When(campo='CODIGO', clave=prefijo, then=Value(RANGO_CODIGO_EXACTO)),
+        When(campo='CODIGO', then=Value(RANGO_CODIGO_PREFIJO)),
+        When(peso=PESO_TITULO + BONO_INICIO, then=Value(RANGO_TITULO_INICIO)),
+        default=Value(RANGO_TITULO_PALABRA),
+        output_field=IntegerField(),
+    )
+    entradas = EntradaAutocompletado.objects.using(using).alias(clave_indice=clave_indexada(using)).filter(
+        campo__in=('CODIGO', 'TITULO'), clave_indice__prefijo=prefijo
+    )
+    if tipo:
+        entradas = entradas.filter(activo__tipo_activo=tipo)
+    elegidos = list(
+        entradas.values('activo_id', 'activo__titulo_norm')
+        .annotate(rango=Min(rango))
+        .order_by('rango', 'activo__titulo_norm', 'activo_id')
+        .values_list('activo_id', flat=True)[:limite + 1]
+    )
+    hay_mas = len(elegidos) > limite
+    elegidos = elegidos[:limite]
+
+    filas = {
+        fila['id']: fila
+        for fila in ActivoBibliografico.objects.using(using).filter(pk__in=elegidos)
+        .annotate(prestado=anotaciones_prestamo()['prestado'])
+        .values(*CAMPOS_SELECTOR, 'prestado')
+    }
+    return [
+        {
+            **{campo: filas[pk][campo] for campo in CAMPOS_SELECTOR if campo != 'tipo_activo'},
+            'tipo': filas[pk]['tipo_activo'],
+            'disponible': not filas[pk]['prestado'],
+        }
+        for pk in elegidos
+    ], hay_mas
@@ -0,0 +1,297 @@
+"""
+Índices de búsqueda para libros y tesis.
+
+Texto completo (BÚSQUEDA OMNIPOTENTE, ?search=):
+- PostgreSQL: tabla con un tsvector ponderado (configuración 'spanish') e índice GIN.
+- SQLite: tabla virtual FTS5 con una columna por peso, ordenada con bm25.
+
+Búsqueda difusa tolerante a errores de tipeo (?difuso=) sobre título, autor y tutor:
+- PostgreSQL: pg_trgm con índice GIN (operador <%) y word_similarity.
+- SQLite: tabla de trigramas (trigrama, activo) indexada.
+
+Las tablas las crean las migraciones 0007 y 0008; se mantienen desde las señales
+de Libro y TrabajoGrado (ver signals.py).
+En cualquier otro motor se usa la búsqueda ILIKE original de DRF.
+"""
+import re
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.filters import BaseFilterBackend
+
+from .consulta import interpretar_consulta
+from .models import normalizar_texto
+
+
+TABLA_INDICE = 'inventario_indice_busqueda'
+CONFIGURACION_PG = 'spanish'
+MOTORES_SOPORTADOS = ('postgresql', 'sqlite')
+
+# Peso de cada grupo de campos: título y autor pesan más que observaciones
+CAMPOS_POR_PESO = (
+    ('A', ['titulo', 'autor']),
+    ('B', ['codigo_nuevo', 'codigo_antiguo', 'codigo_seccion_full', 'tutor', 'materia', 'carrera', 'editorial']),
+    ('C', ['facultad', 'modalidad', 'edicion', 'ubicacion_seccion', 'ubicacion_repisa', 'estado']),
+    ('D', ['observaciones']),
+)
+# Pesos equivalentes para bm25 en SQLite (una columna FTS5 por grupo)
+PESOS_BM25 = (10.0, 4.0, 2.0, 1.0)
+
+TABLA_DIFUSO = 'inventario_indice_difuso'
+CAMPOS_DIFUSO = ['titulo', 'autor', 'tutor']
+# Fracción mínima de trigramas de la consulta que deben aparecer en el registro
+UMBRAL_DIFUSO = 0.4
+# Candidatos más parecidos que se ordenan en PostgreSQL (el resto no aporta a la lista)
+MAX_DIFUSO = 1000
+
+
+def documento_activo(activo):
+    """Texto normalizado de cada grupo de peso (A, B, C, D) para un libro o tesis"""
+    return [
+        ' '.join(normalizar_texto(getattr(activo, campo, None)) for campo in campos).strip()
+        for _, campos in CAMPOS_POR_PESO
+    ]
+
+
+def texto_difuso(activo):
+    return ' '.join(normalizar_texto(getattr(activo, campo, None)) for campo in CAMPOS_DIFUSO).strip()
+
+
+def trigramas(texto):
+    """Trigramas por palabra al estilo de pg_trgm ("garcia" -> "  g", " ga", "gar", ..., "ia ")"""
+    resultado = set()
+    for palabra in re.findall(r'\w+', normalizar_texto(texto)):
+        relleno = f'  {palabra} '
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
+
+
+def indexar_activo(activo, using='default'):
+    """Inserta o reemplaza las entradas del activo en los índices de búsqueda"""
+    indexar_texto_completo(activo, using=using)
+    indexar_difuso(activo, using=using)
+
+
+def indexar_texto_completo(activo, using='default'):
+    connection = connections[using]
+    textos = documento_activo(activo)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            vector = ' || '.join(
+                f"setweight(to_tsvector('{CONFIGURACION_PG}', %s), '{peso}')"
+                for peso, _ in CAMPOS_POR_PESO
+            )
+            cursor.execute(
+                f'INSERT INTO {TABLA_INDICE} (activo_id, documento) VALUES (%s, {vector}) '
+                'ON CONFLICT (activo_id) DO UPDATE SET documento = EXCLUDED.documento',
+                [activo.pk, *textos],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {TABLA_INDICE} WHERE rowid = %s', [activo.pk])
+            cursor.execute(
+                f'INSERT INTO {TABLA_INDICE} (rowid, peso_a, peso_b, peso_c, peso_d) VALUES (%s, %s, %s, %s, %s)',
+                [activo.pk, *textos],
+            )
+
+
+def indexar_difuso(activo, using='default'):
+    connection = connections[using]
+    texto = texto_difuso(activo)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {TABLA_DIFUSO} (activo_id, texto) VALUES (%s, %s) '
+                'ON CONFLICT (activo_id) DO UPDATE SET texto = EXCLUDED.texto',
+                [activo.pk, texto],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {TABLA_DIFUSO} WHERE activo_id = %s', [activo.pk])
+            cursor.executemany(
+                f'INSERT INTO {TABLA_DIFUSO} (trigrama, activo_id) VALUES (%s, %s)',
+                [(trigrama, activo.pk) for trigrama in trigramas(texto)],
+            )
+
+
+def desindexar_activo(activo_id, using='default'):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        columna = 'activo_id'
+    elif connection.vendor == 'sqlite':
+        columna = 'rowid'
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_INDICE} WHERE {columna} = %s', [activo_id])
+        cursor.execute(f'DELETE FROM {TABLA_DIFUSO} WHERE activo_id = %s', [activo_id])
+
+
+def palabras_busqueda(terminos):
+    """Normaliza los términos y los separa en palabras seguras para el motor"""
+    palabras = []
+    for termino in terminos:
+        palabras.extend(re.findall(r'\w+', normalizar_texto(termino)))
+    return palabras
+
+
+def consulta_texto(palabras, vendor):
+    """Consulta por prefijo donde todas las palabras deben aparecer"""
+    if vendor == 'postgresql':
+        return ' & '.join(f'{palabra}:*' for palabra in palabras)
+    return ' AND '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+class BusquedaNormalizadaFilter(filters.SearchFilter):
+    """
+    SearchFilter que normaliza los términos (minúsculas, sin tildes) para buscar
+    sobre las columnas *_norm. Como esas columnas ya están en minúsculas, sin
+    prefijo o con '^' se busca por prefijo (lookup `prefijo`) y con '=' por igualdad,
+    que aprovechan el índice. '*campo' (contiene, LIKE '%x%') recorre la tabla:
+    solo para las vistas que lo declaren así.
+    """
+    lookup_prefixes = {
+        **filters.SearchFilter.lookup_prefixes,
+        '^': 'prefijo',
+        '=': 'exact',
+        '*': 'contains',
+    }
+
+    def construct_search(self, field_name, queryset):
+        if field_name[0] not in self.lookup_prefixes and field_name.endswith('_norm'):
+            field_name = f'^{field_name}'
+        return super().construct_search(field_name, queryset)
+
+    def get_search_terms(self, request):
+        terminos = super().get_search_terms(request)
+        return [normalizado for normalizado in map(normalizar_texto, terminos) if normalizado]
+
+
+class BusquedaTextoCompletoFilter(BusquedaNormalizadaFilter):
+    """
+    Reemplaza el OR de ILIKE '%término%' de SearchFilter por el índice de texto completo.
+    Usa el mismo parámetro ?search= y ordena los resultados por relevancia
+    (el orden natural queda como desempate). La paginación por cursor impone
+    de nuevo el orden natural para que las páginas sean estables.
+
+    Los términos con campo (autor:garcia anio:2015..2020, ver consulta.py) se
+    convierten en filtros sobre una sola columna; solo los términos libres
+    pasan por el índice de texto completo.
+    """
+    terminos_libres = None
+
+    def get_search_terms(self, request):
+        if self.terminos_libres is None:
+            return super().get_search_terms(request)
+        return [normalizado for normalizado in map(normalizar_texto, self.terminos_libres) if normalizado]
+
+    def filter_queryset(self, request, queryset, view):
+        filtro, self.terminos_libres = interpretar_consulta(
+            request.query_params.get(self.search_param, ''),
+            getattr(view, 'campos_consulta', {}),
+        )
+        if filtro is not None:
+            queryset = queryset.filter(filtro)
+
+        terminos = self.get_search_terms(request)
+        if not terminos:
+            return queryset
+
+        connection = connections[queryset.db]
+        palabras = palabras_busqueda(terminos)
+        if connection.vendor not in MOTORES_SOPORTADOS or not palabras:
+            return super().filter_queryset(request, queryset, view)
+
+        consulta = consulta_texto(palabras, connection.vendor)
+        qn = connection.ops.quote_name
+        opts = queryset.model._meta
+        pk = f'{qn(opts.db_table)}.{qn(opts.pk.column)}'
+
+        if connection.vendor == 'postgresql':
+            tsquery = 'to_tsquery(%s, %s)'
+            params = [CONFIGURACION_PG, consulta]
+            coincidencias = RawSQL(f'SELECT activo_id FROM {TABLA_INDICE} WHERE documento @@ {tsquery}', params)
+            relevancia = RawSQL(
+                f'SELECT ts_rank(documento, {tsquery}) FROM {TABLA_INDICE} WHERE activo_id = {pk}', params
+            )
+        else:
+            pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+            coincidencias = RawSQL(f'SELECT rowid FROM {TABLA_INDICE} WHERE {TABLA_INDICE} MATCH %s', [consulta])
+            # bm25 devuelve valores negativos (más negativo = más relevante)
+            relevancia = RawSQL(
+                f'SELECT -bm25({TABLA_INDICE}, {pesos}) FROM {TABLA_INDICE} '
+                f'WHERE {TABLA_INDICE} MATCH %s AND rowid = {pk}',
+                [consulta],
+            )
+
+        orden_natural = queryset.query.order_by
+        return (
+            queryset.filter(pk__in=coincidencias)
+            .annotate(relevancia=relevancia)
+            .order_by('-relevancia', *orden_natural)
+        )
+
+
+class BusquedaDifusaFilter(BaseFilterBackend):
+    """
+    Búsqueda tolerante a errores de tipeo con ?difuso=texto sobre título, autor y tutor.
+    Ordena por similitud de trigramas (el orden natural queda como desempate).
+    """
+    search_param = 'difuso'
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, '').strip()
+        if not texto:
+            return queryset
+
+        connection = connections[queryset.db]
+        consulta = normalizar_texto(texto)
+        if connection.vendor not in MOTORES_SOPORTADOS:
+            return queryset.filter(Q(titulo__icontains=texto) | Q(autor__icontains=texto))
+
+        qn = connection.ops.quote_name
+        opts = queryset.model._meta
+        pk = f'{qn(opts.db_table)}.{qn(opts.pk.column)}'
+
+        if connection.vendor == 'postgresql':
+            # <% usa el índice GIN con el umbral de pg_trgm.word_similarity_threshold;
+            # set_config(..., true) vale solo dentro de esta transacción, no queda en la
+            # conexión. La similitud se calcula solo sobre las filas que trae el índice.
+            with transaction.atomic(using=queryset.db), connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(UMBRAL_DIFUSO)]
+                )
+                cursor.execute(
+                    f'SELECT activo_id FROM {TABLA_DIFUSO} WHERE %s <%% texto '
+                    'ORDER BY word_similarity(%s, texto) DESC, activo_id LIMIT %s',
+                    [consulta, consulta, MAX_DIFUSO],
+                )
+                coincidencias = [fila[0] for fila in cursor.fetchall()]
+            if not coincidencias:
+                return queryset.none()
+            similitud = RawSQL(
+                f'SELECT word_similarity(%s, texto) FROM {TABLA_DIFUSO} WHERE activo_id = {pk}', [consulta]
+            )
+        else:
+            lista = sorted(trigramas(consulta))
+            if not lista:
+                return queryset.none()
+            marcas = ', '.join(['%s'] * len(lista))
+            minimo = max(1, int(len(lista) * UMBRAL_DIFUSO + 0.999))
+            coincidencias = RawSQL(
+                f'SELECT activo_id FROM {TABLA_DIFUSO} WHERE trigrama IN ({marcas}) '
+                'GROUP BY activo_id HAVING COUNT(*) >= %s',
+                [*lista, minimo],
+            )
+            similitud = RawSQL(
+                f'SELECT COUNT(*) * 1.0 / %s FROM {TABLA_DIFUSO} '
+                f'WHERE activo_id = {pk} AND trigrama IN ({marcas})',
+                [len(lista), *lista],
+            )
+
+        orden_natural = queryset.query.order_by
+        return (
+            queryset.filter(pk__in=coincidencias)
+            .annotate(similitud=similitud)
+            .order_by('-similitud', *orden_natural)
+        )
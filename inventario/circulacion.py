@@ -0,0 +1,215 @@
+"""
+Préstamos y devoluciones en lote para el mostrador.
+
+prestar_lote() y devolver_lote() procesan todos los ítems en una sola
+transacción con consultas por conjunto: un SELECT para los activos pedidos, un
+SELECT ... FOR UPDATE para sus préstamos sin devolver y un INSERT/UPDATE en bloque
+para los cambios, con su historial, sus eventos y el resumen diario también en
+bloque. Cada ítem recibe su propio resultado (ok o el motivo del rechazo); los
+rechazados no impiden registrar el resto.
+
+Las reglas son las mismas que en PrestamoViewSet.create: un activo prestado solo
+se acepta si es el mismo estudiante pasando de SALA a DOMICILIO (se cierra el de
+sala) y las tesis no salen a domicilio. Si otro mostrador presta uno de los
+activos entre la consulta y el INSERT, la restricción prestamo_activo_unico
+revierte el lote y se vuelve a evaluar completo: en el segundo intento ese
+activo ya figura como prestado.
+
+Las escrituras de préstamos (estas y las de PrestamoViewSet) van dentro de
+transaccion_prestamo(): en SQLite la transacción abre con BEGIN IMMEDIATE.
+"""
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, TextField, Value
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from . import estadisticas, eventos
+from .disponibilidad import ESTADOS_PRESTADO
+from .models import ActivoBibliografico, Prestamo
+from .versiones import incrementar_version, PRESTAMOS
+
+
+LIMITE_LOTE = 100
+REINTENTOS = 3
+OBS_CAMBIO_DOMICILIO = " [Auto-cerrado: Cambio a Domicilio]"
+
+
+@contextmanager
+def transaccion_prestamo(using=None):
+    """
+    transaction.atomic() que en SQLite toma el bloqueo de escritura al empezar
+    (BEGIN IMMEDIATE). Una transacción normal empieza leyendo y pide el bloqueo
+    al escribir: si otro mostrador escribió en el medio, SQLite responde
+    "database is locked" sin esperar. Con IMMEDIATE el segundo préstamo espera
+    su turno (OPTIONS['timeout']). El resto de las transacciones no cambia.
+    """
+    connection = transaction.get_connection(using)
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    modo = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = modo
+            yield
+    finally:
+        connection.transaction_mode = modo
+
+
+def mensaje_devolucion(prestamo):
+    """Qué garantía devolver al estudiante según el tipo de préstamo"""
+    if prestamo.tipo == 'SALA':
+        return 'Material devuelto exitosamente. Entregar Carnet Universitario al estudiante.'
+    return 'Material devuelto exitosamente. Entregar Cédula de Identidad al estudiante.'
+
+
+def texto_estado(prestamo):
+    if prestamo.tipo == 'SALA':
+        return "está siendo usado en sala de lectura"
+    return "fue prestado a domicilio"
+
+
+def cerrar_en_bloque(prestamos, ahora, usuario, observacion='', motivo=None):
+    """Pasa `prestamos` (ya bloqueados) a DEVUELTO con un UPDATE, su historial y sus eventos"""
+    if not prestamos:
+        return
+    cambios = {'estado': 'DEVUELTO', 'fecha_devolucion_real': ahora}
+    if observacion:
+        cambios['observaciones'] = Concat(
+            Coalesce('observaciones', Value('')), Value(observacion), output_field=TextField(),
+        )
+    Prestamo.objects.filter(pk__in=[prestamo.pk for prestamo in prestamos]).update(**cambios)
+    for prestamo in prestamos:
+        prestamo.estado = 'DEVUELTO'
+        prestamo.fecha_devolucion_real = ahora
+        if observacion:
+            prestamo.observaciones = (prestamo.observaciones or '') + observacion
+    Prestamo.history.bulk_history_create(
+        prestamos, update=True, default_user=usuario, default_change_reason=motivo, default_date=ahora,
+    )
+    eventos.publicar_eventos(eventos.DEVUELTO, prestamos)
+    estadisticas.sumar_devoluciones(prestamos)
+
+
+def prestar_lote(estudiante, tipo, usuario, codigos=(), activos=(), observaciones=None):
+    """
+    Presta al estudiante los activos indicados por código (codigo_nuevo) o por id.
+    Devuelve un resultado por ítem: primero los códigos y luego los ids, en el orden recibido.
+    """
+    for intento in range(REINTENTOS):
+        try:
+            with transaccion_prestamo():
+                return _prestar_lote(estudiante, tipo, usuario, codigos, activos, observaciones)
+        except IntegrityError:
+            if intento == REINTENTOS - 1:
+                raise
+
+
+def _prestar_lote(estudiante, tipo, usuario, codigos, activos, observaciones):
+    ahora = timezone.now()
+    por_codigo, por_id = {}, {}
+    encontrados = ActivoBibliografico.objects.filter(
+        Q(codigo_nuevo__in=set(codigos)) | Q(pk__in=set(activos))
+    ).only('id', 'titulo', 'codigo_nuevo', 'tipo_activo')
+    for activo in encontrados:
+        por_codigo.setdefault(activo.codigo_nuevo, []).append(activo)
+        por_id[activo.pk] = activo
+    items = [('codigo', codigo, por_codigo.get(codigo, [])) for codigo in codigos]
+    items += [('activo', pk, [por_id[pk]] if pk in por_id else []) for pk in activos]
+    ids = {candidatos[0].pk for _, _, candidatos in items if len(candidatos) == 1}
+    # Bloquear los préstamos sin devolver en orden de activo: dos lotes cruzados no se traban
+    actuales = {
+        prestamo.activo_id: prestamo
+        for prestamo in Prestamo.objects.select_for_update(of=('self',))
+        .select_related('estudiante')
+        .filter(activo_id__in=ids, estado__in=ESTADOS_PRESTADO)
+        .order_by('activo_id')
+    }
+
+    resultados, nuevos, a_cerrar, vistos = [], [], [], set()
+    for clave, valor, candidatos in items:
+        resultado = {clave: valor, 'ok': False}
+        resultados.append(resultado)
+        if not candidatos:
+            resultado['error'] = 'No existe el activo'
+            continue
+        if len(candidatos) > 1:
+            resultado['error'] = 'Hay varios activos con ese código'
+            continue
+        activo = candidatos[0]
+        if activo.pk in vistos:
+            resultado['error'] = 'Activo repetido en el lote'
+            continue
+        vistos.add(activo.pk)
+        if activo.tipo_activo == 'TESIS' and tipo == 'DOMICILIO':
+            resultado['error'] = 'Las Tesis NO se pueden prestar a domicilio. Solo consulta en Sala.'
+            continue
+        actual = actuales.get(activo.pk)
+        if actual is not None:
+            if not (actual.estudiante_id == estudiante.pk and actual.tipo == 'SALA' and tipo == 'DOMICILIO'):
+                resultado.update(
+                    error=f'Libro no disponible: {texto_estado(actual)}',
+                    tipo_prestamo=actual.tipo,
+                    estudiante=actual.estudiante.nombre_completo,
+                )
+                continue
+            a_cerrar.append(actual)
+        prestamo = Prestamo(
+            activo=activo, estudiante=estudiante, usuario_prestamo=usuario, tipo=tipo, observaciones=observaciones,
+        )
+        prestamo.fecha_devolucion_estimada = prestamo.calcular_fecha_devolucion(ahora)
+        nuevos.append(prestamo)
+        resultado.update(ok=True, prestamo=prestamo)
+
+    # Primero cerrar los de sala que pasan a domicilio, para no chocar con prestamo_activo_unico
+    cerrar_en_bloque(a_cerrar, ahora, usuario, OBS_CAMBIO_DOMICILIO)
+    if nuevos:
+        # bulk_create no pasa por save() ni por las señales: historial, eventos y versión a mano
+        Prestamo.objects.bulk_create(nuevos)
+        Prestamo.history.bulk_history_create(nuevos, default_user=usuario, default_date=ahora)
+        eventos.publicar_eventos(eventos.PRESTADO, nuevos)
+        estadisticas.sumar_prestamos(nuevos)
+    if nuevos or a_cerrar:
+        incrementar_version(PRESTAMOS)
+
+    for resultado in resultados:
+        if resultado['ok']:
+            prestamo = resultado['prestamo']
+            resultado.update(
+                prestamo=prestamo.pk, activo=prestamo.activo_id, titulo=prestamo.activo.titulo,
+                fecha_devolucion_estimada=prestamo.fecha_devolucion_estimada,
+            )
+    return resultados
+
+
+def devolver_lote(ids, usuario):
+    """Marca como devueltos los préstamos con esos ids; un resultado por id, en el mismo orden"""
+    ahora = timezone.now()
+    with transaccion_prestamo():
+        prestamos = {
+            prestamo.pk: prestamo
+            for prestamo in Prestamo.objects.select_for_update().filter(pk__in=set(ids)).order_by('pk')
+        }
+        resultados, devueltos, vistos = [], [], set()
+        for pk in ids:
+            prestamo = prestamos.get(pk)
+            if prestamo is None:
+                resultados.append({'prestamo': pk, 'ok': False, 'error': 'No existe el préstamo'})
+            elif pk in vistos:
+                resultados.append({'prestamo': pk, 'ok': False, 'error': 'Préstamo repetido en el lote'})
+            elif prestamo.estado == 'DEVUELTO':
+                resultados.append({'prestamo': pk, 'ok': False, 'error': 'Este material ya fue devuelto'})
+            else:
+                devueltos.append(prestamo)
+                resultados.append({
+                    'prestamo': pk, 'ok': True, 'tipo': prestamo.tipo, 'mensaje': mensaje_devolucion(prestamo),
+                })
+            vistos.add(pk)
+        cerrar_en_bloque(devueltos, ahora, usuario)
+        if devueltos:
+            incrementar_version(PRESTAMOS)
+    return resultados
@@ -0,0 +1,89 @@
+"""
+Lenguaje de consulta por campos para ?search= en libros y tesis.
+
+Ejemplo: autor:garcia materia:"calculo" anio:2015..2020 estado:MALO redes
+
+- campo:valor       texto normalizado que empieza con el valor (sin tildes ni mayúsculas;
+                    usa el índice de la columna *_norm). campo:valor* es lo mismo
+- campo:*valor      texto que contiene el valor en cualquier parte (recorre la tabla)
+- campo:"frase"     frase con espacios
+- codigo:ADM-0025   código exacto; codigo:ADM-* por prefijo
+- anio:2015..2020   rango (también anio:2015, anio:..2010, anio:2015..)
+- estado:MALO       valor exacto de una opción
+
+Los términos sin campo (o con un campo desconocido) siguen usando la búsqueda general.
+Cada vista declara sus campos en `campos_consulta` = {alias: (campo_modelo, tipo)}.
+"""
+import re
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import normalizar_texto
+
+
+TEXTO = 'texto'
+CODIGO = 'codigo'
+OPCION = 'opcion'
+NUMERO = 'numero'
+
+PATRON_TOKEN = re.compile(r'(?:(?P<campo>[^\W\d]\w*):)?(?:"(?P<frase>[^"]*)"?|(?P<valor>\S+))')
+PATRON_RANGO = re.compile(r'^(?P<desde>\d*)\.\.(?P<hasta>\d*)$')
+
+
+def interpretar_consulta(texto, campos_consulta):
+    """
+    Separa la consulta en filtros por campo y términos libres.
+    Devuelve (filtro Q o None, lista de términos libres).
+    """
+    filtro = None
+    terminos = []
+    for match in PATRON_TOKEN.finditer(texto or ''):
+        campo = (match.group('campo') or '').lower()
+        frase = match.group('frase')
+        valor = frase if frase is not None else match.group('valor')
+
+        if campo in campos_consulta:
+            if not valor.strip():
+                continue
+            predicado = predicado_campo(campo, valor.strip(), *campos_consulta[campo])
+            filtro = predicado if filtro is None else filtro & predicado
+        else:
+            termino = match.group(0).replace('"', '')
+            if termino.strip():
+                terminos.append(termino.strip())
+    return filtro, terminos
+
+
+def predicado_campo(alias, valor, campo, tipo):
+    """Traduce campo:valor a un filtro dirigido a una sola columna"""
+    prefijo = valor.endswith('*')
+    contiene = valor.startswith('*')
+    valor_base = valor.strip('*')
+
+    if tipo == TEXTO:
+        normalizado = normalizar_texto(valor_base)
+        lookup = 'contains' if contiene else 'prefijo'
+        return Q(**{f'{campo}_norm__{lookup}': normalizado})
+
+    if tipo == CODIGO:
+        lookup = 'prefijo' if prefijo else 'exact'
+        return Q(**{f'{campo}__{lookup}': valor_base.upper()})
+
+    if tipo == OPCION:
+        return Q(**{campo: valor_base.upper()})
+
+    if tipo == NUMERO:
+        rango = PATRON_RANGO.match(valor_base)
+        if rango:
+            condiciones = {}
+            if rango.group('desde'):
+                condiciones[f'{campo}__gte'] = int(rango.group('desde'))
+            if rango.group('hasta'):
+                condiciones[f'{campo}__lte'] = int(rango.group('hasta'))
+            return Q(**condiciones)
+        if valor_base.isdigit():
+            return Q(**{campo: int(valor_base)})
+        raise ValidationError({'search': f"Valor inválido para '{alias}': {valor}"})
+
+    raise ValueError(f'Tipo de campo de consulta desconocido: {tipo}')
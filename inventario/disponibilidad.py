@@ -0,0 +1,93 @@
+"""
+Conjunto de activos prestados para la consulta pública.
+
+Los ids se guardan en la caché 'catalogo' con la versión de préstamos como llave:
+cada préstamo, devolución o cambio de estado sube la versión (ver signals.py), así
+que el conjunto se vuelve a leer de la base una sola vez por cambio y por proceso.
+Entre cambios, /api/prestados-publico/ cuesta solo la lectura de la versión.
+
+Codificaciones (?codificacion=):
+- lista (por defecto): {"prestados": [3, 4, 5, 9]}
+- rle: inicio y largo de cada tramo consecutivo, el inicio relativo al fin del
+  tramo anterior: [3, 4, 5, 9] -> [3, 3, 3, 1]
+- bitmap: bit i (LSB primero en cada byte) = activo base + i, en base64
+"""
+import base64
+
+from django.core.cache import caches
+from django.db.models import Exists, OuterRef, Subquery
+
+from .models import Prestamo
+from .versiones import ALIAS_CACHE
+
+
+# Estados en los que el activo no está disponible
+ESTADOS_PRESTADO = ('VIGENTE', 'ATRASADO')
+CODIFICACIONES = ('lista', 'rle', 'bitmap')
+
+
+def prestados_actuales():
+    return sorted(set(
+        Prestamo.objects.filter(estado__in=ESTADOS_PRESTADO).values_list('activo_id', flat=True)
+    ))
+
+
+def anotaciones_prestamo():
+    """
+    Estado de préstamo de cada fila del catálogo como subconsultas correlacionadas
+    sobre el índice de prestamo.activo_id (una fila de préstamo por activo como mucho).
+    """
+    actual = Prestamo.objects.filter(activo_id=OuterRef('pk'), estado__in=ESTADOS_PRESTADO).order_by('-fecha_prestamo')
+    return {
+        'prestado': Exists(actual),
+        'prestamo_tipo': Subquery(actual.values('tipo')[:1]),
+        'fecha_devolucion_estimada': Subquery(actual.values('fecha_devolucion_estimada')[:1]),
+        'prestamo_estudiante': Subquery(actual.values('estudiante__nombre_completo')[:1]),
+    }
+
+
+def ids_prestados(version):
+    """Ids prestados (ordenados) para esta versión de préstamos; se leen de la base solo si no están en caché"""
+    cache = caches[ALIAS_CACHE]
+    llave = f'prestados:{version}'
+    ids = cache.get(llave)
+    if ids is None:
+        ids = prestados_actuales()
+        cache.set(llave, ids)
+    return ids
+
+
+def codificar_rle(ids):
+    resultado = []
+    fin_anterior = 0
+    for activo_id in ids:
+        if resultado and activo_id == fin_anterior:
+            resultado[-1] += 1
+        else:
+            resultado.extend([activo_id - fin_anterior, 1])
+        fin_anterior = activo_id + 1
+    return resultado
+
+
+def codificar_bitmap(ids):
+    """Devuelve (base, bitmap en base64)"""
+    if not ids:
+        return 0, ''
+    base = ids[0]
+    bits = bytearray((ids[-1] - base) // 8 + 1)
+    for activo_id in ids:
+        desplazamiento = activo_id - base
+        bits[desplazamiento // 8] |= 1 << (desplazamiento % 8)
+    return base, base64.b64encode(bytes(bits)).decode('ascii')
+
+
+def codificar(ids, codificacion, version):
+    datos = {'version': version, 'total': len(ids)}
+    if codificacion == 'rle':
+        datos.update(codificacion='rle', rle=codificar_rle(ids))
+    elif codificacion == 'bitmap':
+        base, bitmap = codificar_bitmap(ids)
+        datos.update(codificacion='bitmap', base=base, bitmap=bitmap)
+    else:
+        datos['prestados'] = ids
+    return datos
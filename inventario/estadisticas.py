@@ -0,0 +1,164 @@
+"""
+Estadísticas de circulación sobre el resumen diario CirculacionDiaria.
+
+Cada préstamo y cada devolución suman en la misma transacción sobre la fila de
+su día y dimensiones (sumar_prestamos / sumar_devoluciones): un SELECT de las
+dimensiones de los préstamos tocados y un único INSERT ... ON CONFLICT DO UPDATE
+que incrementa los contadores, sin leer la fila antes, así dos mostradores que
+suman a la vez no se pisan. La sintaxis es la misma en PostgreSQL y SQLite.
+
+reporte() lee solo el resumen, que crece con los días y las combinaciones
+usadas, no con la cantidad de préstamos. recalcular() lo reconstruye desde
+Prestamo para un rango de días (comando `recalcular_circulacion`): hay que
+ejecutarlo una vez al instalar y después solo si se corrigen préstamos a mano,
+fuera del horario de atención (en PostgreSQL, lo que sumen los mostradores en
+esos días mientras corre puede perderse).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CirculacionDiaria, Prestamo
+
+
+DIMENSIONES = ('tipo_activo', 'tipo', 'carrera', 'facultad', 'materia')
+AGRUPACIONES = ('dia',) + DIMENSIONES
+
+# Columnas de Prestamo que llenan cada dimensión
+ORIGEN_DIMENSIONES = {
+    'tipo_activo': 'activo__tipo_activo',
+    'tipo': 'tipo',
+    'carrera': 'estudiante__carrera',
+    'facultad': 'activo__facultad',
+    'materia': 'activo__libro__materia',
+}
+
+
+def clave(fecha, fila):
+    return (fecha,) + tuple(fila[ORIGEN_DIMENSIONES[dimension]] or '' for dimension in DIMENSIONES)
+
+
+def sumar_prestamos(prestamos):
+    """Suma los préstamos recién creados al resumen de su día"""
+    filas = Prestamo.objects.filter(pk__in=[prestamo.pk for prestamo in prestamos]).values(
+        'fecha_prestamo', *ORIGEN_DIMENSIONES.values(),
+    )
+    sumas = defaultdict(lambda: [0, 0, 0])
+    for fila in filas:
+        sumas[clave(timezone.localdate(fila['fecha_prestamo']), fila)][0] += 1
+    incrementar(sumas)
+
+
+def sumar_devoluciones(prestamos):
+    """Suma las devoluciones (ya guardadas con fecha_devolucion_real) y su duración"""
+    filas = Prestamo.objects.filter(pk__in=[prestamo.pk for prestamo in prestamos]).values(
+        'fecha_prestamo', 'fecha_devolucion_real', *ORIGEN_DIMENSIONES.values(),
+    )
+    sumas = defaultdict(lambda: [0, 0, 0])
+    for fila in filas:
+        suma = sumas[clave(timezone.localdate(fila['fecha_devolucion_real']), fila)]
+        suma[1] += 1
+        suma[2] += int((fila['fecha_devolucion_real'] - fila['fecha_prestamo']).total_seconds())
+    incrementar(sumas)
+
+
+def incrementar(sumas):
+    """INSERT ... ON CONFLICT que suma {(fecha, *dimensiones): [prestamos, devoluciones, segundos]}"""
+    if not sumas:
+        return
+    tabla = connection.ops.quote_name(CirculacionDiaria._meta.db_table)
+    columnas = ('fecha',) + DIMENSIONES
+    contadores = ('prestamos', 'devoluciones', 'duracion_segundos')
+    fila = '(' + ', '.join(['%s'] * (len(columnas) + len(contadores))) + ')'
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(columnas + contadores)}) "
+        f"VALUES {', '.join([fila] * len(sumas))} "
+        f"ON CONFLICT ({', '.join(columnas)}) DO UPDATE SET "
+        + ', '.join(f'{columna} = {tabla}.{columna} + EXCLUDED.{columna}' for columna in contadores)
+    )
+    parametros = [valor for llave, suma in sumas.items() for valor in (*llave, *suma)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+
+
+def limites(desde, hasta):
+    """Rango [desde 00:00, hasta+1 00:00) en la zona horaria local, para filtrar por índice"""
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return inicio, fin
+
+
+def recalcular(desde, hasta):
+    """Reconstruye el resumen de los días [desde, hasta] agrupando Prestamo en la base; devuelve las filas"""
+    with transaction.atomic():
+        inicio, fin = limites(desde, hasta)
+        sumas = defaultdict(lambda: [0, 0, 0])
+        prestados = (
+            Prestamo.objects.filter(fecha_prestamo__gte=inicio, fecha_prestamo__lt=fin)
+            .annotate(dia=TruncDate('fecha_prestamo'))
+            .values('dia', *ORIGEN_DIMENSIONES.values())
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        for fila in prestados:
+            sumas[clave(fila['dia'], fila)][0] += fila['total']
+        devueltos = (
+            Prestamo.objects.filter(fecha_devolucion_real__gte=inicio, fecha_devolucion_real__lt=fin)
+            .annotate(dia=TruncDate('fecha_devolucion_real'))
+            .values('dia', *ORIGEN_DIMENSIONES.values())
+            .annotate(total=Count('pk'), duracion=Sum(F('fecha_devolucion_real') - F('fecha_prestamo')))
+            .order_by()
+        )
+        for fila in devueltos:
+            suma = sumas[clave(fila['dia'], fila)]
+            suma[1] += fila['total']
+            suma[2] += int(fila['duracion'].total_seconds())
+
+        CirculacionDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        CirculacionDiaria.objects.bulk_create(
+            [
+                CirculacionDiaria(
+                    **dict(zip(('fecha',) + DIMENSIONES, llave)),
+                    prestamos=prestamos, devoluciones=devoluciones, duracion_segundos=segundos,
+                )
+                for llave, (prestamos, devoluciones, segundos) in sumas.items()
+            ],
+            batch_size=1000,
+        )
+        return len(sumas)
+
+
+def totales(fila):
+    devoluciones = fila['total_devoluciones'] or 0
+    return {
+        'prestamos': fila['total_prestamos'] or 0,
+        'devoluciones': devoluciones,
+        # Duración media de los préstamos devueltos, en horas
+        'duracion_promedio_horas': (
+            round(fila['total_duracion'] / devoluciones / 3600, 1) if devoluciones else None
+        ),
+    }
+
+
+def reporte(desde, hasta, agrupaciones=('dia',), filtros=None):
+    """
+    Totales del rango y, por cada agrupación ('dia' o una dimensión), una fila por
+    valor: prestamos, devoluciones y duracion_promedio_horas. Una consulta por agrupación.
+    """
+    resumen = CirculacionDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta, **(filtros or {}))
+    sumas = {
+        'total_prestamos': Sum('prestamos'),
+        'total_devoluciones': Sum('devoluciones'),
+        'total_duracion': Sum('duracion_segundos'),
+    }
+    grupos = {}
+    for agrupacion in agrupaciones:
+        columna = 'fecha' if agrupacion == 'dia' else agrupacion
+        filas = resumen.values(columna).annotate(**sumas)
+        filas = filas.order_by(columna) if agrupacion == 'dia' else filas.order_by('-total_prestamos', columna)
+        grupos[agrupacion] = [{'valor': fila[columna], **totales(fila)} for fila in filas]
+    return {'totales': totales(resumen.aggregate(**sumas)), 'grupos': grupos}
@@ -0,0 +1,220 @@
+"""
+Eventos de disponibilidad para la consulta pública (Server-Sent Events).
+
+Cada préstamo, devolución o paso a ATRASADO se guarda en EventoPrestamo dentro
+de la misma transacción que el cambio (publicar_evento). El stream
+/api/prestados-publico/eventos/ envía primero una foto con los ids prestados y después
+solo los eventos nuevos.
+
+Para que muchos kioscos no multipliquen las consultas, cada proceso tiene un
+único CanalPrestamos: como mucho una consulta "id > último" por intervalo, hecha
+por el primer stream que la necesite, y el resto espera en una Condition. Los
+eventos publicados en el mismo proceso despiertan a los streams al confirmarse
+la transacción, sin esperar al intervalo. Cada conexión dura un minuto; el
+navegador (EventSource) reconecta solo y recibe una foto nueva. La foto sale de
+disponibilidad.ids_prestados(), en caché por versión de préstamos: muchos
+kioscos reconectando leen la base una vez por cambio.
+
+En PostgreSQL los ids de EventoPrestamo se asignan al insertar y no al confirmar:
+un evento con id menor puede confirmar después de que "id > último" ya avanzó, y
+el canal no lo vuelve a leer. Lo que garantiza la convergencia es la foto: se
+lee de la tabla de préstamos (no de los eventos) en cada reconexión, así que un
+kiosco que perdió un evento queda al día en como mucho `duracion` segundos.
+
+Un stream abierto ocupa un hilo del servidor (gunicorn con workers gthread, ver
+gunicorn.conf.py). Cada proceso admite como mucho EVENTOS_STREAMS_POR_PROCESO
+streams a la vez; los kioscos que no entran reciben la foto, un `retry` más largo
+y la conexión se cierra: pasan a consultar cada tanto sin ocupar un hilo.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .disponibilidad import ids_prestados
+from .models import EventoPrestamo
+from .versiones import versiones_actuales, PRESTAMOS
+
+
+PRESTADO = 'PRESTADO'
+DEVUELTO = 'DEVUELTO'
+ATRASADO = 'ATRASADO'
+
+# Los eventos más viejos que esto se borran al publicar (los clientes nuevos parten de la foto)
+RETENCION_EVENTOS = timedelta(days=1)
+PURGAR_CADA = 500
+
+
+def publicar_evento(tipo, prestamo):
+    """Registra el evento en la transacción actual y avisa a los streams al confirmarla"""
+    evento = EventoPrestamo.objects.create(tipo=tipo, activo_id=prestamo.activo_id, prestamo_id=prestamo.pk)
+    if evento.pk % PURGAR_CADA == 0:
+        EventoPrestamo.objects.filter(fecha__lt=timezone.now() - RETENCION_EVENTOS).delete()
+    transaction.on_commit(canal.avisar)
+    return evento
+
+
+def publicar_eventos(tipo, prestamos):
+    """Versión en lote para transiciones masivas (por ejemplo, préstamos que pasan a ATRASADO)"""
+    eventos = EventoPrestamo.objects.bulk_create([
+        EventoPrestamo(tipo=tipo, activo_id=prestamo.activo_id, prestamo_id=prestamo.pk)
+        for prestamo in prestamos
+    ])
+    if eventos:
+        transaction.on_commit(canal.avisar)
+    return eventos
+
+
+class CanalPrestamos:
+    """Lee los eventos nuevos de la base y los reparte entre los streams del proceso"""
+    intervalo = 1.0
+    capacidad = 1000
+    lote = 500
+
+    def __init__(self):
+        self.condicion = threading.Condition()
+        self.eventos = deque()
+        # Los eventos con id > inicio y <= ultimo_id están todos en `eventos`
+        self.inicio = None
+        self.ultimo_id = None
+        self.ultima_consulta = 0.0
+        self.consultando = False
+        self.pendiente = False
+        self.streams = 0
+
+    def tomar_lugar(self, limite):
+        """Reserva un lugar para un stream; False si el proceso ya tiene `limite` abiertos"""
+        with self.condicion:
+            if limite is not None and self.streams >= limite:
+                return False
+            self.streams += 1
+            return True
+
+    def soltar_lugar(self):
+        with self.condicion:
+            self.streams -= 1
+
+    def avisar(self):
+        with self.condicion:
+            self.pendiente = True
+            self.condicion.notify_all()
+
+    def actualizar(self):
+        """Consulta la base si toca (un solo hilo a la vez, una vez por intervalo o tras un aviso)"""
+        with self.condicion:
+            vencido = time.monotonic() - self.ultima_consulta >= self.intervalo
+            if self.consultando or not (vencido or self.pendiente or self.ultimo_id is None):
+                return
+            self.consultando = True
+            self.pendiente = False
+            desde = self.ultimo_id
+
+        nuevos = []
+        try:
+            if desde is None:
+                ultimo = EventoPrestamo.objects.order_by('-id').values_list('id', flat=True).first()
+                desde = ultimo or 0
+            else:
+                nuevos = list(
+                    EventoPrestamo.objects.filter(id__gt=desde).order_by('id')
+                    .values_list('id', 'tipo', 'activo_id', 'prestamo_id')[:self.lote]
+                )
+        finally:
+            with self.condicion:
+                if self.inicio is None:
+                    self.inicio = desde
+                self.eventos.extend(nuevos)
+                while len(self.eventos) > self.capacidad:
+                    self.inicio = self.eventos.popleft()[0]
+                self.ultimo_id = nuevos[-1][0] if nuevos else desde
+                self.ultima_consulta = time.monotonic()
+                self.consultando = False
+                # Quedan más: que la próxima vuelta consulte sin esperar
+                self.pendiente = self.pendiente or len(nuevos) == self.lote
+                self.condicion.notify_all()
+
+    def posicion(self):
+        """Id del último evento conocido (para marcar la foto inicial)"""
+        self.actualizar()
+        with self.condicion:
+            return self.ultimo_id
+
+    def esperar(self, desde, timeout):
+        """
+        Eventos con id > desde, esperando como mucho `timeout` segundos.
+        Devuelve None si `desde` ya salió del buffer (el cliente debe recibir otra foto).
+        """
+        fin = time.monotonic() + timeout
+        while True:
+            self.actualizar()
+            with self.condicion:
+                if self.inicio is not None and desde < self.inicio:
+                    return None
+                nuevos = [evento for evento in self.eventos if evento[0] > desde]
+                restante = fin - time.monotonic()
+                if nuevos or restante <= 0:
+                    return nuevos
+                self.condicion.wait(min(restante, self.intervalo))
+
+    def reiniciar(self):
+        with self.condicion:
+            self.__init__()
+
+
+canal = CanalPrestamos()
+
+
+def mensaje_sse(evento, datos, evento_id=None):
+    lineas = []
+    if evento_id is not None:
+        lineas.append(f'id: {evento_id}')
+    lineas.append(f'event: {evento}')
+    lineas.append(f'data: {json.dumps(datos, separators=(",", ":"))}')
+    return '\n'.join(lineas) + '\n\n'
+
+
+def stream_prestamos(duracion=60, latido=15, reintento=3000, limite=None, reintento_sin_lugar=15000):
+    """
+    Generador SSE: una foto ("snapshot") y luego un mensaje por evento
+    ("prestado", "devuelto", "atrasado"). Envía comentarios de latido para que
+    los proxies no corten la conexión y termina a los `duracion` segundos.
+    Si ya hay `limite` streams abiertos en el proceso envía solo la foto y pide
+    reconectar en `reintento_sin_lugar` milisegundos.
+    """
+    fin = time.monotonic() + duracion
+
+    def foto():
+        posicion = canal.posicion()
+        datos = {'prestados': ids_prestados(versiones_actuales(PRESTAMOS)[PRESTAMOS])}
+        return posicion, mensaje_sse('snapshot', datos, posicion)
+
+    con_lugar = canal.tomar_lugar(limite)
+    try:
+        yield f'retry: {reintento}\n\n'
+        posicion, mensaje = foto()
+        yield mensaje
+        if not con_lugar:
+            yield f'retry: {reintento_sin_lugar}\n\n'
+            return
+
+        while True:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            nuevos = canal.esperar(posicion, min(latido, restante))
+            if nuevos is None:
+                posicion, mensaje = foto()
+                yield mensaje
+            elif not nuevos:
+                yield ': latido\n\n'
+            else:
+                for evento_id, tipo, activo_id, prestamo_id in nuevos:
+                    yield mensaje_sse(tipo.lower(), {'activo': activo_id, 'prestamo': prestamo_id}, evento_id)
+                posicion = nuevos[-1][0]
+    finally:
+        if con_lugar:
+            canal.soltar_lugar()
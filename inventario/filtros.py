@@ -0,0 +1,110 @@
+import django_filters
+
+from .models import ActivoBibliografico, Estudiante, Libro, TrabajoGrado, normalizar_texto
+
+
+class TextoNormalizadoFilter(django_filters.CharFilter):
+    """
+    Filtra sobre la columna sombra <campo>_norm con el valor normalizado,
+    así "educacion" encuentra "EDUCACIÓN". Por defecto por prefijo o exacto, que
+    usan el índice de la columna normalizada; 'contains' (LIKE '%x%') recorre la
+    tabla y solo se usa en los filtros que lo piden por nombre (__icontains).
+    """
+
+    def __init__(self, *args, lookup_expr='prefijo', **kwargs):
+        super().__init__(*args, lookup_expr=lookup_expr, **kwargs)
+
+    def filter(self, qs, value):
+        value = normalizar_texto(value)
+        if not value:
+            return qs
+        return qs.filter(**{f'{self.field_name}_norm__{self.lookup_expr}': value})
+
+
+class PrefijoFilter(django_filters.CharFilter):
+    """
+    Filtra por prefijo sobre una columna con índice (lookup `prefijo`, ver models.py);
+    con lookup_expr='prefijo_codigo' el valor se pasa a mayúsculas.
+    """
+
+    def __init__(self, *args, lookup_expr='prefijo', **kwargs):
+        super().__init__(*args, lookup_expr=lookup_expr, **kwargs)
+
+    def filter(self, qs, value):
+        value = (value or '').strip()
+        if not value:
+            return qs
+        return qs.filter(**{f'{self.field_name}__{self.lookup_expr}': value})
+
+
+class LibroFilter(django_filters.FilterSet):
+    # ?titulo=, ?materia=... por prefijo (con índice); __icontains busca en cualquier parte
+    codigo_nuevo__istartswith = PrefijoFilter(field_name='codigo_nuevo', lookup_expr='prefijo_codigo')
+    titulo = TextoNormalizadoFilter(field_name='titulo')
+    materia = TextoNormalizadoFilter(field_name='materia')
+    facultad = TextoNormalizadoFilter(field_name='facultad')
+    editorial = TextoNormalizadoFilter(field_name='editorial')
+    titulo__icontains = TextoNormalizadoFilter(field_name='titulo', lookup_expr='contains')
+    titulo__istartswith = TextoNormalizadoFilter(field_name='titulo')
+    materia__icontains = TextoNormalizadoFilter(field_name='materia', lookup_expr='contains')
+    materia__istartswith = TextoNormalizadoFilter(field_name='materia')
+    materia__iexact = TextoNormalizadoFilter(field_name='materia', lookup_expr='exact')
+    facultad__icontains = TextoNormalizadoFilter(field_name='facultad', lookup_expr='contains')
+    facultad__iexact = TextoNormalizadoFilter(field_name='facultad', lookup_expr='exact')
+    editorial__icontains = TextoNormalizadoFilter(field_name='editorial', lookup_expr='contains')
+    editorial__istartswith = TextoNormalizadoFilter(field_name='editorial')
+
+    class Meta:
+        model = Libro
+        fields = {
+            'codigo_nuevo': ['exact', 'icontains'],
+            'ubicacion_seccion': ['exact'],
+            'estado': ['exact'],
+            'anio': ['exact'],
+        }
+
+
+class TrabajoGradoFilter(django_filters.FilterSet):
+    # ?titulo=, ?autor=... por prefijo (con índice); __icontains busca en cualquier parte
+    codigo_nuevo__istartswith = PrefijoFilter(field_name='codigo_nuevo', lookup_expr='prefijo_codigo')
+    titulo = TextoNormalizadoFilter(field_name='titulo')
+    autor = TextoNormalizadoFilter(field_name='autor')
+    carrera = TextoNormalizadoFilter(field_name='carrera')
+    tutor = TextoNormalizadoFilter(field_name='tutor')
+    facultad = TextoNormalizadoFilter(field_name='facultad')
+    titulo__icontains = TextoNormalizadoFilter(field_name='titulo', lookup_expr='contains')
+    titulo__istartswith = TextoNormalizadoFilter(field_name='titulo')
+    autor__icontains = TextoNormalizadoFilter(field_name='autor', lookup_expr='contains')
+    autor__istartswith = TextoNormalizadoFilter(field_name='autor')
+    carrera__icontains = TextoNormalizadoFilter(field_name='carrera', lookup_expr='contains')
+    carrera__iexact = TextoNormalizadoFilter(field_name='carrera', lookup_expr='exact')
+    tutor__icontains = TextoNormalizadoFilter(field_name='tutor', lookup_expr='contains')
+    tutor__istartswith = TextoNormalizadoFilter(field_name='tutor')
+    facultad__icontains = TextoNormalizadoFilter(field_name='facultad', lookup_expr='contains')
+    facultad__iexact = TextoNormalizadoFilter(field_name='facultad', lookup_expr='exact')
+
+    class Meta:
+        model = TrabajoGrado
+        fields = {
+            'codigo_nuevo': ['exact', 'icontains'],
+            'modalidad': ['exact'],
+            'estado': ['exact'],
+        }
+
+
+class ActivoFilter(django_filters.FilterSet):
+    # ?tipo=LIBRO o ?tipo=TESIS sobre la columna indexada tipo_activo
+    tipo = django_filters.ChoiceFilter(field_name='tipo_activo', choices=ActivoBibliografico.TIPO_CHOICES)
+
+    class Meta:
+        model = ActivoBibliografico
+        fields = ['estado']
+
+
+class EstudianteFilter(django_filters.FilterSet):
+    carnet = PrefijoFilter(field_name='carnet_universitario')
+    ci = PrefijoFilter(field_name='ci')
+
+    class Meta:
+        model = Estudiante
+        fields = ['carrera']
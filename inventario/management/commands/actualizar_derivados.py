@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventario.autocompletado import indexar_autocompletado
+from inventario.busqueda import indexar_activo
+from inventario.models import Libro, TrabajoGrado, valores_derivados
+from inventario.versiones import incrementar_version, LIBROS, TESIS
+
+
+class Command(BaseCommand):
+    help = 'Recalcula columnas derivadas (orden natural, textos normalizados) e índices de búsqueda y autocompletado'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500)
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        for Modelo, familia in ((Libro, LIBROS), (TrabajoGrado, TESIS)):
+            pendientes = []
+            campos = set()
+            total = 0
+            with transaction.atomic():
+                for activo in Modelo.objects.iterator(chunk_size=lote):
+                    derivados = valores_derivados(activo)
+                    for campo, valor in derivados.items():
+                        setattr(activo, campo, valor)
+                    campos.update(derivados)
+                    pendientes.append(activo)
+                    indexar_activo(activo)
+                    indexar_autocompletado(activo)
+                    if len(pendientes) >= lote:
+                        total += Modelo.objects.bulk_update(pendientes, sorted(campos))
+                        pendientes = []
+                if pendientes:
+                    total += Modelo.objects.bulk_update(pendientes, sorted(campos))
+                # bulk_update no dispara señales: invalidar las lecturas condicionales a mano
+                incrementar_version(familia)
+
+            self.stdout.write(self.style.SUCCESS(f'✅ {Modelo._meta.verbose_name_plural}: {total} registros actualizados'))
@@ -0,0 +1,145 @@
+"""
+Prueba de carga del registro de préstamos.
+
+Varios procesos, cada uno con varios hilos, prestan y devuelven a la vez unos
+pocos activos a través de la misma vista que usa el mostrador (PrestamoViewSet).
+Al final se verifica en la base que ningún activo tuvo dos préstamos superpuestos
+y se informa el rendimiento. Pensado para correr contra PostgreSQL (staging):
+crea sus propios activos y estudiantes con el prefijo CARGA- y los borra al terminar.
+"""
+import multiprocessing
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from inventario.models import Estudiante, Libro, Prestamo
+from inventario.views import PrestamoViewSet
+
+
+PREFIJO = 'CARGA-'
+
+
+def trabajador(usuario_id, activos, estudiantes, operaciones, semilla):
+    """Un hilo: intenta prestar un activo al azar y, si lo consigue, lo devuelve"""
+    fabrica = APIRequestFactory()
+    crear = PrestamoViewSet.as_view({'post': 'create'})
+    devolver = PrestamoViewSet.as_view({'post': 'devolver'})
+    azar = random.Random(semilla)
+    conteo = Counter()
+    try:
+        usuario = User.objects.get(pk=usuario_id)
+        for _ in range(operaciones):
+            datos = {'activo': azar.choice(activos), 'estudiante': azar.choice(estudiantes), 'tipo': 'SALA'}
+            solicitud = fabrica.post('/api/prestamos/', datos, format='json')
+            force_authenticate(solicitud, user=usuario)
+            try:
+                respuesta = crear(solicitud)
+                if respuesta.status_code == 201:
+                    conteo['prestados'] += 1
+                    solicitud = fabrica.post(f"/api/prestamos/{respuesta.data['id']}/devolver/")
+                    force_authenticate(solicitud, user=usuario)
+                    respuesta = devolver(solicitud, pk=respuesta.data['id'])
+                    conteo['devueltos' if respuesta.status_code == 200 else 'errores'] += 1
+                elif respuesta.status_code == 400:
+                    conteo['rechazados'] += 1
+                else:
+                    conteo['errores'] += 1
+            except Exception:
+                conteo['errores'] += 1
+    finally:
+        connections.close_all()
+    return conteo
+
+
+def proceso(usuario_id, activos, estudiantes, hilos, operaciones, semilla):
+    """Un proceso con `hilos` trabajadores; devuelve el conteo sumado"""
+    with ThreadPoolExecutor(hilos) as ejecutor:
+        conteos = ejecutor.map(
+            lambda i: trabajador(usuario_id, activos, estudiantes, operaciones, semilla * 1000 + i),
+            range(hilos),
+        )
+        return sum(conteos, Counter())
+
+
+def prestamos_superpuestos(activos):
+    """Cuenta los préstamos que empezaron antes de que se devolviera el anterior del mismo activo"""
+    superpuestos = 0
+    anterior = {}
+    prestamos = Prestamo.objects.filter(activo_id__in=activos).order_by('activo_id', 'fecha_prestamo', 'pk')
+    for prestamo in prestamos.only('activo_id', 'fecha_prestamo', 'fecha_devolucion_real'):
+        previo = anterior.get(prestamo.activo_id)
+        if previo is not None and (
+            previo.fecha_devolucion_real is None or prestamo.fecha_prestamo < previo.fecha_devolucion_real
+        ):
+            superpuestos += 1
+        anterior[prestamo.activo_id] = prestamo
+    return superpuestos
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga concurrente de préstamos: verifica que no haya préstamos dobles y mide el rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activos', type=int, default=10, help='Activos en disputa (pocos = más choques)')
+        parser.add_argument('--estudiantes', type=int, default=20)
+        parser.add_argument('--procesos', type=int, default=4)
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos por proceso')
+        parser.add_argument('--operaciones', type=int, default=50, help='Intentos de préstamo por hilo')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--conservar', action='store_true', help='No borrar los datos de la prueba')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            usuario, _ = User.objects.get_or_create(username=f'{PREFIJO}mostrador'.lower())
+            activos = [
+                Libro.objects.create(titulo=f'{PREFIJO}{i}', codigo_nuevo=f'{PREFIJO}{i}').pk
+                for i in range(options['activos'])
+            ]
+            estudiantes = [
+                Estudiante.objects.create(
+                    nombre_completo=f'{PREFIJO}{i}', carnet_universitario=f'{PREFIJO}{i}',
+                    ci=f'{PREFIJO}{i}', carrera='Prueba de carga',
+                ).pk
+                for i in range(options['estudiantes'])
+            ]
+
+        argumentos = [
+            (usuario.pk, activos, estudiantes, options['hilos'], options['operaciones'], options['semilla'] + n)
+            for n in range(options['procesos'])
+        ]
+        # Los procesos hijos abren sus propias conexiones
+        connections.close_all()
+        inicio = time.perf_counter()
+        if options['procesos'] > 1:
+            with multiprocessing.get_context('fork').Pool(options['procesos']) as pool:
+                conteos = pool.starmap(proceso, argumentos)
+        else:
+            conteos = [proceso(*argumentos[0])]
+        duracion = time.perf_counter() - inicio
+        total = sum(conteos, Counter())
+
+        superpuestos = prestamos_superpuestos(activos)
+        intentos = total['prestados'] + total['rechazados'] + total['errores']
+        self.stdout.write(
+            f"{intentos} intentos en {duracion:.2f} s ({intentos / duracion:.0f}/s): "
+            f"{total['prestados']} prestados, {total['devueltos']} devueltos, "
+            f"{total['rechazados']} rechazados por estar prestados, {total['errores']} errores, "
+            f"{superpuestos} préstamos superpuestos"
+        )
+
+        if not options['conservar']:
+            with transaction.atomic():
+                Prestamo.objects.filter(activo_id__in=activos).delete()
+                for libro in Libro.objects.filter(pk__in=activos):
+                    libro.delete()
+                Estudiante.objects.filter(pk__in=estudiantes).delete()
+
+        if superpuestos or total['errores']:
+            raise CommandError('La prueba de carga encontró préstamos dobles o errores')
+        self.stdout.write(self.style.SUCCESS('✅ Sin préstamos dobles'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventario.vencimientos import LOTE_BARRIDO, marcar_atrasados
+
+
+class Command(BaseCommand):
+    help = 'Pasa a ATRASADO los préstamos vigentes cuyo plazo de devolución ya venció (para programar con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_BARRIDO)
+
+    def handle(self, *args, **options):
+        total = marcar_atrasados(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} préstamos marcados como ATRASADO'))
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from inventario.estadisticas import recalcular
+from inventario.models import Prestamo
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye el resumen diario de circulación desde los préstamos '
+        '(una vez al instalar, o tras corregir préstamos a mano)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='AAAA-MM-DD (por defecto, el primer préstamo)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='AAAA-MM-DD (por defecto, hoy)')
+
+    def handle(self, *args, **options):
+        hasta = options['hasta'] or timezone.localdate()
+        desde = options['desde']
+        if desde is None:
+            primero = Prestamo.objects.aggregate(primero=Min('fecha_prestamo'))['primero']
+            desde = timezone.localdate(primero) if primero else hasta
+        if desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+        filas = recalcular(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f'✅ Resumen de circulación del {desde} al {hasta}: {filas} filas'))
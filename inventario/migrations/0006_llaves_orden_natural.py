@@ -0,0 +1,93 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:25
+
+import re
+
+from django.db import migrations, models
+
+
+# Copia congelada de las llaves de orden de models.py a la fecha de esta migración:
+# las migraciones reciben modelos históricos y no deben depender del código vivo.
+ANCHO_NUMERO_ORDEN = 10
+MAX_GRUPOS_ORDEN = 20
+LLAVE_SIN_CODIGO = '1'
+
+
+def _numeros_orden(codigo):
+    numeros = re.findall(r'\d+', codigo)[:MAX_GRUPOS_ORDEN]
+    tope = 10 ** ANCHO_NUMERO_ORDEN - 1
+    return ''.join(str(min(int(n), tope)).zfill(ANCHO_NUMERO_ORDEN) for n in numeros)
+
+
+def llave_orden_seccion(codigo):
+    if not codigo or not codigo.strip():
+        return LLAVE_SIN_CODIGO
+    return '0' + _numeros_orden(codigo)
+
+
+def llave_orden_codigo(codigo):
+    if not codigo or not codigo.strip():
+        return LLAVE_SIN_CODIGO
+    match = re.match(r'([A-Z]+)', codigo.upper())
+    prefijo = match.group(1) if match else ''
+    return '0' + prefijo[:20] + _numeros_orden(codigo)
+
+
+def calcular_llaves_orden(apps, schema_editor):
+    """Rellena las llaves de orden natural de los registros existentes"""
+    ActivoBibliografico = apps.get_model('inventario', 'ActivoBibliografico')
+    Libro = apps.get_model('inventario', 'Libro')
+
+    activos = list(ActivoBibliografico.objects.only('id', 'codigo_nuevo'))
+    for activo in activos:
+        activo.orden_codigo = llave_orden_codigo(activo.codigo_nuevo)
+    ActivoBibliografico.objects.bulk_update(activos, ['orden_codigo'], batch_size=500)
+
+    libros = list(Libro.objects.only('pk', 'codigo_seccion_full'))
+    for libro in libros:
+        libro.orden_seccion = llave_orden_seccion(libro.codigo_seccion_full)
+    Libro.objects.bulk_update(libros, ['orden_seccion'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_estudiante_prestamo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activobibliografico',
+            name='orden_codigo',
+            field=models.CharField(db_index=True, default='1', editable=False, max_length=255, verbose_name='Orden por Código'),
+        ),
+        migrations.AddField(
+            model_name='historicalactivobibliografico',
+            name='orden_codigo',
+            field=models.CharField(db_index=True, default='1', editable=False, max_length=255, verbose_name='Orden por Código'),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='orden_codigo',
+            field=models.CharField(db_index=True, default='1', editable=False, max_length=255, verbose_name='Orden por Código'),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='orden_seccion',
+            field=models.CharField(db_index=True, default='1', editable=False, max_length=255, verbose_name='Orden por Sección'),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='orden_codigo',
+            field=models.CharField(db_index=True, default='1', editable=False, max_length=255, verbose_name='Orden por Código'),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='orden_seccion',
+            field=models.CharField(db_index=True, default='1', editable=False, max_length=255, verbose_name='Orden por Sección'),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['orden_seccion', 'orden_importacion'], name='libro_orden_natural_idx'),
+        ),
+        migrations.RunPython(calcular_llaves_orden, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+import unicodedata
+
+from django.db import migrations
+
+
+# Copia congelada de busqueda.py a la fecha de esta migración: las migraciones
+# reciben modelos históricos y no deben depender del código vivo.
+TABLA_INDICE = 'inventario_indice_busqueda'
+CONFIGURACION_PG = 'spanish'
+CAMPOS_POR_PESO = (
+    ('A', ['titulo', 'autor']),
+    ('B', ['codigo_nuevo', 'codigo_antiguo', 'codigo_seccion_full', 'tutor', 'materia', 'carrera', 'editorial']),
+    ('C', ['facultad', 'modalidad', 'edicion', 'ubicacion_seccion', 'ubicacion_repisa', 'estado']),
+    ('D', ['observaciones']),
+)
+
+
+def normalizar_texto(texto):
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().strip().split())
+
+
+def crear_indice(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE TABLE {TABLA_INDICE} ('
+            ' activo_id bigint PRIMARY KEY REFERENCES inventario_activobibliografico (id)'
+            ' ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+            ' documento tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {TABLA_INDICE}_gin ON {TABLA_INDICE} USING GIN (documento)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {TABLA_INDICE} USING fts5('
+            'peso_a, peso_b, peso_c, peso_d, tokenize="unicode61 remove_diacritics 2")'
+        )
+
+
+def indexar(cursor, vendor, activo):
+    textos = [
+        ' '.join(normalizar_texto(getattr(activo, campo, None)) for campo in campos).strip()
+        for _, campos in CAMPOS_POR_PESO
+    ]
+    if vendor == 'postgresql':
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{CONFIGURACION_PG}', %s), '{peso}')" for peso, _ in CAMPOS_POR_PESO
+        )
+        cursor.execute(
+            f'INSERT INTO {TABLA_INDICE} (activo_id, documento) VALUES (%s, {vector})', [activo.pk, *textos]
+        )
+    elif vendor == 'sqlite':
+        cursor.execute(
+            f'INSERT INTO {TABLA_INDICE} (rowid, peso_a, peso_b, peso_c, peso_d) VALUES (%s, %s, %s, %s, %s)',
+            [activo.pk, *textos],
+        )
+
+
+def crear_y_poblar_indice(apps, schema_editor):
+    """Crea el índice de texto completo e indexa el catálogo existente"""
+    crear_indice(schema_editor)
+    connection = schema_editor.connection
+    for nombre in ('Libro', 'TrabajoGrado'):
+        Modelo = apps.get_model('inventario', nombre)
+        with connection.cursor() as cursor:
+            for activo in Modelo.objects.using(connection.alias).iterator(chunk_size=500):
+                indexar(cursor, connection.vendor, activo)
+
+
+def quitar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_llaves_orden_natural'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_y_poblar_indice, quitar_indice),
+    ]
@@ -0,0 +1,89 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# Copia congelada de busqueda.py a la fecha de esta migración: las migraciones
+# reciben modelos históricos y no deben depender del código vivo.
+TABLA_DIFUSO = 'inventario_indice_difuso'
+CAMPOS_DIFUSO = ['titulo', 'autor', 'tutor']
+
+
+def normalizar_texto(texto):
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().strip().split())
+
+
+def trigramas(texto):
+    resultado = set()
+    for palabra in re.findall(r'\w+', normalizar_texto(texto)):
+        relleno = f'  {palabra} '
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
+
+
+def crear_indice_difuso(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE TABLE {TABLA_DIFUSO} ('
+            ' activo_id bigint PRIMARY KEY REFERENCES inventario_activobibliografico (id)'
+            ' ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+            ' texto text NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {TABLA_DIFUSO}_trgm ON {TABLA_DIFUSO} USING GIN (texto gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE TABLE {TABLA_DIFUSO} ('
+            ' trigrama text NOT NULL,'
+            ' activo_id integer NOT NULL,'
+            ' PRIMARY KEY (trigrama, activo_id)) WITHOUT ROWID'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {TABLA_DIFUSO}_activo ON {TABLA_DIFUSO} (activo_id, trigrama)'
+        )
+
+
+def indexar(cursor, vendor, activo):
+    texto = ' '.join(normalizar_texto(getattr(activo, campo, None)) for campo in CAMPOS_DIFUSO).strip()
+    if vendor == 'postgresql':
+        cursor.execute(f'INSERT INTO {TABLA_DIFUSO} (activo_id, texto) VALUES (%s, %s)', [activo.pk, texto])
+    elif vendor == 'sqlite':
+        cursor.executemany(
+            f'INSERT INTO {TABLA_DIFUSO} (trigrama, activo_id) VALUES (%s, %s)',
+            [(trigrama, activo.pk) for trigrama in trigramas(texto)],
+        )
+
+
+def crear_y_poblar_indice_difuso(apps, schema_editor):
+    """Crea el índice de trigramas (título, autor, tutor) e indexa el catálogo existente"""
+    crear_indice_difuso(schema_editor)
+    connection = schema_editor.connection
+    for nombre in ('Libro', 'TrabajoGrado'):
+        Modelo = apps.get_model('inventario', nombre)
+        with connection.cursor() as cursor:
+            for activo in Modelo.objects.using(connection.alias).iterator(chunk_size=500):
+                indexar(cursor, connection.vendor, activo)
+
+
+def quitar_indice_difuso(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA_DIFUSO}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_y_poblar_indice_difuso, quitar_indice_difuso),
+    ]
@@ -0,0 +1,171 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:31
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copia congelada de la normalización de models.py a la fecha de esta migración:
+# las migraciones reciben modelos históricos y no deben depender del código vivo.
+CAMPOS_NORMALIZADOS = ['titulo', 'autor', 'facultad', 'materia', 'editorial', 'tutor', 'carrera']
+
+
+def normalizar_texto(texto):
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().strip().split())
+
+
+def calcular_columnas_normalizadas(apps, schema_editor):
+    """Rellena las columnas *_norm de los libros y tesis existentes"""
+    for nombre in ('Libro', 'TrabajoGrado'):
+        Modelo = apps.get_model('inventario', nombre)
+        existentes = {campo.name for campo in Modelo._meta.concrete_fields}
+        campos = [campo for campo in CAMPOS_NORMALIZADOS if f'{campo}_norm' in existentes]
+        activos = list(Modelo.objects.all())
+        for activo in activos:
+            for campo in campos:
+                setattr(activo, f'{campo}_norm', normalizar_texto(getattr(activo, campo)))
+        if activos:
+            Modelo.objects.bulk_update(activos, [f'{campo}_norm' for campo in campos], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_indice_difuso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activobibliografico',
+            name='autor_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='activobibliografico',
+            name='facultad_norm',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='activobibliografico',
+            name='titulo_norm',
+            field=models.CharField(default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='historicalactivobibliografico',
+            name='autor_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='historicalactivobibliografico',
+            name='facultad_norm',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='historicalactivobibliografico',
+            name='titulo_norm',
+            field=models.CharField(default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='autor_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='editorial_norm',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='facultad_norm',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='materia_norm',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='titulo_norm',
+            field=models.CharField(default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='autor_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='carrera_norm',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='facultad_norm',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='titulo_norm',
+            field=models.CharField(default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='tutor_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='editorial_norm',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='materia_norm',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='trabajogrado',
+            name='carrera_norm',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='trabajogrado',
+            name='tutor_norm',
+            field=models.CharField(default='', editable=False, max_length=300),
+        ),
+        migrations.AddIndex(
+            model_name='activobibliografico',
+            index=models.Index(fields=['titulo_norm'], name='activo_titulo_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='activobibliografico',
+            index=models.Index(fields=['autor_norm'], name='activo_autor_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='activobibliografico',
+            index=models.Index(fields=['facultad_norm'], name='activo_facultad_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['materia_norm'], name='libro_materia_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='libro',
+            index=models.Index(fields=['editorial_norm'], name='libro_editorial_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='trabajogrado',
+            index=models.Index(fields=['tutor_norm'], name='tesis_tutor_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='trabajogrado',
+            index=models.Index(fields=['carrera_norm'], name='tesis_carrera_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(calcular_columnas_normalizadas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_columnas_normalizadas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activobibliografico',
+            name='anio',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Año'),
+        ),
+        migrations.AlterField(
+            model_name='activobibliografico',
+            name='estado',
+            field=models.CharField(blank=True, choices=[('BUENO', 'Bueno'), ('REGULAR', 'Regular'), ('MALO', 'Malo'), ('EN REPARACION', 'En Reparación')], db_index=True, default='BUENO', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AlterField(
+            model_name='historicalactivobibliografico',
+            name='anio',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Año'),
+        ),
+        migrations.AlterField(
+            model_name='historicalactivobibliografico',
+            name='estado',
+            field=models.CharField(blank=True, choices=[('BUENO', 'Bueno'), ('REGULAR', 'Regular'), ('MALO', 'Malo'), ('EN REPARACION', 'En Reparación')], db_index=True, default='BUENO', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AlterField(
+            model_name='historicallibro',
+            name='anio',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Año'),
+        ),
+        migrations.AlterField(
+            model_name='historicallibro',
+            name='codigo_seccion_full',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='Código Completo de Sección'),
+        ),
+        migrations.AlterField(
+            model_name='historicallibro',
+            name='estado',
+            field=models.CharField(blank=True, choices=[('BUENO', 'Bueno'), ('REGULAR', 'Regular'), ('MALO', 'Malo'), ('EN REPARACION', 'En Reparación')], db_index=True, default='BUENO', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AlterField(
+            model_name='historicaltrabajogrado',
+            name='anio',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Año'),
+        ),
+        migrations.AlterField(
+            model_name='historicaltrabajogrado',
+            name='estado',
+            field=models.CharField(blank=True, choices=[('BUENO', 'Bueno'), ('REGULAR', 'Regular'), ('MALO', 'Malo'), ('EN REPARACION', 'En Reparación')], db_index=True, default='BUENO', max_length=20, verbose_name='Estado'),
+        ),
+        migrations.AlterField(
+            model_name='libro',
+            name='codigo_seccion_full',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='Código Completo de Sección'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+def crear_versiones(apps, schema_editor):
+    """Una fila por familia, para que las señales solo tengan que hacer UPDATE"""
+    VersionRecurso = apps.get_model('inventario', 'VersionRecurso')
+    for familia in ('libros', 'tesis', 'prestamos'):
+        VersionRecurso.objects.get_or_create(familia=familia, defaults={'version': 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_indices_consulta_por_campo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionRecurso',
+            fields=[
+                ('familia', models.CharField(max_length=30, primary_key=True, serialize=False, verbose_name='Familia')),
+                ('version', models.BigIntegerField(default=0, verbose_name='Versión')),
+            ],
+            options={
+                'verbose_name': 'Versión de Recurso',
+                'verbose_name_plural': 'Versiones de Recursos',
+            },
+        ),
+        migrations.RunPython(crear_versiones, migrations.RunPython.noop),
+    ]
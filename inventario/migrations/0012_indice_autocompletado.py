@@ -0,0 +1,88 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:46
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia congelada de autocompletado.py a la fecha de esta migración: las
+# migraciones reciben modelos históricos y no deben depender del código vivo.
+CAMPOS_AUTOCOMPLETADO = (
+    ('codigo_nuevo', 'CODIGO', 50),
+    ('codigo_seccion_full', 'SECCION', 45),
+    ('titulo', 'TITULO', 30),
+    ('autor', 'AUTOR', 20),
+    ('tutor', 'TUTOR', 10),
+)
+CAMPOS_CODIGO = ('CODIGO', 'SECCION')
+BONO_INICIO = 5
+LARGO_MINIMO_PALABRA = 3
+LARGO_CLAVE = 255
+
+
+def normalizar_texto(texto):
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().strip().split())
+
+
+def claves_autocompletado(activo):
+    for atributo, campo, peso in CAMPOS_AUTOCOMPLETADO:
+        valor = (getattr(activo, atributo, None) or '').strip()
+        normalizado = normalizar_texto(valor)
+        if not normalizado:
+            continue
+        texto = valor[:LARGO_CLAVE]
+        yield campo, normalizado[:LARGO_CLAVE], texto, peso + BONO_INICIO
+        if campo in CAMPOS_CODIGO:
+            continue
+        vistas = {normalizado}
+        for palabra in re.finditer(r'\w+', normalizado):
+            clave = normalizado[palabra.start():][:LARGO_CLAVE]
+            if len(palabra.group()) >= LARGO_MINIMO_PALABRA and clave not in vistas:
+                vistas.add(clave)
+                yield campo, clave, texto, peso
+
+
+def indexar_existentes(apps, schema_editor):
+    """Genera las entradas de autocompletado de los libros y tesis existentes"""
+    EntradaAutocompletado = apps.get_model('inventario', 'EntradaAutocompletado')
+    for nombre in ('Libro', 'TrabajoGrado'):
+        Modelo = apps.get_model('inventario', nombre)
+        entradas = [
+            EntradaAutocompletado(activo_id=activo.pk, campo=campo, clave=clave, texto=texto, peso=peso)
+            for activo in Modelo.objects.iterator(chunk_size=500)
+            for campo, clave, texto, peso in claves_autocompletado(activo)
+        ]
+        EntradaAutocompletado.objects.bulk_create(entradas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_version_recurso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntradaAutocompletado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('CODIGO', 'Código'), ('SECCION', 'Código de Sección'), ('TITULO', 'Título'), ('AUTOR', 'Autor'), ('TUTOR', 'Tutor')], max_length=20, verbose_name='Campo')),
+                ('clave', models.CharField(max_length=255, verbose_name='Clave normalizada')),
+                ('texto', models.CharField(max_length=255, verbose_name='Texto sugerido')),
+                ('peso', models.PositiveSmallIntegerField(default=0, verbose_name='Peso')),
+                ('activo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas_autocompletado', to='inventario.activobibliografico', verbose_name='Activo Bibliográfico')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Autocompletado',
+                'verbose_name_plural': 'Entradas de Autocompletado',
+                'indexes': [models.Index(fields=['clave'], name='autocompletado_clave_idx', opclasses=['varchar_pattern_ops'])],
+            },
+        ),
+        migrations.RunPython(indexar_existentes, migrations.RunPython.noop),
+    ]
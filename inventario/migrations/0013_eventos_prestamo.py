@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_indice_autocompletado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPrestamo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('PRESTADO', 'Prestado'), ('DEVUELTO', 'Devuelto'), ('ATRASADO', 'Atrasado')], max_length=20, verbose_name='Tipo de Evento')),
+                ('activo_id', models.BigIntegerField(verbose_name='Activo')),
+                ('prestamo_id', models.BigIntegerField(verbose_name='Préstamo')),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Evento de Préstamo',
+                'verbose_name_plural': 'Eventos de Préstamos',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:00
+
+from django.db import migrations, models
+
+
+def rellenar_tipo(apps, schema_editor):
+    """Un UPDATE por tipo sobre los activos existentes y su historial"""
+    ActivoBibliografico = apps.get_model('inventario', 'ActivoBibliografico')
+    ActivoBibliografico.objects.filter(libro__isnull=False).update(tipo_activo='LIBRO')
+    ActivoBibliografico.objects.filter(trabajogrado__isnull=False).update(tipo_activo='TESIS')
+    apps.get_model('inventario', 'HistoricalLibro').objects.update(tipo_activo='LIBRO')
+    apps.get_model('inventario', 'HistoricalTrabajoGrado').objects.update(tipo_activo='TESIS')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0013_eventos_prestamo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activobibliografico',
+            name='tipo_activo',
+            field=models.CharField(choices=[('LIBRO', 'Libro'), ('TESIS', 'Tesis'), ('OTRO', 'Otro')], db_index=True, default='OTRO', editable=False, max_length=10, verbose_name='Tipo de Activo'),
+        ),
+        migrations.AddField(
+            model_name='historicalactivobibliografico',
+            name='tipo_activo',
+            field=models.CharField(choices=[('LIBRO', 'Libro'), ('TESIS', 'Tesis'), ('OTRO', 'Otro')], db_index=True, default='OTRO', editable=False, max_length=10, verbose_name='Tipo de Activo'),
+        ),
+        migrations.AddField(
+            model_name='historicallibro',
+            name='tipo_activo',
+            field=models.CharField(choices=[('LIBRO', 'Libro'), ('TESIS', 'Tesis'), ('OTRO', 'Otro')], db_index=True, default='OTRO', editable=False, max_length=10, verbose_name='Tipo de Activo'),
+        ),
+        migrations.AddField(
+            model_name='historicaltrabajogrado',
+            name='tipo_activo',
+            field=models.CharField(choices=[('LIBRO', 'Libro'), ('TESIS', 'Tesis'), ('OTRO', 'Otro')], db_index=True, default='OTRO', editable=False, max_length=10, verbose_name='Tipo de Activo'),
+        ),
+        migrations.RunPython(rellenar_tipo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_tipo_activo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['carnet_universitario'], name='estudiante_carnet_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['ci'], name='estudiante_ci_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['nombre_completo', 'id'], name='estudiante_nombre_idx'),
+        ),
+    ]
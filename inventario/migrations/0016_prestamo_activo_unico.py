@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:12
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def cerrar_duplicados(apps, schema_editor):
+    """
+    Si un activo quedó con varios préstamos sin devolver (carrera previa a esta
+    restricción), se conserva el más reciente y los anteriores se marcan devueltos.
+    """
+    Prestamo = apps.get_model('inventario', 'Prestamo')
+    vistos = set()
+    activos = Prestamo.objects.filter(estado__in=['VIGENTE', 'ATRASADO']).order_by('activo_id', '-fecha_prestamo', '-pk')
+    for prestamo in activos.iterator():
+        if prestamo.activo_id not in vistos:
+            vistos.add(prestamo.activo_id)
+            continue
+        prestamo.estado = 'DEVUELTO'
+        prestamo.fecha_devolucion_real = timezone.now()
+        prestamo.observaciones = (prestamo.observaciones or '') + ' [Auto-cerrado: préstamo duplicado]'
+        prestamo.save(update_fields=['estado', 'fecha_devolucion_real', 'observaciones'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0015_indices_estudiante'),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='prestamo',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['VIGENTE', 'ATRASADO'])), fields=('activo',), name='prestamo_activo_unico'),
+        ),
+    ]
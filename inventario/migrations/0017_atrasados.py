@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:19
+
+import django.db.models.deletion
+import simple_history.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0016_prestamo_activo_unico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricalPrestamo',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('SALA', 'En Sala (Deja Carnet Universitario)'), ('DOMICILIO', 'A Domicilio (Deja CI - Máximo 2 días)')], max_length=20, verbose_name='Tipo de Préstamo')),
+                ('fecha_prestamo', models.DateTimeField(blank=True, editable=False, verbose_name='Fecha de Préstamo')),
+                ('fecha_devolucion_estimada', models.DateTimeField(verbose_name='Fecha de Devolución Estimada')),
+                ('fecha_devolucion_real', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Devolución Real')),
+                ('estado', models.CharField(choices=[('VIGENTE', 'Vigente'), ('DEVUELTO', 'Devuelto'), ('ATRASADO', 'Atrasado')], default='VIGENTE', max_length=20, verbose_name='Estado')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical Préstamo',
+                'verbose_name_plural': 'historical Préstamos',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['estado', 'fecha_devolucion_estimada'], name='prestamo_estado_vence_idx'),
+        ),
+        migrations.AddField(
+            model_name='historicalprestamo',
+            name='activo',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventario.activobibliografico', verbose_name='Activo Bibliográfico'),
+        ),
+        migrations.AddField(
+            model_name='historicalprestamo',
+            name='estudiante',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventario.estudiante', verbose_name='Estudiante'),
+        ),
+        migrations.AddField(
+            model_name='historicalprestamo',
+            name='history_user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='historicalprestamo',
+            name='usuario_prestamo',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que registró'),
+        ),
+    ]
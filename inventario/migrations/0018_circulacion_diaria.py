@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0017_atrasados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculacionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('tipo_activo', models.CharField(max_length=10, verbose_name='Tipo de Activo')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo de Préstamo')),
+                ('carrera', models.CharField(default='', max_length=100, verbose_name='Carrera')),
+                ('facultad', models.CharField(default='', max_length=255, verbose_name='Facultad')),
+                ('materia', models.CharField(default='', max_length=200, verbose_name='Materia')),
+                ('prestamos', models.PositiveIntegerField(default=0, verbose_name='Préstamos')),
+                ('devoluciones', models.PositiveIntegerField(default=0, verbose_name='Devoluciones')),
+                ('duracion_segundos', models.BigIntegerField(default=0, verbose_name='Duración total (segundos)')),
+            ],
+            options={
+                'verbose_name': 'Circulación Diaria',
+                'verbose_name_plural': 'Circulación Diaria',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'tipo_activo', 'tipo', 'carrera', 'facultad', 'materia'), name='circulacion_diaria_unica')],
+            },
+        ),
+    ]
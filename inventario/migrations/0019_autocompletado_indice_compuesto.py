@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+INDICE = 'autocompletado_clave_peso_idx'
+TABLA = 'inventario_entradaautocompletado'
+
+
+def crear_indice_compuesto(apps, schema_editor):
+    """
+    Índice (clave, peso DESC, activo_id) en el mismo orden que lee sugerencias():
+    el rango por prefijo y el ORDER BY salen del índice sin ordenar aparte.
+    En PostgreSQL la clave va con COLLATE "C", que sirve tanto a LIKE 'x%' como
+    al orden por bytes (varchar_pattern_ops no sirve para ORDER BY).
+    """
+    clave = 'clave COLLATE "C"' if schema_editor.connection.vendor == 'postgresql' else 'clave'
+    schema_editor.execute(f'CREATE INDEX {INDICE} ON {TABLA} ({clave}, peso DESC, activo_id)')
+
+
+def quitar_indice_compuesto(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0018_circulacion_diaria'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='entradaautocompletado',
+            name='autocompletado_clave_idx',
+        ),
+        migrations.RunPython(crear_indice_compuesto, quitar_indice_compuesto),
+    ]
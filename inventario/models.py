@@ -1,7 +1,106 @@
 from django.db import models
+from django.db.models.lookups import StartsWith
 from simple_history.models import HistoricalRecords
 from datetime import timedelta
 from django.utils import timezone
+import re
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """Normaliza texto para búsqueda (minúsculas, sin tildes, sin espacios extra)"""
+    if not texto:
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().strip().split())
+
+
+# Llaves de ordenamiento natural persistidas.
+# Cada número del código se rellena a un ancho fijo para que el orden de texto
+# coincida con el orden numérico: "S1-R1-0039" -> "0" + "0000000001" + "0000000001" + "0000000039".
+# Los registros sin código llevan la llave "1" y quedan al final.
+ANCHO_NUMERO_ORDEN = 10
+MAX_GRUPOS_ORDEN = 20
+LLAVE_SIN_CODIGO = '1'
+
+
+def _numeros_orden(codigo):
+    """Convierte los grupos numéricos de un código en texto de ancho fijo"""
+    numeros = re.findall(r'\d+', codigo)[:MAX_GRUPOS_ORDEN]
+    tope = 10 ** ANCHO_NUMERO_ORDEN - 1
+    return ''.join(str(min(int(n), tope)).zfill(ANCHO_NUMERO_ORDEN) for n in numeros)
+
+
+def llave_orden_seccion(codigo):
+    """Llave de orden natural para codigo_seccion_full (S1-R1-0039)"""
+    if not codigo or not codigo.strip():
+        return LLAVE_SIN_CODIGO
+    return '0' + _numeros_orden(codigo)
+
+
+def llave_orden_codigo(codigo):
+    """Llave de orden natural para codigo_nuevo (ADM-0025, CPU-001): prefijo y luego números"""
+    if not codigo or not codigo.strip():
+        return LLAVE_SIN_CODIGO
+    match = re.match(r'([A-Z]+)', codigo.upper())
+    prefijo = match.group(1) if match else ''
+    return '0' + prefijo[:20] + _numeros_orden(codigo)
+
+
+@models.CharField.register_lookup
+class Prefijo(StartsWith):
+    """
+    campo__prefijo: empieza con el valor, distinguiendo mayúsculas, por índice.
+    En PostgreSQL es LIKE 'x%' (índice varchar_pattern_ops). En SQLite LIKE no
+    distingue mayúsculas y no usa índices, así que se consulta el rango [x, x + U+10FFFF).
+    """
+    lookup_name = 'prefijo'
+
+    def as_sqlite(self, compiler, connection):
+        if hasattr(self.rhs, 'resolve_expression'):
+            return super().as_sql(compiler, connection)
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        return f'({lhs} >= %s AND {lhs} < %s)', [*lhs_params, self.rhs, *lhs_params, self.rhs + '\U0010ffff']
+
+
+@models.CharField.register_lookup
+class PrefijoCodigo(Prefijo):
+    """Como prefijo, con el valor en mayúsculas: los códigos se guardan así y la búsqueda llega normalizada"""
+    lookup_name = 'prefijo_codigo'
+
+    def get_prep_lookup(self):
+        valor = super().get_prep_lookup()
+        return valor.upper() if isinstance(valor, str) else valor
+
+
+# Campos de texto con columna sombra <campo>_norm (minúsculas, sin tildes) para búsquedas indexadas
+CAMPOS_NORMALIZADOS = ['titulo', 'autor', 'facultad', 'materia', 'editorial', 'tutor', 'carrera']
+
+
+def valores_derivados(activo):
+    """
+    Columnas derivadas de un libro o tesis: llaves de orden natural y textos normalizados.
+    Solo incluye los campos que existen en el modelo del activo.
+    """
+    valores = {'orden_codigo': llave_orden_codigo(activo.codigo_nuevo)}
+    # Solo las subclases fijan el tipo: guardar la fila padre no lo pisa
+    tipo = getattr(activo, 'TIPO', None)
+    if tipo is not None:
+        valores['tipo_activo'] = tipo
+    if hasattr(activo, 'codigo_seccion_full'):
+        valores['orden_seccion'] = llave_orden_seccion(activo.codigo_seccion_full)
+    for campo in CAMPOS_NORMALIZADOS:
+        if hasattr(activo, f'{campo}_norm'):
+            valores[f'{campo}_norm'] = normalizar_texto(getattr(activo, campo))
+    return valores
+
+
+def indice_normalizado(modelo, campo):
+    """Índice para igualdad y prefijo (lookup `prefijo`) sobre una columna normalizada"""
+    return models.Index(
+        fields=[f'{campo}_norm'], name=f'{modelo}_{campo}_norm_idx', opclasses=['varchar_pattern_ops']
+    )
 
 
 class ActivoBibliografico(models.Model):
@@ -14,36 +113,58 @@ class ActivoBibliografico(models.Model):
         ('EN REPARACION', 'En Reparación'),
     ]
     
+    TIPO_CHOICES = [
+        ('LIBRO', 'Libro'),
+        ('TESIS', 'Tesis'),
+        ('OTRO', 'Otro'),
+    ]
+    # Tipo que guarda cada subclase en tipo_activo
+    TIPO = None
+    
     # Permite múltiples registros sin código (NULL). Los códigos existentes siguen siendo únicos.
     codigo_nuevo = models.CharField(max_length=50, null=True, blank=True, db_index=True, verbose_name='Código Nuevo')
     codigo_antiguo = models.CharField(max_length=50, null=True, blank=True, verbose_name='Código Antiguo')
     titulo = models.CharField(max_length=500, verbose_name='Título')
     autor = models.CharField(max_length=300, blank=True, null=True, verbose_name='Autor')
-    anio = models.IntegerField(null=True, blank=True, verbose_name='Año')
+    anio = models.IntegerField(null=True, blank=True, db_index=True, verbose_name='Año')
     facultad = models.CharField(max_length=255, blank=True, null=True, verbose_name='Facultad')
-    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='BUENO', blank=True, verbose_name='Estado')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='BUENO', blank=True, db_index=True, verbose_name='Estado')
     observaciones = models.TextField(blank=True, null=True, verbose_name='Observaciones')
     ubicacion_seccion = models.CharField(max_length=50, blank=True, null=True, verbose_name='Ubicación - Sección')
     ubicacion_repisa = models.CharField(max_length=50, blank=True, null=True, verbose_name='Ubicación - Repisa')
     fecha_registro = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Registro')
     
+    # Llave derivada de codigo_nuevo para ordenar en la base de datos (se calcula en save)
+    orden_codigo = models.CharField(max_length=255, default=LLAVE_SIN_CODIGO, db_index=True, editable=False, verbose_name='Orden por Código')
+    # Textos normalizados para búsqueda (se calculan en save)
+    titulo_norm = models.CharField(max_length=500, default='', editable=False)
+    autor_norm = models.CharField(max_length=300, default='', editable=False)
+    facultad_norm = models.CharField(max_length=255, default='', editable=False)
+    # Tipo de activo guardado al crear (LIBRO o TESIS), sin consultar las tablas hijas
+    tipo_activo = models.CharField(max_length=10, choices=TIPO_CHOICES, default='OTRO', db_index=True, editable=False, verbose_name='Tipo de Activo')
+    
     # Historial de cambios para auditoría
     history = HistoricalRecords(inherit=True)
     
-    # Propiedad para identificar el tipo de activo
-    @property
-    def tipo_activo(self):
-        """Devuelve el tipo de activo: LIBRO o TESIS"""
-        if hasattr(self, 'libro'):
-            return 'LIBRO'
-        if hasattr(self, 'trabajogrado'):
-            return 'TESIS'
-        return 'OTRO'
-    
     class Meta:
         verbose_name = 'Activo Bibliográfico'
         verbose_name_plural = 'Activos Bibliográficos'
         ordering = ['codigo_nuevo']
+        indexes = [
+            indice_normalizado('activo', 'titulo'),
+            indice_normalizado('activo', 'autor'),
+            indice_normalizado('activo', 'facultad'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        """Mantener actualizadas las columnas derivadas (orden natural y textos normalizados)"""
+        derivados = valores_derivados(self)
+        for campo, valor in derivados.items():
+            setattr(self, campo, valor)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(derivados)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.titulo
@@ -52,16 +173,28 @@ class ActivoBibliografico(models.Model):
 class Libro(ActivoBibliografico):
     """Modelo para libros de la biblioteca"""
     
+    TIPO = 'LIBRO'
+    
     materia = models.CharField(max_length=200, blank=True, null=True, verbose_name='Materia')
     editorial = models.CharField(max_length=200, blank=True, null=True, verbose_name='Editorial')
     edicion = models.CharField(max_length=100, blank=True, null=True, verbose_name='Edición')
-    codigo_seccion_full = models.CharField(max_length=100, blank=True, null=True, verbose_name='Código Completo de Sección')
+    codigo_seccion_full = models.CharField(max_length=100, blank=True, null=True, db_index=True, verbose_name='Código Completo de Sección')
     orden_importacion = models.IntegerField(default=0, verbose_name='Orden de Importación', db_index=True)
+    # Llave derivada de codigo_seccion_full para ordenar en la base de datos (se calcula en save)
+    orden_seccion = models.CharField(max_length=255, default=LLAVE_SIN_CODIGO, db_index=True, editable=False, verbose_name='Orden por Sección')
+    # Textos normalizados para búsqueda (se calculan en save)
+    materia_norm = models.CharField(max_length=200, default='', editable=False)
+    editorial_norm = models.CharField(max_length=200, default='', editable=False)
     
     class Meta:
         verbose_name = 'Libro'
         verbose_name_plural = 'Libros'
         ordering = ['orden_importacion']
+        indexes = [
+            models.Index(fields=['orden_seccion', 'orden_importacion'], name='libro_orden_natural_idx'),
+            indice_normalizado('libro', 'materia'),
+            indice_normalizado('libro', 'editorial'),
+        ]
     
     def __str__(self):
         return self.titulo
@@ -70,6 +203,8 @@ class Libro(ActivoBibliografico):
 class TrabajoGrado(ActivoBibliografico):
     """Modelo para trabajos de grado (tesis, proyectos, trabajos dirigidos)"""
     
+    TIPO = 'TESIS'
+    
     MODALIDAD_CHOICES = [
         ('TESIS', 'Tesis'),
         ('PROYECTO DE GRADO', 'Proyecto de Grado'),
@@ -79,10 +214,17 @@ class TrabajoGrado(ActivoBibliografico):
     modalidad = models.CharField(max_length=30, choices=MODALIDAD_CHOICES, blank=True, null=True, verbose_name='Modalidad')
     tutor = models.CharField(max_length=300, blank=True, null=True, verbose_name='Tutor')
     carrera = models.CharField(max_length=200, blank=True, null=True, verbose_name='Carrera')
+    # Textos normalizados para búsqueda (se calculan en save)
+    tutor_norm = models.CharField(max_length=300, default='', editable=False)
+    carrera_norm = models.CharField(max_length=200, default='', editable=False)
     
     class Meta:
         verbose_name = 'Trabajo de Grado'
         verbose_name_plural = 'Trabajos de Grado'
+        indexes = [
+            indice_normalizado('tesis', 'tutor'),
+            indice_normalizado('tesis', 'carrera'),
+        ]
     
     def __str__(self):
         return self.titulo
@@ -103,6 +245,13 @@ class Estudiante(models.Model):
         verbose_name = 'Estudiante'
         verbose_name_plural = 'Estudiantes'
         ordering = ['nombre_completo']
+        indexes = [
+            # Búsqueda por prefijo (LIKE 'x%') de carnet y CI; los UNIQUE no sirven para LIKE en PostgreSQL
+            models.Index(fields=['carnet_universitario'], name='estudiante_carnet_prefijo_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['ci'], name='estudiante_ci_prefijo_idx', opclasses=['varchar_pattern_ops']),
+            # Orden de la lista y de la paginación por cursor
+            models.Index(fields=['nombre_completo', 'id'], name='estudiante_nombre_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre_completo} ({self.carnet_universitario})"
@@ -151,21 +300,146 @@ class Prestamo(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='VIGENTE', verbose_name='Estado')
     observaciones = models.TextField(blank=True, null=True, verbose_name='Observaciones')
     
+    # Historial de cambios de estado (préstamo, devolución, vencimiento)
+    history = HistoricalRecords()
+    
     class Meta:
         verbose_name = 'Préstamo'
         verbose_name_plural = 'Préstamos'
         ordering = ['-fecha_prestamo']
+        indexes = [
+            # Barrido de vencidos y consulta de vencimientos: rango por fecha dentro de cada estado
+            models.Index(fields=['estado', 'fecha_devolucion_estimada'], name='prestamo_estado_vence_idx'),
+        ]
+        constraints = [
+            # Un solo préstamo sin devolver por activo, aunque dos mostradores registren a la vez
+            models.UniqueConstraint(
+                fields=['activo'],
+                condition=models.Q(estado__in=['VIGENTE', 'ATRASADO']),
+                name='prestamo_activo_unico',
+            ),
+        ]
     
+    def calcular_fecha_devolucion(self, ahora=None):
+        """Fecha de devolución automática según el tipo de préstamo"""
+        ahora = ahora or timezone.now()
+        if self.tipo == 'DOMICILIO':
+            # 2 días de plazo
+            return ahora + timedelta(days=2)
+        # En sala: Se devuelve el mismo día (al final del día)
+        return ahora.replace(hour=23, minute=59)
+
     def save(self, *args, **kwargs):
-        """Calcular fecha de devolución automática según el tipo de préstamo"""
         if not self.pk:  # Solo al crear
-            if self.tipo == 'DOMICILIO':
-                # 2 días de plazo
-                self.fecha_devolucion_estimada = timezone.now() + timedelta(days=2)
-            else:
-                # En sala: Se devuelve el mismo día (al final del día)
-                self.fecha_devolucion_estimada = timezone.now().replace(hour=23, minute=59)
+            self.fecha_devolucion_estimada = self.calcular_fecha_devolucion()
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.estudiante.nombre_completo} - {self.activo.codigo_nuevo or 'S/C'}"
+
+
+class CirculacionDiaria(models.Model):
+    """
+    Resumen diario de la circulación para los reportes (ver estadisticas.py).
+    Una fila por día y combinación de tipo de activo, tipo de préstamo, carrera
+    del estudiante, facultad y materia; los préstamos cuentan el día en que se
+    registran y las devoluciones (con su duración) el día en que se devuelven.
+    """
+    fecha = models.DateField(verbose_name='Fecha')
+    tipo_activo = models.CharField(max_length=10, verbose_name='Tipo de Activo')
+    tipo = models.CharField(max_length=20, verbose_name='Tipo de Préstamo')
+    carrera = models.CharField(max_length=100, default='', verbose_name='Carrera')
+    facultad = models.CharField(max_length=255, default='', verbose_name='Facultad')
+    materia = models.CharField(max_length=200, default='', verbose_name='Materia')
+    prestamos = models.PositiveIntegerField(default=0, verbose_name='Préstamos')
+    devoluciones = models.PositiveIntegerField(default=0, verbose_name='Devoluciones')
+    duracion_segundos = models.BigIntegerField(default=0, verbose_name='Duración total (segundos)')
+
+    class Meta:
+        verbose_name = 'Circulación Diaria'
+        verbose_name_plural = 'Circulación Diaria'
+        constraints = [
+            # Clave de la suma incremental (INSERT ... ON CONFLICT) y del rango por fecha de los reportes
+            models.UniqueConstraint(
+                fields=['fecha', 'tipo_activo', 'tipo', 'carrera', 'facultad', 'materia'],
+                name='circulacion_diaria_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.tipo_activo}/{self.tipo}: {self.prestamos}"
+
+
+class VersionRecurso(models.Model):
+    """
+    Contador monotónico por familia de recursos (libros, tesis, préstamos).
+    Se incrementa con cada alta, edición o baja (ver signals.py) y sirve para
+    responder lecturas condicionales sin consultar las tablas grandes.
+    """
+    familia = models.CharField(max_length=30, primary_key=True, verbose_name='Familia')
+    version = models.BigIntegerField(default=0, verbose_name='Versión')
+
+    class Meta:
+        verbose_name = 'Versión de Recurso'
+        verbose_name_plural = 'Versiones de Recursos'
+
+    def __str__(self):
+        return f"{self.familia} v{self.version}"
+
+
+class EntradaAutocompletado(models.Model):
+    """
+    Índice de prefijos para /api/autocomplete/ (ver autocompletado.py).
+    Una fila por cada inicio de palabra de títulos, autores y tutores, y una por
+    cada código; se regenera al guardar el activo y se borra en cascada.
+    El índice (clave, peso DESC, activo_id) lo crea la migración 0019 según el motor.
+    """
+    CAMPO_CHOICES = [
+        ('CODIGO', 'Código'),
+        ('SECCION', 'Código de Sección'),
+        ('TITULO', 'Título'),
+        ('AUTOR', 'Autor'),
+        ('TUTOR', 'Tutor'),
+    ]
+
+    activo = models.ForeignKey(
+        ActivoBibliografico,
+        on_delete=models.CASCADE,
+        related_name='entradas_autocompletado',
+        verbose_name='Activo Bibliográfico'
+    )
+    campo = models.CharField(max_length=20, choices=CAMPO_CHOICES, verbose_name='Campo')
+    clave = models.CharField(max_length=255, verbose_name='Clave normalizada')
+    texto = models.CharField(max_length=255, verbose_name='Texto sugerido')
+    peso = models.PositiveSmallIntegerField(default=0, verbose_name='Peso')
+
+    class Meta:
+        verbose_name = 'Entrada de Autocompletado'
+        verbose_name_plural = 'Entradas de Autocompletado'
+
+    def __str__(self):
+        return f"{self.campo}: {self.texto}"
+
+
+class EventoPrestamo(models.Model):
+    """
+    Registro de cambios de disponibilidad (préstamo, devolución, atraso) que
+    alimenta el stream SSE de la consulta pública (ver eventos.py).
+    """
+    TIPO_CHOICES = [
+        ('PRESTADO', 'Prestado'),
+        ('DEVUELTO', 'Devuelto'),
+        ('ATRASADO', 'Atrasado'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo de Evento')
+    activo_id = models.BigIntegerField(verbose_name='Activo')
+    prestamo_id = models.BigIntegerField(verbose_name='Préstamo')
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha')
+
+    class Meta:
+        verbose_name = 'Evento de Préstamo'
+        verbose_name_plural = 'Eventos de Préstamos'
+
+    def __str__(self):
+        return f"{self.tipo} activo={self.activo_id}"
@@ -0,0 +1,135 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class OrdenNaturalCursorPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre el orden natural persistido.
+
+    Es opcional: solo se activa si el cliente envía ?limite= o ?cursor=.
+    Sin esos parámetros la vista devuelve la lista completa como siempre.
+
+    El cursor guarda los valores de la última fila entregada en las columnas de
+    `cursor_ordering` de la vista, y la página siguiente se obtiene con
+    "WHERE (columnas) > (valores) ORDER BY columnas LIMIT n". El costo de cada
+    página no depende de cuán profundo esté el cliente en el catálogo.
+    Las columnas con '-' (por ejemplo '-fecha_prestamo') se recorren en orden
+    descendente; las fechas viajan en el cursor como texto ISO.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limite'
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.modelo = queryset.model
+        self.ordering = tuple(view.cursor_ordering)
+        self.page_size = self.get_page_size(request)
+
+        posicion = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if posicion is not None:
+            queryset = queryset.filter(self.filtro_posterior(posicion))
+
+        filas = list(queryset[:self.page_size + 1])
+        self.has_next = len(filas) > self.page_size
+        self.page = filas[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            valor = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(valor, self.max_page_size))
+
+    def filtro_posterior(self, posicion):
+        """
+        Construye (a, b, c) > (x, y, z) como
+        a >= x AND (a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)).
+        El primer término acota el rango para que la base use el índice.
+        """
+        campos = [campo.lstrip('-') for campo in self.ordering]
+        mayor = ['lt' if campo.startswith('-') else 'gt' for campo in self.ordering]
+        alternativas = Q()
+        for i, campo in enumerate(campos):
+            iguales = {campos[j]: posicion[j] for j in range(i)}
+            alternativas |= Q(**iguales, **{f'{campo}__{mayor[i]}': posicion[i]})
+        return Q(**{f'{campos[0]}__{mayor[0]}e': posicion[0]}) & alternativas
+
+    def posicion_de(self, fila):
+        # Acepta instancias de modelo o filas de .values()
+        campos = [campo.lstrip('-') for campo in self.ordering]
+        if isinstance(fila, dict):
+            return [fila[campo] for campo in campos]
+        return [getattr(fila, campo) for campo in campos]
+
+    def encode_cursor(self, posicion):
+        # isoformat completo (DjangoJSONEncoder recorta los microsegundos y el cursor saltaría filas)
+        crudo = json.dumps(posicion, default=lambda valor: valor.isoformat(), separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(crudo).decode('ascii')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            posicion = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(posicion, list) or len(posicion) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return [self.convertir(campo.lstrip('-'), valor) for campo, valor in zip(self.ordering, posicion)]
+
+    def convertir(self, campo, valor):
+        """Valor del cursor al tipo de su columna; uno que no encaje es un cursor inválido y no un error 500"""
+        opts = self.modelo._meta
+        field = opts.pk if campo == 'pk' else opts.get_field(campo)
+        # El pk de Libro/TrabajoGrado es el enlace al padre: validar contra su id
+        field = field.target_field if field.is_relation else field
+        try:
+            if valor is None:
+                raise ValidationError('nulo')
+            valor = field.to_python(valor)
+            field.run_validators(valor)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return valor
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.posicion_de(self.page[-1]))
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
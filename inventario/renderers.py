@@ -0,0 +1,70 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    ?format=columnar: la lista se envía por columnas en lugar de por filas.
+
+        {
+          "columnas": ["id", "titulo", "estado"],
+          "valores": [[1, 2, 3], ["Redes", "Cálculo", "Física"], [0, 0, 1]],
+          "diccionarios": {"estado": ["BUENO", "MALO"]}
+        }
+
+    Los nombres de campo aparecen una sola vez. Las columnas de texto con pocos
+    valores distintos (estado, facultad, materia, sección...) se codifican con
+    diccionario: en `valores` va el índice dentro de `diccionarios[columna]`.
+    Las respuestas paginadas conservan `next` y convierten solo `results`; lo que
+    no es una lista de filas (detalle, errores) se devuelve como JSON normal.
+    """
+    format = 'columnar'
+    # Proporción máxima de valores distintos para codificar una columna con diccionario
+    max_proporcion_diccionario = 0.5
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.es_tabla(data):
+            data = self.columnas(data)
+        elif isinstance(data, dict) and self.es_tabla(data.get('results')):
+            data = {**data, 'results': self.columnas(data['results'])}
+        return super().render(data, accepted_media_type, renderer_context)
+
+    @staticmethod
+    def es_tabla(data):
+        """Una lista de filas; una lista de otra cosa (por ejemplo errores) va como JSON normal"""
+        return isinstance(data, list) and all(isinstance(fila, dict) for fila in data)
+
+    def columnas(self, filas):
+        if not filas:
+            return {'columnas': [], 'valores': [], 'diccionarios': {}}
+
+        nombres = list(filas[0])
+        valores = []
+        diccionarios = {}
+        for nombre in nombres:
+            columna = [fila.get(nombre) for fila in filas]
+            codificada = self.codificar(columna)
+            if codificada is None:
+                valores.append(columna)
+            else:
+                diccionarios[nombre], indices = codificada
+                valores.append(indices)
+        return {'columnas': nombres, 'valores': valores, 'diccionarios': diccionarios}
+
+    def codificar(self, columna):
+        """Devuelve (diccionario, índices) o None si la columna no conviene codificarla"""
+        if len(columna) < 2:
+            return None
+        posiciones = {}
+        for valor in columna:
+            if valor is not None and not isinstance(valor, str):
+                return None
+            if valor not in posiciones:
+                posiciones[valor] = len(posiciones)
+                if len(posiciones) > len(columna) * self.max_proporcion_diccionario:
+                    return None
+        return list(posiciones), [posiciones[valor] for valor in columna]
+
+
+# Renderizadores de las vistas de listas grandes (JSON, navegable y columnar)
+RENDERIZADORES_LISTA = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
@@ -1,26 +1,34 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from .models import Libro, TrabajoGrado, ActivoBibliografico, Estudiante, Prestamo
 
 
-class LibroSerializer(serializers.ModelSerializer):
+# Columnas derivadas de uso interno (orden natural y textos normalizados), no se exponen en la API
+CAMPOS_DERIVADOS_ACTIVO = ['orden_codigo', 'titulo_norm', 'autor_norm', 'facultad_norm']
+
+class EstadoPrestamoSerializer(serializers.Serializer):
+    """
+    Préstamo actual del activo, calculado por la vista con subconsultas
+    (ver disponibilidad.anotaciones_prestamo). Es null si no se anotó.
+    """
+    prestado = serializers.BooleanField(read_only=True, allow_null=True)
+    prestamo_tipo = serializers.CharField(read_only=True, allow_null=True)
+    fecha_devolucion_estimada = serializers.DateTimeField(read_only=True, allow_null=True)
+    prestamo_estudiante = serializers.CharField(read_only=True, allow_null=True)
+
+
+class LibroSerializer(EstadoPrestamoSerializer, serializers.ModelSerializer):
     """Serializer completo para Libros"""
     class Meta:
         model = Libro
-        fields = '__all__'
+        exclude = CAMPOS_DERIVADOS_ACTIVO + ['orden_seccion', 'materia_norm', 'editorial_norm']
 
 
-class TrabajoGradoSerializer(serializers.ModelSerializer):
+class TrabajoGradoSerializer(EstadoPrestamoSerializer, serializers.ModelSerializer):
     """Serializer completo para Trabajos de Grado"""
     class Meta:
         model = TrabajoGrado
-        fields = '__all__'
-
-
-class LibroSearchSerializer(serializers.ModelSerializer):
-    """Serializer ligero para búsquedas rápidas"""
-    class Meta:
-        model = Libro
-        fields = ['id', 'titulo', 'codigo_nuevo', 'ubicacion_seccion', 'ubicacion_repisa', 'estado']
+        exclude = CAMPOS_DERIVADOS_ACTIVO + ['tutor_norm', 'carrera_norm']
 
 
 class ActivoSelectSerializer(serializers.ModelSerializer):
@@ -34,15 +42,14 @@ class ActivoSelectSerializer(serializers.ModelSerializer):
 
 class EstudianteSerializer(serializers.ModelSerializer):
     """Serializer completo para Estudiantes"""
-    prestamos_activos = serializers.SerializerMethodField()
+    # Préstamos sin devolver y cuántos de ellos están atrasados; los cuenta la vista
+    # en la misma consulta (ver EstudianteViewSet.anotaciones_lista). Null si no se anotó.
+    prestamos_activos = serializers.IntegerField(read_only=True, allow_null=True)
+    prestamos_atrasados = serializers.IntegerField(read_only=True, allow_null=True)
     
     class Meta:
         model = Estudiante
         fields = '__all__'
-    
-    def get_prestamos_activos(self, obj):
-        """Cuenta cuántos préstamos activos tiene el estudiante"""
-        return obj.prestamos.filter(estado='VIGENTE').count()
 
 
 class PrestamoSerializer(serializers.ModelSerializer):
@@ -60,3 +67,52 @@ class PrestamoSerializer(serializers.ModelSerializer):
         model = Prestamo
         fields = '__all__'
         read_only_fields = ['usuario_prestamo', 'fecha_prestamo', 'fecha_devolucion_estimada']
+
+
+class FilasSerializer:
+    """
+    Serializer ligero para listados: trabaja con filas de .values() en lugar de
+    instancias de modelo y solo pasa por DRF los campos que necesitan formato
+    (fechas, decimales). La salida es la misma del serializer completo.
+    Admite ?fields=a,b,c para devolver solo esas columnas.
+    """
+    fields_param = 'fields'
+    _cache = {}
+
+    @classmethod
+    def para(cls, serializer_class):
+        """Instancia reutilizable por clase de serializer (los campos se calculan una vez)"""
+        if serializer_class not in cls._cache:
+            cls._cache[serializer_class] = cls(serializer_class)
+        return cls._cache[serializer_class]
+
+    def __init__(self, serializer_class):
+        campos = serializer_class().fields
+        self.campos = list(campos)
+        self.con_formato = {
+            nombre: campo for nombre, campo in campos.items()
+            if isinstance(campo, (serializers.DateTimeField, serializers.DateField, serializers.DecimalField))
+        }
+
+    def campos_solicitados(self, request):
+        valor = request.query_params.get(self.fields_param)
+        if not valor:
+            return self.campos
+        solicitados = [campo.strip() for campo in valor.split(',') if campo.strip()]
+        desconocidos = [campo for campo in solicitados if campo not in self.campos]
+        if desconocidos:
+            raise ValidationError({self.fields_param: f"Campos desconocidos: {', '.join(desconocidos)}"})
+        return solicitados
+
+    def iterar(self, filas, campos):
+        """Genera los dicts de salida uno a uno (para listas o respuestas en streaming)"""
+        con_formato = [(campo, self.con_formato[campo]) for campo in campos if campo in self.con_formato]
+        for fila in filas:
+            dato = {campo: fila[campo] for campo in campos}
+            for campo, serializer_field in con_formato:
+                if dato[campo] is not None:
+                    dato[campo] = serializer_field.to_representation(dato[campo])
+            yield dato
+
+    def serializar(self, filas, campos):
+        return list(self.iterar(filas, campos))
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .autocompletado import indexar_autocompletado
+from .busqueda import indexar_activo, desindexar_activo
+from .models import Libro, TrabajoGrado, Estudiante, Prestamo
+from .versiones import incrementar_version, LIBROS, TESIS, PRESTAMOS
+
+
+@receiver(post_save, sender=Libro)
+@receiver(post_save, sender=TrabajoGrado)
+def actualizar_indice_busqueda(sender, instance, raw=False, using='default', **kwargs):
+    """Mantener los índices de búsqueda y autocompletado al crear, editar, importar o restaurar"""
+    if raw:
+        return
+    indexar_activo(instance, using=using)
+    indexar_autocompletado(instance, using=using)
+
+
+@receiver(post_delete, sender=Libro)
+@receiver(post_delete, sender=TrabajoGrado)
+def quitar_de_indice_busqueda(sender, instance, using='default', **kwargs):
+    desindexar_activo(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Libro)
+@receiver(post_delete, sender=Libro)
+def version_libros(sender, using='default', **kwargs):
+    incrementar_version(LIBROS, using=using)
+
+
+@receiver(post_save, sender=TrabajoGrado)
+@receiver(post_delete, sender=TrabajoGrado)
+def version_tesis(sender, using='default', **kwargs):
+    incrementar_version(TESIS, using=using)
+
+
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Prestamo)
+def version_prestamos(sender, using='default', **kwargs):
+    """Un préstamo cambia la disponibilidad que ven el kiosco y la lista pública"""
+    incrementar_version(PRESTAMOS, using=using)
+
+
+@receiver(post_save, sender=Estudiante)
+@receiver(post_delete, sender=Estudiante)
+def version_estudiantes(sender, created=False, using='default', **kwargs):
+    """Las listas en caché muestran el nombre del estudiante con el préstamo actual"""
+    # Un estudiante recién creado todavía no tiene préstamos que mostrar
+    if not created:
+        incrementar_version(PRESTAMOS, using=using)
@@ -1,3 +1,1575 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from .models import (
+    ActivoBibliografico, Libro, TrabajoGrado, Estudiante, Prestamo, EntradaAutocompletado, EventoPrestamo,
+    CirculacionDiaria, llave_orden_seccion, valores_derivados,
+)
+from . import autocompletado, busqueda, circulacion, disponibilidad, eventos
+from .autocompletado import claves_autocompletado, sugerencias
+from .busqueda import BusquedaNormalizadaFilter
+from .filtros import LibroFilter
+from .pagination import OrdenNaturalCursorPagination
+from .renderers import ColumnarJSONRenderer
+from .serializers import LibroSerializer, PrestamoSerializer
+from .vencimientos import barrido, marcar_atrasados
+from .views import ActivoViewSet, CambiosMixin, PrestamoViewSet
+
+
+def crear_libros_masivos(desde, hasta):
+    """
+    Inserta libros S{n}-R1-{n} directamente en las tablas (sin save ni historial)
+    para poder armar catálogos de 100k filas en pocos segundos.
+    """
+    padres = []
+    for n in range(desde, hasta):
+        padre = ActivoBibliografico(titulo=f'Libro {n}', codigo_nuevo=f'L-{n}', tipo_activo=Libro.TIPO)
+        for campo, valor in valores_derivados(padre).items():
+            setattr(padre, campo, valor)
+        padres.append(padre)
+    padres = ActivoBibliografico.objects.bulk_create(padres, batch_size=1000)
+    filas = []
+    for padre, n in zip(padres, range(desde, hasta)):
+        codigo = f'S{n // 1000}-R1-{n % 1000:04d}'
+        filas.append((padre.pk, codigo, n, llave_orden_seccion(codigo)))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {Libro._meta.db_table} '
+            '(activobibliografico_ptr_id, codigo_seccion_full, orden_importacion, orden_seccion, '
+            "materia_norm, editorial_norm) VALUES (%s, %s, %s, %s, '', '')",
+            filas,
+        )
+
+
+class CatalogoAPITestCase(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='biblioteca', password='clave')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        # Las versiones vuelven atrás con el rollback de cada test; la caché no
+        caches['catalogo'].clear()
+
+
+class OrdenNaturalCursorPaginationTests(CatalogoAPITestCase):
+    def recorrer(self, url, limite):
+        """Recorre todas las páginas siguiendo 'next' y devuelve los ids en orden"""
+        ids = []
+        respuesta = self.client.get(url, {'limite': limite})
+        while True:
+            self.assertEqual(respuesta.status_code, 200)
+            ids.extend(fila['id'] for fila in respuesta.json()['results'])
+            if not respuesta.json()['next']:
+                return ids
+            respuesta = self.client.get(respuesta.json()['next'])
+
+    def test_sin_parametros_devuelve_lista_completa(self):
+        Libro.objects.create(titulo='A', codigo_seccion_full='S1-R1-0002')
+        Libro.objects.create(titulo='B', codigo_seccion_full='S1-R1-0001')
+        respuesta = self.client.get('/api/libros/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([fila['titulo'] for fila in respuesta.json()], ['B', 'A'])
+
+    def test_paginas_respetan_orden_natural_sin_duplicados(self):
+        codigos = ['S1-R1-0039', 'S1-R1-0001', 'S10-R1-0001', 'S2-R1-0005', '', None, 'S1-R2-0001']
+        for i in range(21):
+            Libro.objects.create(titulo=f'L{i}', codigo_seccion_full=codigos[i % len(codigos)], orden_importacion=i)
+
+        completo = [fila['id'] for fila in self.client.get('/api/libros/').json()]
+        self.assertEqual(self.recorrer('/api/libros/', 4), completo)
+
+    def test_tesis_paginadas_por_codigo(self):
+        for codigo in ['CPU-010', 'ADM-0025', None, 'ADM-0001', 'CPU-001']:
+            TrabajoGrado.objects.create(titulo=str(codigo), codigo_nuevo=codigo)
+
+        ids = self.recorrer('/api/tesis/', 2)
+        codigos = TrabajoGrado.objects.in_bulk(ids)
+        self.assertEqual(
+            [codigos[i].codigo_nuevo for i in ids],
+            ['ADM-0001', 'ADM-0025', 'CPU-001', 'CPU-010', None],
+        )
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get('/api/libros/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(respuesta.status_code, 404)
+
+        # JSON válido con valores que no encajan en las columnas del orden
+        paginacion = OrdenNaturalCursorPagination()
+        for url, posicion in (
+            ('/api/libros/', ['S1', 'abc', 1]),
+            ('/api/libros/', ['S1', 1, None]),
+            ('/api/libros/', ['S1', 1, 2 ** 70]),
+            ('/api/tesis/', [{'a': 1}, 'x']),
+            ('/api/prestamos/', ['ayer', 1]),
+            ('/api/prestamos/', [123, 1]),
+        ):
+            respuesta = self.client.get(url, {'cursor': paginacion.encode_cursor(posicion)})
+            self.assertEqual(respuesta.status_code, 404, posicion)
+
+    def test_latencia_por_pagina_constante_hasta_100k(self):
+        paginacion = OrdenNaturalCursorPagination()
+        paginacion.ordering = ('orden_seccion', 'orden_importacion', 'pk')
+
+        def medir_pagina_profunda():
+            # Cursor a 50 filas del final: el peor caso para una paginación por OFFSET
+            ultimo = Libro.objects.order_by(*paginacion.ordering)[Libro.objects.count() - 50]
+            cursor = paginacion.encode_cursor(paginacion.posicion_de(ultimo))
+            tiempos = []
+            for _ in range(7):
+                inicio = time.perf_counter()
+                respuesta = self.client.get('/api/libros/', {'cursor': cursor, 'limite': 50})
+                tiempos.append(time.perf_counter() - inicio)
+                self.assertEqual(len(respuesta.json()['results']), 49)
+            return statistics.median(tiempos)
+
+        crear_libros_masivos(0, 1000)
+        tiempo_1k = medir_pagina_profunda()
+        crear_libros_masivos(1000, 100000)
+        tiempo_100k = medir_pagina_profunda()
+
+        # Con 100 veces más filas la página debe costar prácticamente lo mismo
+        self.assertLess(tiempo_100k, tiempo_1k * 3 + 0.01)
+
+
+class BusquedaTextoCompletoTests(CatalogoAPITestCase):
+    def buscar(self, url, texto):
+        respuesta = self.client.get(url, {'search': texto})
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila['titulo'] for fila in respuesta.json()]
+
+    def test_titulo_pesa_mas_que_observaciones(self):
+        Libro.objects.create(titulo='Manual de contabilidad', observaciones='Sin tapa')
+        Libro.objects.create(titulo='Álgebra lineal', observaciones='Incluye anexo de contabilidad')
+        Libro.objects.create(titulo='Física general')
+
+        self.assertEqual(
+            self.buscar('/api/libros/', 'contabilidad'),
+            ['Manual de contabilidad', 'Álgebra lineal'],
+        )
+
+    def test_prefijos_tildes_y_todos_los_terminos(self):
+        Libro.objects.create(titulo='EDUCACIÓN SUPERIOR', autor='García Pérez')
+        Libro.objects.create(titulo='Educación inicial', autor='López')
+
+        self.assertEqual(self.buscar('/api/libros/', 'educacion garc'), ['EDUCACIÓN SUPERIOR'])
+
+    def test_indice_se_mantiene_al_editar_y_eliminar(self):
+        tesis = TrabajoGrado.objects.create(titulo='Redes neuronales', codigo_nuevo='CPU-001', tutor='Mamani')
+        self.assertEqual(self.buscar('/api/tesis/', 'mamani'), ['Redes neuronales'])
+        self.assertEqual(self.buscar('/api/tesis/', 'CPU-001'), ['Redes neuronales'])
+
+        tesis.tutor = 'Quispe'
+        tesis.save()
+        self.assertEqual(self.buscar('/api/tesis/', 'mamani'), [])
+        self.assertEqual(self.buscar('/api/tesis/', 'quispe'), ['Redes neuronales'])
+
+        tesis.delete()
+        self.assertEqual(self.buscar('/api/tesis/', 'quispe'), [])
+
+
+class BusquedaDifusaTests(CatalogoAPITestCase):
+    def buscar(self, url, texto):
+        respuesta = self.client.get(url, {'difuso': texto})
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila['titulo'] for fila in respuesta.json()]
+
+    def test_tolera_errores_de_tipeo_en_autor_y_titulo(self):
+        Libro.objects.create(titulo='Estadística aplicada', autor='Juan García')
+        Libro.objects.create(titulo='Química orgánica', autor='Ana Rojas')
+
+        self.assertEqual(self.buscar('/api/libros/', 'garsia'), ['Estadística aplicada'])
+        self.assertEqual(self.buscar('/api/libros/', 'estadistca'), ['Estadística aplicada'])
+        self.assertEqual(self.buscar('/api/libros/', 'xyzw'), [])
+
+    def test_tutor_de_tesis_y_orden_por_similitud(self):
+        TrabajoGrado.objects.create(titulo='Sistema de riego', tutor='Ing. Mamani Condori')
+        TrabajoGrado.objects.create(titulo='Sistema contable', tutor='Lic. Mamani')
+        TrabajoGrado.objects.create(titulo='Redes', tutor='Quispe')
+
+        self.assertEqual(self.buscar('/api/tesis/', 'mamani condory')[0], 'Sistema de riego')
+        self.assertNotIn('Redes', self.buscar('/api/tesis/', 'mamani'))
+
+
+class ColumnasNormalizadasTests(CatalogoAPITestCase):
+    def test_columnas_se_calculan_al_guardar(self):
+        libro = Libro.objects.create(titulo='  EDUCACIÓN   Física ', materia='Cálculo', autor=None)
+        self.assertEqual(libro.titulo_norm, 'educacion fisica')
+        self.assertEqual(libro.materia_norm, 'calculo')
+        self.assertEqual(libro.autor_norm, '')
+
+        libro.titulo = 'Pedagogía'
+        libro.save(update_fields=['titulo'])
+        libro.refresh_from_db()
+        self.assertEqual(libro.titulo_norm, 'pedagogia')
+
+    def test_filtros_ignoran_tildes_y_mayusculas(self):
+        Libro.objects.create(titulo='EDUCACIÓN SUPERIOR', materia='Pedagogía')
+        Libro.objects.create(titulo='Matemática', materia='Cálculo I')
+        TrabajoGrado.objects.create(titulo='Riego', tutor='Ing. Pérez', carrera='Agronomía')
+
+        def titulos(url, **params):
+            return [fila['titulo'] for fila in self.client.get(url, params).json()]
+
+        self.assertEqual(titulos('/api/libros/', titulo__icontains='educacion'), ['EDUCACIÓN SUPERIOR'])
+        self.assertEqual(titulos('/api/libros/', materia__istartswith='CALC'), ['Matemática'])
+        self.assertEqual(titulos('/api/tesis/', carrera__iexact='agronomia'), ['Riego'])
+        self.assertEqual(titulos('/api/tesis/', tutor__icontains='perez'), ['Riego'])
+
+    def test_busqueda_del_selector_sin_tildes(self):
+        Libro.objects.create(titulo='Introducción a la Economía', codigo_nuevo='ECO-001')
+        for termino in ('INTRODUCCIÓN', 'eco-0'):
+            respuesta = self.client.get('/api/activos/', {'search': termino})
+            self.assertEqual([fila['codigo_nuevo'] for fila in respuesta.json()], ['ECO-001'])
+        # Por prefijo: una palabra intermedia no basta (para eso está ?search= en libros/tesis)
+        self.assertEqual(self.client.get('/api/activos/', {'search': 'economia'}).json(), [])
+
+    def test_prefijo_por_defecto_usa_el_indice(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan de consulta de SQLite')
+        Libro.objects.create(titulo='Educación superior', materia='Pedagogía', codigo_nuevo='EDU-001')
+
+        def plan(queryset):
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                return ' | '.join(fila[-1] for fila in cursor.fetchall())
+
+        filtrado = LibroFilter({'titulo': 'EDUC', 'materia': 'pedag'}, queryset=Libro.objects.all()).qs
+        self.assertEqual([libro.codigo_nuevo for libro in filtrado], ['EDU-001'])
+        self.assertRegex(plan(filtrado), r'USING INDEX (activo_titulo_norm_idx|libro_materia_norm_idx)')
+        self.assertNotIn('LIKE', str(filtrado.query))
+
+        busqueda = BusquedaNormalizadaFilter().filter_queryset(
+            Request(RequestFactory().get('/', {'search': 'edu'})), ActivoBibliografico.objects.all(), ActivoViewSet(),
+        )
+        self.assertEqual(busqueda.count(), 1)
+        self.assertIn('MULTI-INDEX OR', plan(busqueda))
+        self.assertNotIn('SCAN', plan(busqueda))
+
+        # contains solo cuando se pide por nombre
+        contiene = LibroFilter({'titulo__icontains': 'superior'}, queryset=Libro.objects.all()).qs
+        self.assertEqual(contiene.count(), 1)
+
+
+class ConsultaPorCamposTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        Libro.objects.create(titulo='Cálculo I', autor='García', materia='Cálculo', anio=2016, estado='MALO', codigo_nuevo='MAT-001')
+        Libro.objects.create(titulo='Cálculo II', autor='García', materia='Cálculo', anio=2021, estado='BUENO', codigo_nuevo='MAT-002')
+        Libro.objects.create(titulo='Historia de García Moreno', autor='Rojas', materia='Historia', anio=2018, codigo_nuevo='HIS-001')
+
+    def titulos(self, consulta):
+        respuesta = self.client.get('/api/libros/', {'search': consulta})
+        self.assertEqual(respuesta.status_code, 200)
+        return sorted(fila['titulo'] for fila in respuesta.json())
+
+    def test_campo_dirigido_no_busca_en_otras_columnas(self):
+        self.assertEqual(self.titulos('autor:garcia'), ['Cálculo I', 'Cálculo II'])
+        self.assertEqual(self.titulos('garcia'), ['Cálculo I', 'Cálculo II', 'Historia de García Moreno'])
+
+    def test_rangos_opciones_y_frases(self):
+        self.assertEqual(self.titulos('materia:"calculo" anio:2015..2020 estado:malo'), ['Cálculo I'])
+        self.assertEqual(self.titulos('anio:2018..'), ['Cálculo II', 'Historia de García Moreno'])
+        self.assertEqual(self.titulos('codigo:MAT-*'), ['Cálculo I', 'Cálculo II'])
+        self.assertEqual(self.titulos('codigo:his-001'), ['Historia de García Moreno'])
+
+    def test_texto_por_prefijo_y_contiene_a_pedido(self):
+        self.assertEqual(self.titulos('titulo:historia'), ['Historia de García Moreno'])
+        self.assertEqual(self.titulos('titulo:moreno'), [])
+        self.assertEqual(self.titulos('titulo:*moreno'), ['Historia de García Moreno'])
+
+    def test_campo_con_terminos_libres(self):
+        self.assertEqual(self.titulos('autor:garcia II'), ['Cálculo II'])
+
+    def test_valor_invalido(self):
+        respuesta = self.client.get('/api/libros/', {'search': 'anio:dosmil'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ListaLigeraTests(CatalogoAPITestCase):
+    def test_lista_igual_al_serializer_completo(self):
+        Libro.objects.create(titulo='A', codigo_seccion_full='S1-R1-0001', materia='Física')
+        Libro.objects.create(titulo='B', codigo_seccion_full='S1-R1-0002')
+
+        respuesta = self.client.get('/api/libros/')
+        libros = Libro.objects.annotate(**disponibilidad.anotaciones_prestamo()).order_by('orden_seccion')
+        esperado = LibroSerializer(libros, many=True).data
+        self.assertEqual(respuesta.json(), [dict(fila) for fila in esperado])
+
+    def test_fields_limita_columnas(self):
+        Libro.objects.create(titulo='A', autor='X')
+        respuesta = self.client.get('/api/libros/', {'fields': 'id,titulo'})
+        self.assertEqual(list(respuesta.json()[0]), ['id', 'titulo'])
+
+        respuesta = self.client.get('/api/libros/', {'fields': 'titulo', 'limite': 1})
+        self.assertEqual(respuesta.json()['results'], [{'titulo': 'A'}])
+
+        respuesta = self.client.get('/api/libros/', {'fields': 'titulo,clave'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_selector_resuelve_tipo_en_una_consulta(self):
+        Libro.objects.create(titulo='Libro')
+        TrabajoGrado.objects.create(titulo='Tesis')
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/api/activos/', {'fields': 'titulo,tipo'})
+        self.assertEqual(
+            sorted((fila['titulo'], fila['tipo']) for fila in respuesta.json()),
+            [('Libro', 'LIBRO'), ('Tesis', 'TESIS')],
+        )
+
+    def test_selector_filtra_por_tipo(self):
+        Libro.objects.create(titulo='Libro')
+        TrabajoGrado.objects.create(titulo='Tesis')
+        respuesta = self.client.get('/api/activos/', {'tipo': 'TESIS', 'fields': 'titulo'})
+        self.assertEqual(respuesta.json(), [{'titulo': 'Tesis'}])
+        self.assertEqual(self.client.get('/api/activos/', {'tipo': 'REVISTA'}).status_code, 400)
+
+    def test_tipo_guardado_sin_consultar_tablas_hijas(self):
+        libro = Libro.objects.create(titulo='Libro')
+        tesis = TrabajoGrado.objects.create(titulo='Tesis')
+        activos = ActivoBibliografico.objects.in_bulk([libro.pk, tesis.pk])
+        with self.assertNumQueries(0):
+            tipos = [activos[libro.pk].tipo_activo, activos[tesis.pk].tipo_activo]
+        self.assertEqual(tipos, ['LIBRO', 'TESIS'])
+
+        # Guardar la fila padre no pierde el tipo
+        activos[libro.pk].save()
+        libro.refresh_from_db()
+        self.assertEqual(libro.tipo_activo, 'LIBRO')
+
+
+class StreamingCatalogoTests(CatalogoAPITestCase):
+    def consumir(self, **params):
+        """Lee la respuesta en streaming y devuelve (JSON, pico de memoria mientras se genera)"""
+        respuesta = self.client.get('/api/libros/', {'stream': '1', **params})
+        self.assertTrue(respuesta.streaming)
+        tracemalloc.start()
+        try:
+            total = 0
+            for parte in respuesta.streaming_content:
+                total += len(parte)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return total, pico
+
+    def test_stream_igual_a_la_lista(self):
+        Libro.objects.create(titulo='Álgebra', codigo_seccion_full='S1-R1-0002')
+        Libro.objects.create(titulo='Física', codigo_seccion_full='S1-R1-0001')
+        respuesta = self.client.get('/api/libros/', {'stream': '1', 'fields': 'titulo,fecha_registro'})
+        datos = json.loads(b''.join(respuesta.streaming_content))
+        self.assertEqual(datos, self.client.get('/api/libros/', {'fields': 'titulo,fecha_registro'}).json())
+
+    def test_memoria_no_crece_con_el_catalogo(self):
+        crear_libros_masivos(0, 2000)
+        bytes_chico, pico_chico = self.consumir()
+        crear_libros_masivos(2000, 20000)
+        bytes_grande, pico_grande = self.consumir()
+
+        self.assertGreater(bytes_grande, bytes_chico * 8)
+        # 10 veces más filas, pero el pico de memoria se mantiene (lotes de tamaño fijo)
+        self.assertLess(pico_grande, pico_chico * 2)
+
+
+class LecturaCondicionalTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.libro = Libro.objects.create(titulo='Redes', codigo_seccion_full='S1-R1-0001')
+
+    def revalidar(self, url, respuesta):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+
+    def test_lectura_sin_cambios_responde_304_sin_tocar_el_catalogo(self):
+        primera = self.client.get('/api/libros/')
+        self.assertEqual(primera.status_code, 200)
+        self.assertIn('no-cache', primera['Cache-Control'])
+
+        # Solo se consulta la tabla de versiones
+        with self.assertNumQueries(1):
+            segunda = self.revalidar('/api/libros/', primera)
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(segunda.content, b'')
+
+    def test_cambios_en_la_familia_renuevan_el_etag(self):
+        primera = self.client.get('/api/libros/')
+        self.libro.titulo = 'Redes II'
+        self.libro.save()
+        segunda = self.revalidar('/api/libros/', primera)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(segunda.json()[0]['titulo'], 'Redes II')
+
+        self.libro.delete()
+        self.assertEqual(self.revalidar('/api/libros/', segunda).status_code, 200)
+
+    def test_otras_familias_no_invalidan(self):
+        primera = self.client.get('/api/libros/')
+        TrabajoGrado.objects.create(titulo='Tesis', codigo_nuevo='ADM-0001')
+        self.assertEqual(self.revalidar('/api/libros/', primera).status_code, 304)
+
+    def test_etag_depende_de_los_parametros(self):
+        todos = self.client.get('/api/libros/')
+        filtrados = self.client.get('/api/libros/', {'search': 'redes'})
+        self.assertNotEqual(todos['ETag'], filtrados['ETag'])
+        repetido = self.client.get('/api/libros/', {'search': 'redes'}, HTTP_IF_NONE_MATCH=todos['ETag'])
+        self.assertEqual(repetido.status_code, 200)
+
+    def test_prestados_publico_y_secciones(self):
+        publico = APIClient().get('/api/prestados-publico/')
+        secciones = self.client.get('/api/secciones-disponibles/')
+        self.assertEqual(secciones.json(), ['S1-R1'])
+
+        estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+        Prestamo.objects.create(activo=self.libro, estudiante=estudiante, tipo='SALA')
+
+        renovado = APIClient().get('/api/prestados-publico/', HTTP_IF_NONE_MATCH=publico['ETag'])
+        self.assertEqual(renovado.status_code, 200)
+        self.assertEqual(renovado.json()['prestados'], [self.libro.pk])
+        # El préstamo no cambia las secciones del catálogo
+        self.assertEqual(self.revalidar('/api/secciones-disponibles/', secciones).status_code, 304)
+
+
+class CacheCatalogoTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.libro = Libro.objects.create(titulo='Redes', autor='Tanenbaum', codigo_seccion_full='S1-R1-0001')
+        Libro.objects.create(titulo='Cálculo', autor='Stewart', codigo_seccion_full='S1-R1-0002')
+
+    def test_busqueda_repetida_sale_de_cache(self):
+        primera = self.client.get('/api/libros/', {'search': 'redes', 'fields': 'id,titulo'})
+        # Solo la tabla de versiones: ni búsqueda ni serialización
+        with self.assertNumQueries(1):
+            segunda = self.client.get('/api/libros/', {'fields': 'id,titulo', 'search': 'redes', 'autor': ''})
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['Content-Type'], 'application/json')
+        self.assertEqual(segunda.json(), [{'id': self.libro.pk, 'titulo': 'Redes'}])
+
+    def test_guardar_invalida_solo_su_familia(self):
+        self.client.get('/api/libros/')
+        TrabajoGrado.objects.create(titulo='Tesis', codigo_nuevo='ADM-0001')
+        with self.assertNumQueries(1):
+            self.client.get('/api/libros/')
+
+        self.libro.titulo = 'Redes de computadoras'
+        self.libro.save()
+        titulos = [fila['titulo'] for fila in self.client.get('/api/libros/').json()]
+        self.assertIn('Redes de computadoras', titulos)
+
+    def test_restaurar_desde_historial_invalida(self):
+        history_id = self.libro.history.latest().history_id
+        self.libro.delete()
+        self.assertEqual(len(self.client.get('/api/libros/').json()), 1)
+
+        respuesta = self.client.post(f'/api/restaurar/libro/{history_id}/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(self.client.get('/api/libros/').json()), 2)
+
+    @override_settings(CATALOGO_CACHE_MAX_BYTES=10)
+    def test_respuestas_grandes_no_se_guardan(self):
+        self.client.get('/api/libros/')
+        with self.assertNumQueries(2):
+            self.client.get('/api/libros/')
+
+    def test_streaming_y_errores_no_se_guardan(self):
+        self.assertEqual(self.client.get('/api/libros/', {'fields': 'nada'}).status_code, 400)
+        respuesta = self.client.get('/api/libros/', {'stream': '1'})
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(len(json.loads(b''.join(respuesta.streaming_content))), 2)
+
+
+def decodificar_columnar(datos):
+    """Reconstruye las filas de una respuesta ?format=columnar"""
+    columnas = []
+    for nombre, valores in zip(datos['columnas'], datos['valores']):
+        diccionario = datos['diccionarios'].get(nombre)
+        columnas.append([diccionario[i] for i in valores] if diccionario is not None else valores)
+    return [dict(zip(datos['columnas'], fila)) for fila in zip(*columnas)]
+
+
+class FormatoColumnarTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(6):
+            Libro.objects.create(
+                titulo=f'Libro {i}', codigo_seccion_full=f'S1-R1-{i + 1:04d}',
+                estado='BUENO' if i % 3 else 'MALO', materia='Física',
+            )
+
+    def test_columnar_equivale_a_la_lista_json(self):
+        normal = self.client.get('/api/libros/').json()
+        columnar = self.client.get('/api/libros/', {'format': 'columnar'}).json()
+
+        self.assertEqual(columnar['columnas'], list(normal[0]))
+        self.assertEqual(columnar['diccionarios']['estado'], ['MALO', 'BUENO'])
+        self.assertEqual(columnar['diccionarios']['materia'], ['Física'])
+        self.assertNotIn('titulo', columnar['diccionarios'])
+        self.assertEqual(decodificar_columnar(columnar), normal)
+
+    def test_paginado_y_detalle(self):
+        respuesta = self.client.get('/api/libros/', {'format': 'columnar', 'limite': 4, 'fields': 'titulo,estado'})
+        datos = respuesta.json()
+        self.assertIsNotNone(datos['next'])
+        self.assertEqual([fila['titulo'] for fila in decodificar_columnar(datos['results'])],
+                         ['Libro 0', 'Libro 1', 'Libro 2', 'Libro 3'])
+
+        libro = Libro.objects.first()
+        detalle = self.client.get(f'/api/libros/{libro.pk}/', {'format': 'columnar'}).json()
+        self.assertEqual(detalle['titulo'], libro.titulo)
+
+    def test_errores_en_lista_van_como_json(self):
+        renderer = ColumnarJSONRenderer()
+        for datos in (['Este campo es requerido.'], [{'id': 1}, 'texto'], {'results': ['Error']}):
+            self.assertEqual(renderer.render(datos), JSONRenderer().render(datos))
+        self.assertEqual(json.loads(renderer.render([])), {'columnas': [], 'valores': [], 'diccionarios': {}})
+
+    def test_prestamos_y_estudiantes(self):
+        estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+        for libro in Libro.objects.all()[:3]:
+            Prestamo.objects.create(activo=libro, estudiante=estudiante, tipo='SALA')
+
+        for url in ('/api/prestamos/', '/api/estudiantes/'):
+            normal = self.client.get(url).json()
+            columnar = self.client.get(url, {'format': 'columnar'}).json()
+            self.assertEqual(decodificar_columnar(columnar), normal)
+        self.assertIn('tipo', self.client.get('/api/prestamos/', {'format': 'columnar'}).json()['diccionarios'])
+
+
+class AutocompletadoTests(CatalogoAPITestCase):
+    def sugerir(self, q, **params):
+        respuesta = self.client.get('/api/autocomplete/', {'q': q, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['sugerencias']
+
+    def test_ranking_codigo_exacto_prefijo_y_palabras(self):
+        Libro.objects.create(titulo='Redes de computadoras', codigo_nuevo='RED', autor='Tanenbaum')
+        Libro.objects.create(titulo='Teoría de redes', codigo_nuevo='RED-0002')
+        TrabajoGrado.objects.create(titulo='Red neuronal', codigo_nuevo='INF-0001', tutor='Ing. Redondo')
+
+        sugerencias = [(s['campo'], s['texto']) for s in self.sugerir('red')]
+        self.assertEqual(sugerencias, [
+            ('CODIGO', 'RED'),                     # código exacto
+            ('CODIGO', 'RED-0002'),                # código por prefijo
+            ('TITULO', 'Red neuronal'),            # título que empieza con el prefijo
+            ('TITULO', 'Redes de computadoras'),
+            ('TITULO', 'Teoría de redes'),         # palabra intermedia del título
+            ('TUTOR', 'Ing. Redondo'),
+        ])
+
+    def test_normaliza_y_agrupa_repetidos(self):
+        for i in range(3):
+            Libro.objects.create(titulo=f'Obra {i}', autor='José García')
+        sugerencias = self.sugerir('GARCÍ')
+        self.assertEqual(sugerencias, [{'texto': 'José García', 'campo': 'AUTOR', 'cantidad': 3, 'activo': None}])
+
+        libro = Libro.objects.create(titulo='Única', codigo_seccion_full='S9-R1-0001')
+        self.assertEqual(self.sugerir('s9-r1')[0]['activo'], libro.pk)
+
+    def test_indice_incremental(self):
+        libro = Libro.objects.create(titulo='Álgebra lineal')
+        self.assertEqual(len(self.sugerir('lineal')), 1)
+
+        libro.titulo = 'Geometría analítica'
+        libro.save()
+        self.assertEqual(self.sugerir('lineal'), [])
+        self.assertEqual(self.sugerir('analit')[0]['texto'], 'Geometría analítica')
+
+        libro.delete()
+        self.assertEqual(self.sugerir('analit'), [])
+
+    def test_limite_maximo_y_consulta_vacia(self):
+        for i in range(30):
+            Libro.objects.create(titulo=f'Física {i:02d}')
+        self.assertEqual(len(self.sugerir('fisica')), 10)
+        self.assertEqual(len(self.sugerir('fisica', limite=500)), 20)
+        self.assertEqual(self.sugerir('   '), [])
+
+    def test_candidatos_en_orden_del_indice(self):
+        # El recorte sigue el índice (clave, peso DESC, activo_id); el ranking se hace después
+        Libro.objects.create(titulo='Otro', autor='Reda Alanoca')
+        Libro.objects.create(titulo='Redz', autor='Redb Bustos')
+        with mock.patch.object(autocompletado, 'MAX_CANDIDATOS', 2):
+            self.assertEqual([s['texto'] for s in self.sugerir('red')], ['Reda Alanoca', 'Redb Bustos'])
+        self.assertEqual(self.sugerir('red')[0]['texto'], 'Redz')
+
+        if connection.vendor == 'sqlite':
+            consulta = (
+                EntradaAutocompletado.objects.filter(clave__prefijo='red')
+                .order_by('clave', '-peso', 'activo_id').values_list('texto')[:2]
+            )
+            sql, params = consulta.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' | '.join(fila[-1] for fila in cursor.fetchall())
+            self.assertIn('autocompletado_clave_peso_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_latencia_con_catalogo_grande(self):
+        crear_libros_masivos(0, 20000)
+        EntradaAutocompletado.objects.bulk_create(
+            [
+                EntradaAutocompletado(activo_id=pk, campo=campo, clave=clave, texto=texto, peso=peso)
+                for pk, titulo in ActivoBibliografico.objects.values_list('pk', 'titulo')
+                for campo, clave, texto, peso in claves_autocompletado(ActivoBibliografico(titulo=titulo))
+            ],
+            batch_size=2000,
+        )
+        tiempos = []
+        for q in ['l', 'libro 1', 'libro 19', 'libro 1999']:
+            for _ in range(5):
+                inicio = time.perf_counter()
+                self.assertTrue(sugerencias(q))
+                tiempos.append(time.perf_counter() - inicio)
+        self.assertLess(statistics.median(tiempos), 0.010)
+
+
+class FacetasTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        datos = [
+            ('Redes', 'BUENO', 2020, 'Física', 'S1'),
+            ('Redes II', 'BUENO', 2021, 'Física', 'S1'),
+            ('Cálculo', 'MALO', 2020, 'Matemática', 'S2'),
+            ('Álgebra', 'BUENO', None, 'Matemática', 'S2'),
+        ]
+        for titulo, estado, anio, materia, seccion in datos:
+            Libro.objects.create(titulo=titulo, estado=estado, anio=anio, materia=materia, ubicacion_seccion=seccion)
+
+    def facetas(self, **params):
+        respuesta = self.client.get('/api/libros/facetas/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        return datos['total'], {
+            campo: {item['valor']: item['cantidad'] for item in valores}
+            for campo, valores in datos['facetas'].items()
+        }
+
+    def test_conteos_en_una_consulta(self):
+        # Versiones + una consulta agrupada
+        with self.assertNumQueries(2):
+            total, facetas = self.facetas()
+        self.assertEqual(total, 4)
+        self.assertEqual(facetas['estado'], {'BUENO': 3, 'MALO': 1})
+        self.assertEqual(facetas['anio'], {2020: 2, 2021: 1, None: 1})
+        self.assertEqual(facetas['materia'], {'Física': 2, 'Matemática': 2})
+        self.assertEqual(facetas['ubicacion_seccion'], {'S1': 2, 'S2': 2})
+
+    def test_respeta_filtros_y_busqueda(self):
+        total, facetas = self.facetas(estado='BUENO', search='redes')
+        self.assertEqual(total, 2)
+        self.assertEqual(facetas['anio'], {2020: 1, 2021: 1})
+        self.assertEqual(facetas['materia'], {'Física': 2})
+
+        total, facetas = self.facetas(difuso='calculo')
+        self.assertEqual(facetas['estado'], {'MALO': 1})
+
+    def test_cacheado_con_la_version_del_catalogo(self):
+        self.facetas()
+        with self.assertNumQueries(1):
+            self.facetas()
+        Libro.objects.create(titulo='Nuevo', estado='REGULAR')
+        total, facetas = self.facetas()
+        self.assertEqual(total, 5)
+        self.assertEqual(facetas['estado']['REGULAR'], 1)
+
+    def test_facetas_de_tesis(self):
+        TrabajoGrado.objects.create(titulo='T1', modalidad='TESIS', carrera='Sistemas')
+        TrabajoGrado.objects.create(titulo='T2', modalidad='TESIS', carrera='Derecho')
+        total, facetas = self.client.get('/api/tesis/facetas/').json().values()
+        self.assertEqual(total, 2)
+        self.assertEqual(facetas['modalidad'], [{'valor': 'TESIS', 'cantidad': 2}])
+
+
+class SincronizacionIncrementalTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # Sin margen de solapamiento: cada cambio llega exactamente una vez
+        margen = mock.patch.object(CambiosMixin, 'margen_cambios', timedelta(0))
+        margen.start()
+        self.addCleanup(margen.stop)
+
+    def cambios(self, url='/api/libros/changes/', **params):
+        respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_sin_token_devuelve_todo(self):
+        Libro.objects.create(titulo='A')
+        Libro.objects.create(titulo='B')
+        datos = self.cambios(fields='titulo')
+        self.assertEqual(sorted(fila['titulo'] for fila in datos['actualizados']), ['A', 'B'])
+        self.assertEqual(datos['eliminados'], [])
+        self.assertTrue(datos['token'])
+
+    def test_solo_cambios_desde_el_token(self):
+        a = Libro.objects.create(titulo='A')
+        b = Libro.objects.create(titulo='B')
+        Libro.objects.create(titulo='C')
+        token = self.cambios()['token']
+
+        a.titulo = 'A2'
+        a.save()
+        b_id = b.pk
+        b.delete()
+        d = Libro.objects.create(titulo='D')
+        TrabajoGrado.objects.create(titulo='Tesis')
+
+        datos = self.cambios(since=token, fields='id,titulo')
+        self.assertEqual(sorted(datos['actualizados'], key=lambda f: f['id']),
+                         [{'id': a.pk, 'titulo': 'A2'}, {'id': d.pk, 'titulo': 'D'}])
+        self.assertEqual(datos['eliminados'], [b_id])
+
+        # Nada nuevo desde el último token
+        vacio = self.cambios(since=datos['token'])
+        self.assertEqual((vacio['actualizados'], vacio['eliminados']), ([], []))
+
+    def test_margen_reenvia_cambios_recientes(self):
+        # Un cambio con history_id menor que el token puede confirmar después de emitirlo
+        libro = Libro.objects.create(titulo='A')
+        token = self.cambios()['token']
+        self.assertEqual(self.cambios(since=token)['actualizados'], [])
+        with mock.patch.object(CambiosMixin, 'margen_cambios', timedelta(minutes=2)):
+            self.assertEqual(self.cambios(since=token, fields='id')['actualizados'], [{'id': libro.pk}])
+
+    def test_prestamo_cuenta_como_cambio_del_activo(self):
+        libro = Libro.objects.create(titulo='A')
+        Libro.objects.create(titulo='B')
+        token = self.cambios()['token']
+        estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+        prestamo = Prestamo.objects.create(activo=libro, estudiante=estudiante, tipo='SALA')
+
+        datos = self.cambios(since=token, fields='id,prestado')
+        self.assertEqual(datos['actualizados'], [{'id': libro.pk, 'prestado': True}])
+
+        prestamo.estado = 'DEVUELTO'
+        prestamo.save()
+        devuelto = self.cambios(since=datos['token'], fields='id,prestado')
+        self.assertEqual(devuelto['actualizados'], [{'id': libro.pk, 'prestado': False}])
+
+    def test_borrado_y_restaurado_cuenta_como_actualizado(self):
+        libro = Libro.objects.create(titulo='A')
+        token = self.cambios()['token']
+        libro_id, history_id = libro.pk, libro.history.latest().history_id
+        libro.delete()
+        self.client.post(f'/api/restaurar/libro/{history_id}/')
+
+        datos = self.cambios(since=token, fields='id')
+        self.assertEqual(datos['actualizados'], [{'id': libro_id}])
+        self.assertEqual(datos['eliminados'], [])
+
+    def test_tesis_y_token_invalido(self):
+        tesis = TrabajoGrado.objects.create(titulo='T1')
+        token = self.cambios('/api/tesis/changes/')['token']
+        tesis_id = tesis.pk
+        tesis.delete()
+        self.assertEqual(self.cambios('/api/tesis/changes/', since=token)['eliminados'], [tesis_id])
+
+        respuesta = self.client.get('/api/tesis/changes/', {'since': 'no-es-un-token'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class EventosPrestamosTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        eventos.canal.reiniciar()
+        eventos.canal.intervalo = 0.01
+        self.addCleanup(setattr, eventos.canal, 'intervalo', eventos.CanalPrestamos.intervalo)
+        self.libro = Libro.objects.create(titulo='Redes')
+        self.otro = Libro.objects.create(titulo='Cálculo')
+        self.estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+
+    def abrir_stream(self):
+        respuesta = APIClient().get('/api/prestados-publico/eventos/')
+        self.addCleanup(respuesta.close)
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        return iter(respuesta.streaming_content)
+
+    def leer(self, stream):
+        """Siguiente mensaje SSE como (evento, datos), saltando latidos"""
+        while True:
+            bloque = next(stream).decode()
+            if bloque.startswith(':') or bloque.startswith('retry:'):
+                continue
+            campos = dict(linea.split(': ', 1) for linea in bloque.strip().split('\n'))
+            return campos['event'], json.loads(campos['data'])
+
+    def prestar(self, activo, tipo='SALA'):
+        respuesta = self.client.post('/api/prestamos/', {'activo': activo.pk, 'estudiante': self.estudiante.pk, 'tipo': tipo})
+        self.assertEqual(respuesta.status_code, 201)
+        return respuesta.json()['id']
+
+    def test_foto_inicial_y_luego_solo_cambios(self):
+        self.prestar(self.libro)
+        stream = self.abrir_stream()
+        self.assertEqual(self.leer(stream), ('snapshot', {'prestados': [self.libro.pk]}))
+
+        prestamo_id = self.prestar(self.otro)
+        self.assertEqual(self.leer(stream), ('prestado', {'activo': self.otro.pk, 'prestamo': prestamo_id}))
+
+        self.client.post(f'/api/prestamos/{prestamo_id}/devolver/')
+        self.assertEqual(self.leer(stream), ('devuelto', {'activo': self.otro.pk, 'prestamo': prestamo_id}))
+
+    def test_foto_en_cache_por_version(self):
+        self.prestar(self.libro)
+        with mock.patch.object(disponibilidad, 'prestados_actuales', wraps=disponibilidad.prestados_actuales) as leer:
+            for _ in range(3):
+                self.assertEqual(self.leer(self.abrir_stream()), ('snapshot', {'prestados': [self.libro.pk]}))
+            self.assertEqual(leer.call_count, 1)
+            self.prestar(self.otro)
+            self.assertEqual(self.leer(self.abrir_stream())[1], {'prestados': sorted([self.libro.pk, self.otro.pk])})
+            self.assertEqual(leer.call_count, 2)
+
+    def test_cambio_de_sala_a_domicilio(self):
+        sala_id = self.prestar(self.libro)
+        stream = self.abrir_stream()
+        self.leer(stream)
+        domicilio_id = self.prestar(self.libro, tipo='DOMICILIO')
+        self.assertEqual(self.leer(stream), ('devuelto', {'activo': self.libro.pk, 'prestamo': sala_id}))
+        self.assertEqual(self.leer(stream), ('prestado', {'activo': self.libro.pk, 'prestamo': domicilio_id}))
+
+    def test_cliente_atrasado_recibe_otra_foto(self):
+        eventos.canal.capacidad = 2
+        self.addCleanup(setattr, eventos.canal, 'capacidad', eventos.CanalPrestamos.capacidad)
+        stream = self.abrir_stream()
+        self.leer(stream)
+        for activo in (self.libro, self.otro):
+            prestamo = Prestamo.objects.create(activo=activo, estudiante=self.estudiante, tipo='SALA')
+            eventos.publicar_evento(eventos.PRESTADO, prestamo)
+            eventos.publicar_evento(eventos.ATRASADO, prestamo)
+        # 4 eventos con capacidad 2: el stream perdió la continuidad
+        eventos.canal.actualizar()
+        self.assertEqual(self.leer(stream), ('snapshot', {'prestados': sorted([self.libro.pk, self.otro.pk])}))
+
+    @override_settings(EVENTOS_STREAMS_POR_PROCESO=1)
+    def test_sin_lugar_solo_foto_y_reconexion_tardia(self):
+        primera = APIClient().get('/api/prestados-publico/eventos/')
+        self.assertEqual(self.leer(iter(primera.streaming_content))[0], 'snapshot')
+
+        lleno = self.abrir_stream()
+        self.assertEqual(next(lleno), b'retry: 3000\n\n')
+        self.assertEqual(self.leer(lleno)[0], 'snapshot')
+        self.assertEqual(next(lleno), b'retry: 15000\n\n')
+        self.assertIsNone(next(lleno, None))
+
+        # Al cerrarse el primero se libera su lugar
+        primera.close()
+        nuevo = self.abrir_stream()
+        self.leer(nuevo)
+        self.prestar(self.libro)
+        self.assertEqual(self.leer(nuevo), ('prestado', {'activo': self.libro.pk, 'prestamo': Prestamo.objects.get().pk}))
+
+    def test_una_consulta_por_intervalo_para_todos_los_streams(self):
+        eventos.canal.intervalo = 60
+        eventos.canal.actualizar()
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                eventos.canal.esperar(eventos.canal.posicion(), timeout=0)
+        # Un aviso (préstamo confirmado en este proceso) adelanta la consulta
+        eventos.canal.avisar()
+        with self.assertNumQueries(1):
+            eventos.canal.esperar(eventos.canal.posicion(), timeout=0)
+
+
+def decodificar_rle(rle):
+    ids = []
+    posicion = 0
+    for i in range(0, len(rle), 2):
+        inicio = posicion + rle[i]
+        ids.extend(range(inicio, inicio + rle[i + 1]))
+        posicion = inicio + rle[i + 1]
+    return ids
+
+
+def decodificar_bitmap(base, bitmap):
+    bits = base64.b64decode(bitmap)
+    return [base + i for i in range(len(bits) * 8) if bits[i // 8] >> (i % 8) & 1]
+
+
+class PrestadosPublicoTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.publico = APIClient()
+        self.estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}') for i in range(12)]
+        for i in (0, 1, 2, 5, 9, 10):
+            Prestamo.objects.create(activo=self.libros[i], estudiante=self.estudiante, tipo='SALA')
+        self.esperados = [self.libros[i].pk for i in (0, 1, 2, 5, 9, 10)]
+
+    def test_codificaciones_compactas(self):
+        lista = self.publico.get('/api/prestados-publico/').json()
+        self.assertEqual(lista['prestados'], self.esperados)
+        self.assertEqual(lista['total'], 6)
+
+        rle = self.publico.get('/api/prestados-publico/', {'codificacion': 'rle'}).json()
+        self.assertEqual(len(rle['rle']), 6)  # tres tramos consecutivos
+        self.assertEqual(decodificar_rle(rle['rle']), self.esperados)
+
+        bitmap = self.publico.get('/api/prestados-publico/', {'codificacion': 'bitmap'}).json()
+        self.assertEqual(decodificar_bitmap(bitmap['base'], bitmap['bitmap']), self.esperados)
+        self.assertEqual(lista['version'], rle['version'])
+
+        self.assertEqual(self.publico.get('/api/prestados-publico/', {'codificacion': 'zip'}).status_code, 400)
+
+    def test_conjunto_en_cache_hasta_que_cambia_un_prestamo(self):
+        version = self.publico.get('/api/prestados-publico/').json()['version']
+        # Solo la versión: ni Prestamo ni activos
+        with self.assertNumQueries(1):
+            self.publico.get('/api/prestados-publico/', {'codificacion': 'rle'})
+
+        prestamo = Prestamo.objects.get(activo=self.libros[5])
+        prestamo.estado = 'ATRASADO'
+        prestamo.save()
+        datos = self.publico.get('/api/prestados-publico/').json()
+        self.assertGreater(datos['version'], version)
+        self.assertIn(self.libros[5].pk, datos['prestados'])
+
+        prestamo.estado = 'DEVUELTO'
+        prestamo.save()
+        self.assertNotIn(self.libros[5].pk, self.publico.get('/api/prestados-publico/').json()['prestados'])
+
+
+class EstadoPrestamoEnListaTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+
+    def test_filas_incluyen_prestamo_actual(self):
+        prestado = Libro.objects.create(titulo='A', codigo_seccion_full='S1-R1-0001')
+        Libro.objects.create(titulo='B', codigo_seccion_full='S1-R1-0002')
+        devuelto = Libro.objects.create(titulo='C', codigo_seccion_full='S1-R1-0003')
+        Prestamo.objects.create(activo=prestado, estudiante=self.estudiante, tipo='DOMICILIO')
+        Prestamo.objects.create(activo=devuelto, estudiante=self.estudiante, tipo='SALA', estado='DEVUELTO')
+
+        filas = self.client.get('/api/libros/').json()
+        self.assertEqual(
+            [(fila['titulo'], fila['prestado'], fila['prestamo_tipo'], fila['prestamo_estudiante']) for fila in filas],
+            [('A', True, 'DOMICILIO', 'Ana Quispe'), ('B', False, None, None), ('C', False, None, None)],
+        )
+        self.assertIsNotNone(filas[0]['fecha_devolucion_estimada'])
+
+        detalle = self.client.get(f'/api/libros/{prestado.pk}/').json()
+        self.assertTrue(detalle['prestado'])
+
+    def test_consultas_constantes(self):
+        for i in range(3):
+            tesis = TrabajoGrado.objects.create(titulo=f'T{i}', codigo_nuevo=f'CPU-{i}')
+            Prestamo.objects.create(activo=tesis, estudiante=self.estudiante, tipo='SALA')
+        # Versiones y lista (con sus subconsultas) sin importar cuántas filas estén prestadas
+        with self.assertNumQueries(2):
+            filas = self.client.get('/api/tesis/', {'fields': 'titulo,prestado,prestamo_tipo'}).json()
+        self.assertEqual([fila['prestamo_tipo'] for fila in filas], ['SALA'] * 3)
+
+    def test_editar_estudiante_invalida_lista_en_cache(self):
+        libro = Libro.objects.create(titulo='A')
+        Prestamo.objects.create(activo=libro, estudiante=self.estudiante, tipo='SALA')
+        self.assertEqual(self.client.get('/api/libros/').json()[0]['prestamo_estudiante'], 'Ana Quispe')
+
+        self.estudiante.nombre_completo = 'Ana María Quispe'
+        self.estudiante.save()
+        self.assertEqual(self.client.get('/api/libros/').json()[0]['prestamo_estudiante'], 'Ana María Quispe')
+
+    def test_prestamo_invalida_lista_en_cache(self):
+        libro = Libro.objects.create(titulo='A')
+        self.assertFalse(self.client.get('/api/libros/').json()[0]['prestado'])
+
+        prestamo = Prestamo.objects.create(activo=libro, estudiante=self.estudiante, tipo='SALA')
+        self.assertTrue(self.client.get('/api/libros/').json()[0]['prestado'])
+
+        prestamo.estado = 'DEVUELTO'
+        prestamo.save()
+        self.assertFalse(self.client.get('/api/libros/').json()[0]['prestado'])
+
+
+class SelectorActivosTests(CatalogoAPITestCase):
+    def seleccionar(self, **params):
+        respuesta = self.client.get('/api/activos/selector/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_orden_codigo_exacto_prefijo_y_titulo(self):
+        Libro.objects.create(titulo='Redes de computadoras', codigo_nuevo='RED-10')
+        Libro.objects.create(titulo='Cálculo', codigo_nuevo='RED-1')
+        Libro.objects.create(titulo='Introducción a las redes', codigo_nuevo='INT-1')
+        TrabajoGrado.objects.create(titulo='Redes neuronales', codigo_nuevo='CPU-001')
+        Libro.objects.create(titulo='Química', codigo_nuevo='QUI-1')
+
+        datos = self.seleccionar(q='red-1')
+        self.assertEqual([fila['codigo_nuevo'] for fila in datos['activos']], ['RED-1', 'RED-10'])
+
+        datos = self.seleccionar(q='red')
+        self.assertEqual(
+            [fila['titulo'] for fila in datos['activos']],
+            ['Cálculo', 'Redes de computadoras', 'Redes neuronales', 'Introducción a las redes'],
+        )
+        self.assertFalse(datos['hay_mas'])
+
+    def test_tipo_disponibilidad_y_tope(self):
+        estudiante = Estudiante.objects.create(
+            nombre_completo='Ana Quispe', carnet_universitario='C-1', ci='123', carrera='Sistemas'
+        )
+        libros = [Libro.objects.create(titulo=f'Física {i:02d}') for i in range(60)]
+        TrabajoGrado.objects.create(titulo='Física cuántica')
+        Prestamo.objects.create(activo=libros[0], estudiante=estudiante, tipo='SALA')
+
+        datos = self.seleccionar(q='fisica', limite=500)
+        self.assertEqual(len(datos['activos']), 50)
+        self.assertTrue(datos['hay_mas'])
+        self.assertEqual(datos['activos'][0], {
+            'id': libros[0].pk, 'titulo': 'Física 00', 'codigo_nuevo': None, 'autor': None,
+            'estado': 'BUENO', 'tipo': 'LIBRO', 'disponible': False,
+        })
+        self.assertTrue(datos['activos'][1]['disponible'])
+
+        datos = self.seleccionar(q='fisica', tipo='TESIS')
+        self.assertEqual([fila['titulo'] for fila in datos['activos']], ['Física cuántica'])
+
+        respuesta = self.client.get('/api/activos/selector/', {'q': 'fisica', 'tipo': 'REVISTA'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_consultas_constantes(self):
+        for i in range(30):
+            Libro.objects.create(titulo=f'Álgebra {i}', codigo_nuevo=f'ALG-{i}')
+        # Ranking sobre el índice y datos de los elegidos, sin importar cuántos coincidan
+        with self.assertNumQueries(2):
+            self.client.get('/api/activos/selector/', {'q': 'alg'})
+        with self.assertNumQueries(0):
+            self.client.get('/api/activos/selector/', {'q': ' '})
+
+
+class ConsultasPrestamosTests(CatalogoAPITestCase):
+    def crear_prestamos(self, cantidad):
+        inicio = Estudiante.objects.count()
+        for i in range(inicio, inicio + cantidad):
+            estudiante = Estudiante.objects.create(
+                nombre_completo=f'Estudiante {i}', carnet_universitario=f'C-{i}', ci=f'{i}', carrera='Sistemas'
+            )
+            libro = Libro.objects.create(titulo=f'Libro {i}', codigo_nuevo=f'L-{i}')
+            Prestamo.objects.create(activo=libro, estudiante=estudiante, tipo='SALA', usuario_prestamo=self.usuario)
+
+    def test_lista_igual_al_serializer_completo(self):
+        self.crear_prestamos(3)
+        respuesta = self.client.get('/api/prestamos/')
+        esperado = PrestamoSerializer(Prestamo.objects.order_by('-fecha_prestamo', '-pk'), many=True).data
+        self.assertEqual(respuesta.json(), [dict(fila) for fila in esperado])
+        self.assertEqual(respuesta.json()[0]['activo_tipo'], 'LIBRO')
+
+    def test_consultas_constantes(self):
+        self.crear_prestamos(3)
+        with self.assertNumQueries(1):
+            self.client.get('/api/prestamos/')
+        self.crear_prestamos(30)
+        with self.assertNumQueries(1):
+            filas = self.client.get('/api/prestamos/', {'estado': 'VIGENTE', 'search': 'libro'}).json()
+        self.assertEqual(len(filas), 33)
+
+        prestamo = Prestamo.objects.first()
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/prestamos/{prestamo.pk}/')
+
+    def test_paginas_del_mas_reciente_al_mas_antiguo(self):
+        self.crear_prestamos(7)
+        # Varios préstamos en el mismo instante: el desempate es el id
+        Prestamo.objects.filter(pk__in=list(Prestamo.objects.values_list('pk', flat=True)[:4])).update(
+            fecha_prestamo=Prestamo.objects.first().fecha_prestamo
+        )
+        completo = [fila['id'] for fila in self.client.get('/api/prestamos/').json()]
+
+        ids = []
+        respuesta = self.client.get('/api/prestamos/', {'limite': 3})
+        while True:
+            ids.extend(fila['id'] for fila in respuesta.json()['results'])
+            if not respuesta.json()['next']:
+                break
+            respuesta = self.client.get(respuesta.json()['next'])
+        self.assertEqual(ids, completo)
+        self.assertEqual(len(ids), 7)
+
+
+class EstudiantesTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.libros = [Libro.objects.create(titulo=f'Libro {i}') for i in range(4)]
+
+    def crear_estudiante(self, nombre, carnet, ci):
+        return Estudiante.objects.create(nombre_completo=nombre, carnet_universitario=carnet, ci=ci, carrera='Sistemas')
+
+    def test_conteos_de_prestamos(self):
+        ana = self.crear_estudiante('Ana', 'C-1', '100')
+        self.crear_estudiante('Luis', 'C-2', '200')
+        Prestamo.objects.create(activo=self.libros[0], estudiante=ana, tipo='SALA')
+        Prestamo.objects.create(activo=self.libros[1], estudiante=ana, tipo='DOMICILIO', estado='ATRASADO')
+        Prestamo.objects.create(activo=self.libros[2], estudiante=ana, tipo='SALA', estado='DEVUELTO')
+
+        filas = self.client.get('/api/estudiantes/').json()
+        self.assertEqual(
+            [(fila['nombre_completo'], fila['prestamos_activos'], fila['prestamos_atrasados']) for fila in filas],
+            [('Ana', 2, 1), ('Luis', 0, 0)],
+        )
+        detalle = self.client.get(f'/api/estudiantes/{ana.pk}/').json()
+        self.assertEqual((detalle['prestamos_activos'], detalle['prestamos_atrasados']), (2, 1))
+
+    def test_consultas_constantes(self):
+        for i in range(3):
+            estudiante = self.crear_estudiante(f'E{i}', f'C-{i}', f'{i}')
+            Prestamo.objects.create(activo=self.libros[i], estudiante=estudiante, tipo='SALA')
+        with self.assertNumQueries(1):
+            self.client.get('/api/estudiantes/')
+        for i in range(3, 40):
+            self.crear_estudiante(f'E{i}', f'C-{i}', f'{i}')
+        with self.assertNumQueries(1):
+            filas = self.client.get('/api/estudiantes/').json()
+        self.assertEqual(len(filas), 40)
+
+    def test_prefijo_de_carnet_y_ci_paginado(self):
+        for i in range(12):
+            self.crear_estudiante(f'E{i:02d}', f'UNI-{i:03d}', f'7{i:03d}')
+        self.crear_estudiante('Otro', 'EXT-001', '8000')
+
+        respuesta = self.client.get('/api/estudiantes/', {'carnet': 'UNI-00', 'limite': 5}).json()
+        self.assertEqual([fila['carnet_universitario'] for fila in respuesta['results']],
+                         [f'UNI-00{i}' for i in range(5)])
+        siguiente = self.client.get(respuesta['next']).json()
+        self.assertEqual([fila['carnet_universitario'] for fila in siguiente['results']],
+                         [f'UNI-00{i}' for i in range(5, 10)])
+        self.assertIsNone(siguiente['next'])
+
+        filas = self.client.get('/api/estudiantes/', {'ci': '8'}).json()
+        self.assertEqual([fila['nombre_completo'] for fila in filas], ['Otro'])
+
+
+class PrestamoUnicoTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.libro = Libro.objects.create(titulo='Redes')
+        self.ana = Estudiante.objects.create(nombre_completo='Ana', carnet_universitario='C-1', ci='1', carrera='Sistemas')
+        self.luis = Estudiante.objects.create(nombre_completo='Luis', carnet_universitario='C-2', ci='2', carrera='Sistemas')
+
+    def test_base_rechaza_dos_prestamos_sin_devolver(self):
+        Prestamo.objects.create(activo=self.libro, estudiante=self.ana, tipo='SALA', estado='ATRASADO')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Prestamo.objects.create(activo=self.libro, estudiante=self.luis, tipo='SALA')
+        # Los devueltos no cuentan
+        Prestamo.objects.create(activo=self.libro, estudiante=self.luis, tipo='SALA', estado='DEVUELTO')
+
+    def test_activo_atrasado_no_se_vuelve_a_prestar(self):
+        Prestamo.objects.create(activo=self.libro, estudiante=self.ana, tipo='DOMICILIO', estado='ATRASADO')
+        respuesta = self.client.post('/api/prestamos/', {'activo': self.libro.pk, 'estudiante': self.luis.pk, 'tipo': 'SALA'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['estudiante'], 'Ana')
+
+    def test_conversion_fallida_no_cierra_el_prestamo_en_sala(self):
+        tesis = TrabajoGrado.objects.create(titulo='Tesis')
+        Prestamo.objects.create(activo=tesis, estudiante=self.ana, tipo='SALA')
+        respuesta = self.client.post('/api/prestamos/', {'activo': tesis.pk, 'estudiante': self.ana.pk, 'tipo': 'DOMICILIO'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Prestamo.objects.get(activo=tesis).estado, 'VIGENTE')
+
+
+class PrestamoConcurrenteTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('La base de pruebas SQLite en memoria no se comparte entre procesos')
+
+    def test_sin_prestamos_dobles_bajo_carga(self):
+        salida = io.StringIO()
+        inicio = time.perf_counter()
+        call_command('carga_prestamos', activos=5, estudiantes=10, procesos=4, hilos=4, operaciones=25, stdout=salida)
+        duracion = time.perf_counter() - inicio
+        self.assertIn('0 errores, 0 préstamos superpuestos', salida.getvalue())
+        # 400 intentos con choques constantes sobre 5 activos: el bloqueo no debe serializarlo todo
+        self.assertLess(duracion, 30)
+        self.assertFalse(Prestamo.objects.exists())
+
+
+class PrestamosAtrasadosTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.estudiante = Estudiante.objects.create(
+            nombre_completo='Ana', carnet_universitario='C-1', ci='1', carrera='Sistemas'
+        )
+        self.ahora = timezone.now()
+
+    def prestamo(self, horas, estado='VIGENTE'):
+        """Préstamo cuyo plazo vence dentro de `horas` (negativo: ya vencido)"""
+        libro = Libro.objects.create(titulo=f'Libro {horas} {estado}')
+        prestamo = Prestamo.objects.create(activo=libro, estudiante=self.estudiante, tipo='SALA', estado=estado)
+        Prestamo.objects.filter(pk=prestamo.pk).update(fecha_devolucion_estimada=self.ahora + timedelta(hours=horas))
+        return prestamo
+
+    def test_barrido_marca_solo_los_vencidos(self):
+        vencido = self.prestamo(-2)
+        vigente = self.prestamo(3)
+        devuelto = self.prestamo(-5, estado='DEVUELTO')
+
+        self.assertEqual(marcar_atrasados(), 1)
+        estados = dict(Prestamo.objects.values_list('pk', 'estado'))
+        self.assertEqual(
+            (estados[vencido.pk], estados[vigente.pk], estados[devuelto.pk]),
+            ('ATRASADO', 'VIGENTE', 'DEVUELTO'),
+        )
+        registro = Prestamo.history.filter(id=vencido.pk).latest('history_id')
+        self.assertEqual((registro.estado, registro.history_type, registro.history_change_reason),
+                         ('ATRASADO', '~', 'Plazo vencido'))
+        self.assertTrue(EventoPrestamo.objects.filter(tipo='ATRASADO', prestamo_id=vencido.pk).exists())
+
+        # Idempotente: una segunda pasada no encuentra nada
+        self.assertEqual(marcar_atrasados(), 0)
+
+    def test_consultas_por_lote_sin_importar_cantidad(self):
+        for _ in range(3):
+            self.prestamo(-1)
+        # SAVEPOINT, SELECT, UPDATE, INSERT de historial, INSERT de eventos, versión, RELEASE
+        with self.assertNumQueries(7) as pocos:
+            marcar_atrasados()
+        for _ in range(40):
+            self.prestamo(-1)
+        with self.assertNumQueries(len(pocos)):
+            self.assertEqual(marcar_atrasados(), 40)
+
+    def test_barrido_invalida_listas_en_cache(self):
+        self.prestamo(-1)
+        self.assertEqual(self.client.get('/api/prestamos/').json()[0]['estado'], 'VIGENTE')
+        marcar_atrasados()
+        self.assertEqual(self.client.get('/api/libros/').json()[0]['prestado'], True)
+        self.assertEqual(self.client.get('/api/prestamos/').json()[0]['estado'], 'ATRASADO')
+
+    def test_hilo_de_barrido_solo_si_se_activa(self):
+        config = apps.get_app_config('inventario')
+        with mock.patch.object(barrido, 'iniciar') as iniciar:
+            with override_settings(BARRIDO_ATRASADOS_INTERVALO=0):
+                config.ready()
+            iniciar.assert_not_called()
+            with override_settings(BARRIDO_ATRASADOS_INTERVALO=300):
+                config.ready()
+            iniciar.assert_called_once_with(300)
+
+    def test_comando(self):
+        self.prestamo(-1)
+        salida = io.StringIO()
+        call_command('marcar_atrasados', stdout=salida)
+        self.assertIn('1 préstamos marcados como ATRASADO', salida.getvalue())
+
+    def test_endpoint_vencimientos(self):
+        marcado = self.prestamo(-30)
+        marcar_atrasados()
+        sin_barrer = self.prestamo(-1)
+        pronto = self.prestamo(2)
+        self.prestamo(48)
+        self.prestamo(-3, estado='DEVUELTO')
+
+        with self.assertNumQueries(2):
+            datos = self.client.get('/api/prestamos/vencimientos/', {'horas': 6}).json()
+        self.assertEqual([fila['id'] for fila in datos['atrasados']], [marcado.pk, sin_barrer.pk])
+        self.assertEqual([fila['id'] for fila in datos['por_vencer']], [pronto.pk])
+        self.assertEqual(datos['por_vencer'][0]['estudiante_nombre'], 'Ana')
+
+        self.assertEqual(self.client.get('/api/prestamos/vencimientos/', {'horas': 'x'}).status_code, 400)
+
+
+class PrestamosEnLoteTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.ana = Estudiante.objects.create(nombre_completo='Ana', carnet_universitario='C-1', ci='1', carrera='Sistemas')
+        self.luis = Estudiante.objects.create(nombre_completo='Luis', carnet_universitario='C-2', ci='2', carrera='Sistemas')
+
+    def libros(self, cantidad, desde=0):
+        return [Libro.objects.create(titulo=f'Libro {n}', codigo_nuevo=f'L-{n}') for n in range(desde, desde + cantidad)]
+
+    def prestar(self, codigos, estudiante=None, tipo='SALA'):
+        datos = {'estudiante': (estudiante or self.ana).pk, 'tipo': tipo, 'codigos': codigos}
+        return self.client.post('/api/prestamos/lote/', datos, format='json')
+
+    def test_resultado_por_item(self):
+        libre, ocupado = self.libros(2)
+        tesis = TrabajoGrado.objects.create(titulo='Tesis', codigo_nuevo='T-1')
+        Prestamo.objects.create(activo=ocupado, estudiante=self.luis, tipo='SALA')
+
+        respuesta = self.prestar(['L-0', 'L-1', 'T-1', 'NO-EXISTE', 'L-0'], tipo='DOMICILIO')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['prestados'], 1)
+        self.assertEqual([r['ok'] for r in datos['resultados']], [True, False, False, False, False])
+        self.assertEqual(datos['resultados'][1]['estudiante'], 'Luis')
+        self.assertIn('Tesis', datos['resultados'][2]['error'])
+        self.assertIn('repetido', datos['resultados'][4]['error'])
+        self.assertEqual(datos['resultados'][0]['activo'], libre.pk)
+
+        prestamo = Prestamo.objects.get(pk=datos['resultados'][0]['prestamo'])
+        self.assertEqual((prestamo.activo_id, prestamo.estudiante_id, prestamo.usuario_prestamo_id),
+                         (libre.pk, self.ana.pk, self.usuario.pk))
+        self.assertGreater(prestamo.fecha_devolucion_estimada, timezone.now() + timedelta(days=1))
+        registro = Prestamo.history.get(id=prestamo.pk)
+        self.assertEqual((registro.history_type, registro.history_user_id), ('+', self.usuario.pk))
+        self.assertTrue(EventoPrestamo.objects.filter(tipo='PRESTADO', prestamo_id=prestamo.pk).exists())
+        self.assertFalse(Prestamo.objects.filter(activo=tesis).exists())
+
+    def test_conversion_sala_a_domicilio(self):
+        libro, = self.libros(1)
+        sala = Prestamo.objects.create(activo=libro, estudiante=self.ana, tipo='SALA')
+        datos = self.prestar(['L-0'], tipo='DOMICILIO').json()
+        self.assertTrue(datos['resultados'][0]['ok'])
+        sala.refresh_from_db()
+        self.assertEqual(sala.estado, 'DEVUELTO')
+        self.assertIn('Cambio a Domicilio', sala.observaciones)
+        self.assertEqual(Prestamo.objects.get(activo=libro, estado='VIGENTE').tipo, 'DOMICILIO')
+
+    def test_consultas_constantes(self):
+        self.libros(3)
+        # Estudiante, SAVEPOINT, activos, préstamos actuales, INSERT, historial, eventos,
+        # dimensiones y suma del resumen diario, versión, RELEASE
+        with self.assertNumQueries(11) as pocos:
+            self.prestar(['L-0', 'L-1', 'L-2'])
+        self.libros(30, desde=3)
+        with self.assertNumQueries(len(pocos)):
+            datos = self.prestar([f'L-{n}' for n in range(3, 33)]).json()
+        self.assertEqual(datos['prestados'], 30)
+
+    def test_lote_invalido(self):
+        self.assertEqual(self.prestar([]).status_code, 400)
+        self.assertEqual(self.prestar(['L-0'], tipo='OTRO').status_code, 400)
+        self.assertEqual(self.prestar(['x'] * 101).status_code, 400)
+        respuesta = self.client.post('/api/prestamos/lote/', {'tipo': 'SALA', 'codigos': ['L-0']}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        datos = {'estudiante': self.ana.pk, 'tipo': 'SALA', 'activos': ['x']}
+        self.assertEqual(self.client.post('/api/prestamos/lote/', datos, format='json').status_code, 400)
+
+    def test_estudiante_nuevo_y_activos_por_id(self):
+        libro, = self.libros(1)
+        sin_codigo = Libro.objects.create(titulo='Sin código')
+        datos = {
+            'nuevo_ci': '99', 'nuevo_nombre': 'Eva', 'tipo': 'SALA', 'observaciones': 'Mesa 3',
+            'codigos': ['L-0'], 'activos': [sin_codigo.pk, libro.pk],
+        }
+        respuesta = self.client.post('/api/prestamos/lote/', datos, format='json')
+        self.assertEqual(respuesta.json()['estudiante'], 'Eva')
+        self.assertEqual([r['ok'] for r in respuesta.json()['resultados']], [True, True, False])
+        self.assertEqual(
+            set(Prestamo.objects.values_list('activo_id', 'estudiante__ci', 'observaciones')),
+            {(libro.pk, '99', 'Mesa 3'), (sin_codigo.pk, '99', 'Mesa 3')},
+        )
+
+    def test_devolucion_en_lote(self):
+        uno, dos = self.libros(2)
+        sala = Prestamo.objects.create(activo=uno, estudiante=self.ana, tipo='SALA')
+        domicilio = Prestamo.objects.create(activo=dos, estudiante=self.ana, tipo='DOMICILIO', estado='ATRASADO')
+        devuelto = Prestamo.objects.create(activo=uno, estudiante=self.luis, tipo='SALA', estado='DEVUELTO')
+
+        ids = [sala.pk, domicilio.pk, devuelto.pk, 0, sala.pk]
+        # SAVEPOINT, SELECT ... FOR UPDATE, UPDATE, historial, eventos, resumen diario (2), versión, RELEASE
+        with self.assertNumQueries(9):
+            datos = self.client.post('/api/prestamos/devolver-lote/', {'prestamos': ids}, format='json').json()
+        self.assertEqual(datos['devueltos'], 2)
+        self.assertEqual([r['ok'] for r in datos['resultados']], [True, True, False, False, False])
+        self.assertIn('Carnet', datos['resultados'][0]['mensaje'])
+        self.assertIn('Cédula', datos['resultados'][1]['mensaje'])
+        self.assertEqual(set(Prestamo.objects.values_list('estado', flat=True)), {'DEVUELTO'})
+        self.assertEqual(EventoPrestamo.objects.filter(tipo='DEVUELTO').count(), 2)
+        # La lista (en caché por versión) refleja las devoluciones
+        self.assertFalse(self.client.get('/api/libros/').json()[0]['prestado'])
+
+
+class EstadisticasCirculacionTests(CatalogoAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.ana = Estudiante.objects.create(nombre_completo='Ana', carnet_universitario='C-1', ci='1', carrera='Sistemas')
+        self.luis = Estudiante.objects.create(nombre_completo='Luis', carnet_universitario='C-2', ci='2', carrera='Derecho')
+        self.redes = Libro.objects.create(titulo='Redes', codigo_nuevo='L-1', materia='Redes', facultad='Ingeniería')
+        self.codigo = Libro.objects.create(titulo='Código Penal', codigo_nuevo='L-2', materia='Penal', facultad='Derecho')
+        self.tesis = TrabajoGrado.objects.create(titulo='Tesis', codigo_nuevo='T-1', facultad='Ingeniería')
+
+    def prestar(self, activo, estudiante, tipo='SALA'):
+        respuesta = self.client.post('/api/prestamos/', {'activo': activo.pk, 'estudiante': estudiante.pk, 'tipo': tipo})
+        self.assertEqual(respuesta.status_code, 201)
+        return respuesta.json()['id']
+
+    def circular(self):
+        """Tres préstamos por el mostrador (uno en lote) y dos devoluciones"""
+        primero = self.prestar(self.redes, self.ana, 'DOMICILIO')
+        self.prestar(self.tesis, self.ana)
+        self.client.post('/api/prestamos/lote/', {'estudiante': self.luis.pk, 'tipo': 'SALA', 'codigos': ['L-2']}, format='json')
+        # La primera devolución tardó 5 horas
+        Prestamo.objects.filter(pk=primero).update(fecha_prestamo=timezone.now() - timedelta(hours=5))
+        self.client.post(f'/api/prestamos/{primero}/devolver/')
+        segundo = Prestamo.objects.get(activo=self.codigo).pk
+        self.client.post('/api/prestamos/devolver-lote/', {'prestamos': [segundo]}, format='json')
+
+    def resumen(self):
+        return sorted(CirculacionDiaria.objects.values_list(
+            'tipo_activo', 'tipo', 'carrera', 'facultad', 'materia', 'prestamos', 'devoluciones',
+        ))
+
+    def test_resumen_incremental(self):
+        self.circular()
+        self.assertEqual(self.resumen(), [
+            ('LIBRO', 'DOMICILIO', 'Sistemas', 'Ingeniería', 'Redes', 1, 1),
+            ('LIBRO', 'SALA', 'Derecho', 'Derecho', 'Penal', 1, 1),
+            ('TESIS', 'SALA', 'Sistemas', 'Ingeniería', '', 1, 0),
+        ])
+        domicilio = CirculacionDiaria.objects.get(tipo='DOMICILIO')
+        self.assertAlmostEqual(domicilio.duracion_segundos, 5 * 3600, delta=60)
+
+    def test_recalcular_reconstruye_lo_mismo(self):
+        self.circular()
+        incremental = self.resumen()
+        duracion = CirculacionDiaria.objects.get(tipo='DOMICILIO').duracion_segundos
+        CirculacionDiaria.objects.all().delete()
+
+        salida = io.StringIO()
+        call_command('recalcular_circulacion', stdout=salida)
+        self.assertIn('3 filas', salida.getvalue())
+        self.assertEqual(self.resumen(), incremental)
+        self.assertEqual(CirculacionDiaria.objects.get(tipo='DOMICILIO').duracion_segundos, duracion)
+        # Volver a correrlo no duplica
+        call_command('recalcular_circulacion', stdout=salida)
+        self.assertEqual(self.resumen(), incremental)
+
+    def test_reporte_lee_solo_el_resumen(self):
+        self.circular()
+        hoy = timezone.localdate().isoformat()
+        with self.assertNumQueries(4):
+            datos = self.client.get('/api/estadisticas/circulacion/', {'por': 'dia,carrera,tipo_activo'}).json()
+        self.assertEqual(datos['totales']['prestamos'], 3)
+        self.assertEqual(datos['totales']['devoluciones'], 2)
+        self.assertEqual(datos['grupos']['dia'][0]['valor'], hoy)
+        self.assertEqual(
+            [(fila['valor'], fila['prestamos']) for fila in datos['grupos']['carrera']],
+            [('Sistemas', 2), ('Derecho', 1)],
+        )
+        self.assertEqual(datos['grupos']['tipo_activo'][1]['duracion_promedio_horas'], None)
+
+        filtrado = self.client.get('/api/estadisticas/circulacion/', {'tipo': 'DOMICILIO', 'por': 'materia'}).json()
+        self.assertEqual(filtrado['grupos']['materia'][0]['valor'], 'Redes')
+        self.assertAlmostEqual(filtrado['totales']['duracion_promedio_horas'], 5.0, delta=0.1)
+
+        ayer = (timezone.localdate() - timedelta(days=1)).isoformat()
+        vacio = self.client.get('/api/estadisticas/circulacion/', {'desde': ayer, 'hasta': ayer}).json()
+        self.assertEqual(vacio['totales']['prestamos'], 0)
+        self.assertEqual(self.client.get('/api/estadisticas/circulacion/', {'por': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/estadisticas/circulacion/', {'desde': 'ayer'}).status_code, 400)
+
+
+class TransaccionPrestamoTests(TransactionTestCase):
+    def test_begin_immediate_solo_en_prestamos(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('BEGIN IMMEDIATE es propio de SQLite')
+        with CaptureQueriesContext(connection) as consultas:
+            with circulacion.transaccion_prestamo():
+                Prestamo.objects.count()
+            with transaction.atomic():
+                Prestamo.objects.count()
+        inicios = [consulta['sql'] for consulta in consultas if consulta['sql'].startswith('BEGIN')]
+        self.assertEqual(inicios, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+
+class DevolucionConcurrenteTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('La base de pruebas SQLite en memoria no se comparte entre hilos')
+        self.usuario = User.objects.create_user(username='biblioteca', password='clave')
+        estudiante = Estudiante.objects.create(nombre_completo='Ana', carnet_universitario='C-1', ci='1')
+        libro = Libro.objects.create(titulo='Redes', codigo_nuevo='L-1')
+        self.prestamo = Prestamo.objects.create(activo=libro, estudiante=estudiante, tipo='SALA')
+
+    def test_dos_devoluciones_simultaneas_cuentan_una(self):
+        # Los dos mostradores leen el préstamo sin devolver antes de que cualquiera lo cierre
+        barrera = threading.Barrier(2, timeout=10)
+        get_object = PrestamoViewSet.get_object
+
+        def leer_y_esperar(viewset):
+            prestamo = get_object(viewset)
+            barrera.wait()
+            return prestamo
+
+        def devolver(estados):
+            cliente = APIClient()
+            cliente.force_authenticate(self.usuario)
+            try:
+                estados.append(cliente.post(f'/api/prestamos/{self.prestamo.pk}/devolver/').status_code)
+            finally:
+                connection.close()
+
+        estados = []
+        with mock.patch.object(PrestamoViewSet, 'get_object', leer_y_esperar):
+            hilos = [threading.Thread(target=devolver, args=(estados,)) for _ in range(2)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(sorted(estados), [200, 400])
+        self.assertEqual(EventoPrestamo.objects.filter(tipo='DEVUELTO', prestamo_id=self.prestamo.pk).count(), 1)
+        self.assertEqual(CirculacionDiaria.objects.aggregate(total=Sum('devoluciones'))['total'], 1)
+
+
+class MigracionesConDatosTests(TransactionTestCase):
+    """Las migraciones con RunPython deben correr sobre una base que ya tiene activos"""
+    inicio = [('inventario', '0005_estudiante_prestamo')]
+
+    def setUp(self):
+        self.ejecutor = MigrationExecutor(connection)
+        self.ejecutor.migrate(self.inicio)
+        antiguos = self.ejecutor.loader.project_state(self.inicio).apps
+        antiguos.get_model('inventario', 'Libro').objects.create(
+            titulo='Introducción a las Redes', autor='García', codigo_nuevo='ADM-0025',
+            codigo_seccion_full='S1-R1-0039',
+        )
+        antiguos.get_model('inventario', 'TrabajoGrado').objects.create(
+            titulo='Tesis de Redes', autor='Pérez', tutor='Núñez', codigo_nuevo='T-1',
+        )
+
+    def migrar_hasta_el_final(self):
+        ejecutor = MigrationExecutor(connection)
+        ejecutor.migrate(ejecutor.loader.graph.leaf_nodes())
+
+    def tearDown(self):
+        # Dejar la base de pruebas como la esperan los demás tests aunque este falle
+        self.migrar_hasta_el_final()
+
+    def test_migrar_hasta_el_final(self):
+        self.migrar_hasta_el_final()
+
+        libro = Libro.objects.get()
+        self.assertEqual((libro.titulo_norm, libro.autor_norm), ('introduccion a las redes', 'garcia'))
+        self.assertEqual(libro.orden_seccion, llave_orden_seccion('S1-R1-0039'))
+        self.assertEqual(libro.tipo_activo, 'LIBRO')
+        tesis = TrabajoGrado.objects.get()
+        self.assertEqual((tesis.tutor_norm, tesis.tipo_activo), ('nunez', 'TESIS'))
+        self.assertTrue(EntradaAutocompletado.objects.filter(activo_id=libro.pk, clave='redes').exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {busqueda.TABLA_INDICE}')
+            self.assertEqual(cursor.fetchone()[0], 2)
+            cursor.execute(f'SELECT COUNT(DISTINCT activo_id) FROM {busqueda.TABLA_DIFUSO}')
+            self.assertEqual(cursor.fetchone()[0], 2)
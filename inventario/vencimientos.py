@@ -0,0 +1,104 @@
+"""
+Préstamos vencidos: paso de VIGENTE a ATRASADO y consulta de vencimientos.
+
+marcar_atrasados() es un barrido por lotes sobre el índice (estado,
+fecha_devolucion_estimada): lee los vencidos de cada lote bloqueándolos, los
+pasa a ATRASADO con un solo UPDATE y escribe su historial y sus eventos con un
+INSERT en bloque cada uno, sin save() ni señales por fila. Lo ejecutan el
+comando `marcar_atrasados` (cron) y, si BARRIDO_ATRASADOS_INTERVALO > 0 (lo fija
+gunicorn.conf.py), un hilo de cada proceso del servidor (BarridoPeriodico). Varios procesos pueden barrer a
+la vez: el bloqueo y el filtro por estado hacen que cada préstamo se marque una vez.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import eventos
+from .models import Prestamo
+from .versiones import incrementar_version, PRESTAMOS
+
+
+logger = logging.getLogger(__name__)
+
+LOTE_BARRIDO = 500
+
+
+def marcar_atrasados(ahora=None, lote=LOTE_BARRIDO):
+    """Pasa a ATRASADO los préstamos vigentes cuyo plazo ya venció; devuelve cuántos"""
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            vencidos = list(
+                Prestamo.objects.select_for_update(skip_locked=True)
+                .filter(estado='VIGENTE', fecha_devolucion_estimada__lt=ahora)
+                .order_by('fecha_devolucion_estimada')[:lote]
+            )
+            if not vencidos:
+                return total
+            Prestamo.objects.filter(pk__in=[prestamo.pk for prestamo in vencidos]).update(estado='ATRASADO')
+            for prestamo in vencidos:
+                prestamo.estado = 'ATRASADO'
+            Prestamo.history.bulk_history_create(
+                vencidos, update=True, default_change_reason='Plazo vencido', default_date=ahora,
+            )
+            eventos.publicar_eventos(eventos.ATRASADO, vencidos)
+            # UPDATE no dispara señales: invalidar las lecturas condicionales a mano
+            incrementar_version(PRESTAMOS)
+        total += len(vencidos)
+        if len(vencidos) < lote:
+            return total
+
+
+def vencimientos(horas, ahora=None):
+    """
+    (atrasados, por_vencer) como querysets sobre el índice (estado, fecha_devolucion_estimada).
+    Los vigentes ya vencidos que el barrido todavía no marcó cuentan como atrasados.
+    """
+    ahora = ahora or timezone.now()
+    orden = ('fecha_devolucion_estimada', 'pk')
+    prestamos = Prestamo.objects.order_by(*orden)
+    atrasados = (
+        prestamos.filter(estado='ATRASADO')
+        | prestamos.filter(estado='VIGENTE', fecha_devolucion_estimada__lt=ahora)
+    )
+    por_vencer = prestamos.filter(
+        estado='VIGENTE', fecha_devolucion_estimada__gte=ahora,
+        fecha_devolucion_estimada__lt=ahora + timedelta(hours=horas),
+    )
+    return atrasados, por_vencer
+
+
+class BarridoPeriodico:
+    """Hilo daemon que ejecuta marcar_atrasados cada `intervalo` segundos"""
+
+    def __init__(self):
+        self.hilo = None
+        self.detener_evento = threading.Event()
+
+    def iniciar(self, intervalo):
+        if self.hilo is not None and self.hilo.is_alive():
+            return
+        self.detener_evento.clear()
+        self.hilo = threading.Thread(target=self.ciclo, args=(intervalo,), name='barrido-atrasados', daemon=True)
+        self.hilo.start()
+
+    def detener(self):
+        self.detener_evento.set()
+
+    def ciclo(self, intervalo):
+        while not self.detener_evento.wait(intervalo):
+            try:
+                marcados = marcar_atrasados()
+                if marcados:
+                    logger.info('Barrido de vencidos: %s préstamos pasaron a ATRASADO', marcados)
+            except Exception:
+                logger.exception('Falló el barrido de préstamos vencidos')
+            finally:
+                connections.close_all()
+
+
+barrido = BarridoPeriodico()
@@ -0,0 +1,127 @@
+"""
+Versión por familia de recursos y lecturas condicionales (ETag / If-None-Match).
+
+Cada familia tiene un contador en VersionRecurso que las señales incrementan al
+guardar o borrar. El ETag de una lectura combina las versiones de las familias
+de las que depende, la ruta y los parámetros normalizados. Si el cliente envía
+el mismo ETag en If-None-Match se responde 304 leyendo solo esa tabla de una fila
+por familia; los navegadores revalidan solos gracias a Cache-Control: no-cache.
+
+El mismo valor sirve de llave para la caché de respuestas del servidor (alias
+'catalogo' en settings.CACHES): al cambiar una versión las entradas viejas dejan
+de ser alcanzables y el backend las descarta por LRU / poda / TIMEOUT. Así la
+invalidación sigue exactamente a las señales, sin borrar nada a mano.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.utils.cache import parse_etags, quote_etag, patch_cache_control
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import VersionRecurso
+
+
+LIBROS = 'libros'
+TESIS = 'tesis'
+PRESTAMOS = 'prestamos'
+FAMILIAS = (LIBROS, TESIS, PRESTAMOS)
+
+ALIAS_CACHE = 'catalogo'
+
+
+def incrementar_version(familia, using=None):
+    """Sube en uno la versión de la familia (UPDATE atómico, sin leer antes)"""
+    using = using or router.db_for_write(VersionRecurso)
+    actualizadas = VersionRecurso.objects.using(using).filter(familia=familia).update(version=F('version') + 1)
+    if not actualizadas:
+        try:
+            with transaction.atomic(using=using):
+                VersionRecurso.objects.using(using).create(familia=familia, version=1)
+        except IntegrityError:
+            # Otro proceso creó la fila al mismo tiempo
+            VersionRecurso.objects.using(using).filter(familia=familia).update(version=F('version') + 1)
+
+
+def versiones_actuales(*familias):
+    """Devuelve {familia: versión}; las familias sin fila cuentan como 0"""
+    versiones = dict(VersionRecurso.objects.filter(familia__in=familias).values_list('familia', 'version'))
+    return {familia: versiones.get(familia, 0) for familia in familias}
+
+
+def parametros_normalizados(request):
+    """Parámetros ordenados y sin valores vacíos: ?b=2&a=1&search= equivale a ?a=1&b=2"""
+    return sorted(
+        (clave, valor.strip())
+        for clave in request.GET
+        for valor in request.GET.getlist(clave)
+        if valor.strip()
+    )
+
+
+def etag_de(request, familias, versiones=None):
+    """ETag fuerte a partir de las versiones, la ruta, los parámetros y el formato aceptado"""
+    if versiones is None:
+        versiones = versiones_actuales(*familias)
+    partes = [
+        request.path,
+        repr(parametros_normalizados(request)),
+        request.META.get('HTTP_ACCEPT', ''),
+        ','.join(f'{familia}={versiones[familia]}' for familia in familias),
+    ]
+    resumen = hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()[:20]
+    return quote_etag(resumen)
+
+
+def coincide(request, etag):
+    """Comparación débil de If-None-Match (ignora el prefijo W/ que agregan algunos proxies)"""
+    cabecera = request.META.get('HTTP_IF_NONE_MATCH')
+    if not cabecera:
+        return False
+    etiquetas = parse_etags(cabecera)
+    if '*' in etiquetas:
+        return True
+    return etag in {etiqueta.removeprefix('W/') for etiqueta in etiquetas}
+
+
+def respuesta_condicional(*familias):
+    """
+    Decorador para vistas GET que dependen de las familias indicadas.
+    Sirve para funciones (request, ...) y, con method_decorator, para métodos.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envuelta(request, *args, **kwargs):
+            etag = etag_de(request, familias)
+            if coincide(request, etag):
+                return marcar(no_modificado(), etag)
+            return marcar(vista(request, *args, **kwargs), etag)
+        return envuelta
+    return decorador
+
+
+def no_modificado():
+    return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+
+def marcar(respuesta, etag):
+    """Agrega ETag y obliga a revalidar en cada uso (solo a respuestas 200 / 304)"""
+    if respuesta.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        respuesta['ETag'] = etag
+        patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
+def leer_cache(etag):
+    """Contenido ya renderizado para este ETag, o None"""
+    return caches[ALIAS_CACHE].get(etag)
+
+
+def guardar_cache(etag, contenido):
+    """Guarda el contenido renderizado si no supera CATALOGO_CACHE_MAX_BYTES"""
+    if len(contenido) <= settings.CATALOGO_CACHE_MAX_BYTES:
+        caches[ALIAS_CACHE].set(etag, contenido)
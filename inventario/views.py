@@ -1,33 +1,268 @@
-from rest_framework.permissions import AllowAny
-
-# Endpoint público para IDs de activos prestados
-from rest_framework.decorators import api_view, permission_classes
-
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def activos_prestados_publico(request):
-    ids = list(Prestamo.objects.filter(estado='VIGENTE').values_list('activo_id', flat=True))
-    return Response({'prestados': ids or []})
-from django.shortcuts import render
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import ValidationError
+from rest_framework.utils import encoders
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Case, When, Value, BooleanField
+from django.db import IntegrityError
+from django.db.models import Count, F, Max, Q
 from django.utils import timezone
 import traceback
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import base64
+import json
 import re
 from .models import Libro, TrabajoGrado, ActivoBibliografico, Estudiante, Prestamo
+from .pagination import OrdenNaturalCursorPagination
+from .busqueda import BusquedaNormalizadaFilter, BusquedaTextoCompletoFilter, BusquedaDifusaFilter
+from .filtros import ActivoFilter, EstudianteFilter, LibroFilter, TrabajoGradoFilter
+from .renderers import RENDERIZADORES_LISTA
+from .versiones import respuesta_condicional, LIBROS, TESIS, PRESTAMOS
+from . import autocompletado, circulacion, consulta, disponibilidad, estadisticas, eventos, vencimientos, versiones
 from .serializers import (
     LibroSerializer, TrabajoGradoSerializer, ActivoSelectSerializer,
-    EstudianteSerializer, PrestamoSerializer
+    EstudianteSerializer, PrestamoSerializer, FilasSerializer
 )
 
 
-class LibroViewSet(viewsets.ModelViewSet):
+class ListaLigeraMixin:
+    """
+    Listado construido desde filas .values() con FilasSerializer en lugar de pasar
+    cada instancia por el ModelSerializer. Admite ?fields=id,titulo,... para
+    devolver solo las columnas que la pantalla muestra.
+    `anotaciones_lista` permite calcular en SQL campos que no son columnas.
+
+    Con ?stream=1 la lista completa se escribe en JSON a medida que se lee de la
+    base (cursor del lado del servidor en PostgreSQL), sin guardar en memoria las
+    instancias, los dicts ni el JSON completo.
+    """
+    anotaciones_lista = {}
+    # Acciones de detalle que también llevan las anotaciones (misma salida que en la lista)
+    acciones_anotadas = ('retrieve', 'update', 'partial_update')
+    stream_param = 'stream'
+    stream_chunk_size = 500
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.anotaciones_lista and getattr(self, 'action', None) in self.acciones_anotadas:
+            queryset = queryset.annotate(**self.anotaciones_lista)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        filas = FilasSerializer.para(self.get_serializer_class())
+        campos = filas.campos_solicitados(request)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Las columnas del cursor se leen aunque no se pidan, para armar el siguiente enlace
+        extra = [campo.lstrip('-') for campo in getattr(self, 'cursor_ordering', ()) if campo.lstrip('-') not in campos]
+        queryset = self.valores_lista(queryset, campos, *extra)
+
+        if request.query_params.get(self.stream_param) in ('1', 'true'):
+            return self.respuesta_streaming(filas, queryset, campos)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(filas.serializar(page, campos))
+        return Response(filas.serializar(queryset, campos))
+
+    def valores_lista(self, queryset, campos, *extra):
+        """Agrega las anotaciones pedidas y devuelve las filas .values() de la lista"""
+        anotaciones = {campo: expr for campo, expr in self.anotaciones_lista.items() if campo in campos}
+        if anotaciones:
+            queryset = queryset.annotate(**anotaciones)
+        return queryset.values(*campos, *extra)
+
+    def respuesta_streaming(self, filas, queryset, campos):
+        tamanio = self.stream_chunk_size
+
+        def generar():
+            yield '['
+            separador = ''
+            bloque = []
+            for dato in filas.iterar(queryset.iterator(chunk_size=tamanio), campos):
+                bloque.append(json.dumps(dato, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')))
+                if len(bloque) >= tamanio:
+                    yield separador + ','.join(bloque)
+                    separador = ','
+                    bloque = []
+            if bloque:
+                yield separador + ','.join(bloque)
+            yield ']'
+
+        return StreamingHttpResponse(generar(), content_type='application/json')
+
+
+class ListaCondicionalMixin:
+    """
+    Responde 304 Not Modified al listado si no cambió ninguna de las familias de
+    `familias_version` desde el ETag que envía el cliente, y guarda el JSON ya
+    renderizado en la caché 'catalogo' con ese mismo ETag como llave: la misma
+    búsqueda repetida no vuelve a consultar, ordenar ni serializar (ver versiones.py).
+    """
+    familias_version = ()
+    cachear_lista = True
+    formatos_cacheables = ('json', 'columnar')
+
+    def list(self, request, *args, **kwargs):
+        listar = super().list
+        if not self.familias_version:
+            return listar(request, *args, **kwargs)
+        return self.respuesta_versionada(request, lambda: listar(request, *args, **kwargs))
+
+    def respuesta_versionada(self, request, generar):
+        """ETag + caché para cualquier lectura que dependa solo de `familias_version`"""
+        etag = versiones.etag_de(request, self.familias_version)
+        if versiones.coincide(request, etag):
+            return versiones.marcar(versiones.no_modificado(), etag)
+        return versiones.marcar(self.respuesta_cacheada(etag, request, generar), etag)
+
+    def respuesta_cacheada(self, etag, request, generar):
+        renderer = request.accepted_renderer
+        if not self.cachear_lista or renderer.format not in self.formatos_cacheables:
+            return generar()
+
+        contenido = versiones.leer_cache(etag)
+        if contenido is None:
+            respuesta = generar()
+            # Solo se guardan respuestas JSON normales (no errores ni streaming)
+            if respuesta.status_code != 200 or not isinstance(respuesta, Response):
+                return respuesta
+            contenido = renderer.render(respuesta.data, request.accepted_media_type, self.get_renderer_context())
+            versiones.guardar_cache(etag, contenido)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        return HttpResponse(contenido, content_type=content_type)
+
+
+class FacetasMixin:
+    """
+    GET .../facetas/: cuántos registros hay por cada valor de `campos_faceta`,
+    con los mismos filtros y búsqueda que el listado. Se resuelve en una sola
+    consulta agrupada por todas las facetas a la vez (GROUP BY estado, anio, ...)
+    y los totales de cada faceta se suman en Python. Usa el ETag y la caché del
+    listado (ListaCondicionalMixin), así que solo se recalcula cuando cambia la versión.
+    """
+    campos_faceta = ()
+
+    @action(detail=False, methods=['get'])
+    def facetas(self, request):
+        return self.respuesta_versionada(request, lambda: Response(self.contar_facetas(request)))
+
+    def contar_facetas(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        grupos = queryset.values(*self.campos_faceta).annotate(cantidad=Count('pk'))
+
+        conteos = {campo: {} for campo in self.campos_faceta}
+        total = 0
+        for grupo in grupos:
+            total += grupo['cantidad']
+            for campo in self.campos_faceta:
+                valor = grupo[campo]
+                conteos[campo][valor] = conteos[campo].get(valor, 0) + grupo['cantidad']
+
+        return {
+            'total': total,
+            'facetas': {
+                campo: [
+                    {'valor': valor, 'cantidad': cantidad}
+                    # Los más frecuentes primero; los vacíos al final
+                    for valor, cantidad in sorted(
+                        valores.items(), key=lambda item: (item[0] is None, -item[1], str(item[0]))
+                    )
+                ]
+                for campo, valores in conteos.items()
+            },
+        }
+
+
+class CambiosMixin:
+    """
+    Sincronización incremental: GET .../changes/?since=<token>
+
+    Devuelve solo las filas creadas o modificadas y los ids eliminados desde el
+    token, leyendo los ids afectados del historial (simple_history) y las filas
+    actuales de la tabla. Sin ?since= devuelve el catálogo completo; en ambos
+    casos `token` es el punto desde el que pedir la próxima vez. Admite ?fields=.
+    Un préstamo o devolución también cuenta como cambio del activo, porque las
+    filas llevan `prestado` y las demás anotaciones de préstamo.
+
+    El token guarda el último history_id visto (del activo y del préstamo) y la
+    hora en que se emitió. Los ids se asignan al escribir y no al confirmar: en
+    PostgreSQL una transacción con un id menor puede confirmar después de leer el
+    máximo. Por eso, además de los ids mayores, se vuelve a enviar todo lo fechado
+    en los últimos `margen_cambios` antes del token. Un cambio puede llegar más de
+    una vez; solo se perdería si su transacción tardara más que el margen en
+    confirmar. Aplicar los cambios es idempotente (reemplazar por id / borrar por id).
+    """
+    since_param = 'since'
+    invalid_token_message = 'Token de sincronización inválido'
+    margen_cambios = timedelta(minutes=2)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def cambios(self, request):
+        return self.respuesta_versionada(request, lambda: Response(self.calcular_cambios(request)))
+
+    def calcular_cambios(self, request):
+        filas = FilasSerializer.para(self.get_serializer_class())
+        campos = filas.campos_solicitados(request)
+        queryset = self.get_queryset()
+        historial = queryset.model.history.all()
+        prestamos = Prestamo.history.all()
+
+        desde = self.decode_token(request.query_params.get(self.since_param))
+        emitido = timezone.now()
+        ultimo = historial.aggregate(ultimo=Max('history_id'))['ultimo'] or 0
+        ultimo_prestamo = prestamos.aggregate(ultimo=Max('history_id'))['ultimo'] or 0
+
+        if desde is None:
+            actualizados = queryset
+            eliminados = []
+        else:
+            activo_desde, prestamo_desde, fecha_desde = desde
+            solapamiento = Q(history_date__gte=fecha_desde - self.margen_cambios)
+            recientes = historial.filter(Q(history_id__gt=activo_desde) | solapamiento, history_id__lte=ultimo)
+            prestamos_recientes = prestamos.filter(
+                Q(history_id__gt=prestamo_desde) | solapamiento, history_id__lte=ultimo_prestamo
+            )
+            actualizados = queryset.filter(
+                Q(pk__in=recientes.values('id')) | Q(pk__in=prestamos_recientes.values('activo_id'))
+            )
+            borrados = set(recientes.filter(history_type='-').values_list('id', flat=True))
+            # Un registro borrado y luego restaurado cuenta como actualizado
+            if borrados:
+                borrados -= set(queryset.filter(pk__in=borrados).values_list('pk', flat=True))
+            eliminados = sorted(borrados)
+
+        return {
+            'token': self.encode_token(ultimo, ultimo_prestamo, emitido),
+            'actualizados': filas.serializar(self.valores_lista(actualizados, campos), campos),
+            'eliminados': eliminados,
+        }
+
+    def encode_token(self, history_id, prestamo_history_id, emitido):
+        posicion = {'h': history_id, 'p': prestamo_history_id, 't': emitido.timestamp()}
+        return base64.urlsafe_b64encode(json.dumps(posicion).encode('utf-8')).decode('ascii')
+
+    def decode_token(self, token):
+        if not token:
+            return None
+        try:
+            posicion = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            emitido = datetime.fromtimestamp(float(posicion['t']), tz=dt_timezone.utc)
+            return int(posicion['h']), int(posicion['p']), emitido
+        except (TypeError, ValueError, KeyError, UnicodeError, OverflowError, OSError):
+            raise ValidationError({self.since_param: self.invalid_token_message})
+
+
+class LibroViewSet(CambiosMixin, FacetasMixin, ListaCondicionalMixin, ListaLigeraMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar libros.
     Permite búsqueda, filtros avanzados y ordenamiento.
@@ -35,94 +270,90 @@ class LibroViewSet(viewsets.ModelViewSet):
     ORDENAMIENTO NATURAL: Los códigos se ordenan numéricamente (S1-R1-0001 antes que S1-R1-0039)
     Los libros sin código van al final.
     """
-    queryset = Libro.objects.all()
+    # Orden natural resuelto por la base de datos con la llave persistida (ver Libro.orden_seccion)
+    cursor_ordering = ('orden_seccion', 'orden_importacion', 'pk')
+    queryset = Libro.objects.order_by(*cursor_ordering)
     serializer_class = LibroSerializer
-    pagination_class = None
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    # ETag por versión del catálogo: si nada cambió, la lectura responde 304
+    # La lista incluye el préstamo actual de cada libro, así que también depende de los préstamos
+    familias_version = (LIBROS, PRESTAMOS)
+    anotaciones_lista = disponibilidad.anotaciones_prestamo()
+    # Conteos para FilterBar: /api/libros/facetas/?<mismos filtros>
+    campos_faceta = ('estado', 'anio', 'facultad', 'materia', 'ubicacion_seccion')
+    # Sin ?limite= ni ?cursor= se devuelve la lista completa (comportamiento original)
+    pagination_class = OrdenNaturalCursorPagination
+    # ?format=columnar envía nombres de columna una vez y valores por columna (ver renderers.py)
+    renderer_classes = RENDERIZADORES_LISTA
+    # ?search= usa el índice de texto completo ponderado y ?difuso= el de trigramas (ver busqueda.py)
+    filter_backends = [BusquedaTextoCompletoFilter, BusquedaDifusaFilter, DjangoFilterBackend]
     
     # 🔍 BÚSQUEDA OMNIPOTENTE: Todos los campos de las 16 columnas
+    # (el índice de texto completo cubre estos campos; la lista queda como respaldo ILIKE)
     search_fields = [
         'codigo_nuevo',         # Código Nuevo
         'codigo_antiguo',       # Código Antiguo
         'codigo_seccion_full',  # Código Sección
-        'titulo',               # Título
-        'autor',                # Autor
-        'editorial',            # Editorial
+        'titulo_norm',          # Título (normalizado)
+        'autor_norm',           # Autor (normalizado)
+        'editorial_norm',       # Editorial (normalizado)
         'edicion',              # Edición
-        'facultad',             # Facultad
-        'materia',              # Materia
+        'facultad_norm',        # Facultad (normalizado)
+        'materia_norm',         # Materia (normalizado)
         'ubicacion_seccion',    # Sección
         'ubicacion_repisa',     # Repisa
         'estado',               # Estado
         'observaciones'         # Observaciones
     ]
     
-    filterset_fields = {
-        'codigo_nuevo': ['exact', 'icontains'],
-        'titulo': ['icontains'],
-        'materia': ['icontains'],
-        'facultad': ['icontains'],
-        'editorial': ['icontains'],
-        'ubicacion_seccion': ['exact'],
-        'estado': ['exact'],
-        'anio': ['exact'],
+    # Campos para la consulta dirigida: ?search=autor:garcia anio:2015..2020 (ver consulta.py)
+    campos_consulta = {
+        'titulo': ('titulo', consulta.TEXTO),
+        'autor': ('autor', consulta.TEXTO),
+        'materia': ('materia', consulta.TEXTO),
+        'editorial': ('editorial', consulta.TEXTO),
+        'facultad': ('facultad', consulta.TEXTO),
+        'codigo': ('codigo_nuevo', consulta.CODIGO),
+        'seccion': ('codigo_seccion_full', consulta.CODIGO),
+        'estado': ('estado', consulta.OPCION),
+        'anio': ('anio', consulta.NUMERO),
     }
     
-    def list(self, request, *args, **kwargs):
-        """
-        Método personalizado de listado con ordenamiento inteligente en Python.
-        Ordena los libros por código de sección de forma natural (numérica).
-        """
-        # 1. Aplicar filtros de búsqueda primero
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # 2. Convertir a lista para ordenar en Python
-        libros = list(queryset)
-
-        # 3. Función de clave de ordenamiento inteligente
-        def llave_ordenamiento(libro):
-            codigo = libro.codigo_seccion_full
-            if not codigo or codigo.strip() == '':
-                # Sin código -> va al final (peso 1)
-                return (1, [])
-            
-            # Extraer todos los números del código usando regex
-            # Ej: "S1-R1-0039" -> [1, 1, 39]
-            try:
-                numeros = [int(n) for n in re.findall(r'\d+', codigo)]
-                return (0, numeros)  # Con código -> va al principio (peso 0)
-            except:
-                return (1, [])  # Si falla, al final
-
-        # 4. Ordenar en memoria usando Python (muy rápido para ~2000 registros)
-        libros.sort(key=llave_ordenamiento)
-
-        # 5. Serializar y devolver
-        serializer = self.get_serializer(libros, many=True)
-        return Response(serializer.data)
+    # Los filtros de texto comparan contra las columnas normalizadas (ver filtros.py)
+    filterset_class = LibroFilter
+    
     ordering = ['-fecha_registro']
 
 
-class TrabajoGradoViewSet(viewsets.ModelViewSet):
+class TrabajoGradoViewSet(CambiosMixin, FacetasMixin, ListaCondicionalMixin, ListaLigeraMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar trabajos de grado (tesis).
     Permite búsqueda, filtros avanzados y ordenamiento.
     BÚSQUEDA OMNIPOTENTE: Busca en TODOS los campos de texto visibles.
     ORDENAMIENTO NATURAL: Los códigos se ordenan numéricamente (ADM-0001 antes que ADM-0025)
     """
-    queryset = TrabajoGrado.objects.all()
+    # Orden natural resuelto por la base de datos con la llave persistida (ver ActivoBibliografico.orden_codigo)
+    cursor_ordering = ('orden_codigo', 'pk')
+    queryset = TrabajoGrado.objects.order_by(*cursor_ordering)
     serializer_class = TrabajoGradoSerializer
-    pagination_class = None
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    familias_version = (TESIS, PRESTAMOS)
+    anotaciones_lista = disponibilidad.anotaciones_prestamo()
+    campos_faceta = ('estado', 'anio', 'facultad', 'carrera', 'modalidad')
+    # Sin ?limite= ni ?cursor= se devuelve la lista completa (comportamiento original)
+    pagination_class = OrdenNaturalCursorPagination
+    # ?format=columnar envía nombres de columna una vez y valores por columna (ver renderers.py)
+    renderer_classes = RENDERIZADORES_LISTA
+    # ?search= usa el índice de texto completo ponderado y ?difuso= el de trigramas (ver busqueda.py)
+    filter_backends = [BusquedaTextoCompletoFilter, BusquedaDifusaFilter, DjangoFilterBackend]
     
     # 🔍 BÚSQUEDA OMNIPOTENTE: Todos los campos de tesis
+    # (el índice de texto completo cubre estos campos; la lista queda como respaldo ILIKE)
     search_fields = [
         'codigo_nuevo',         # Código Nuevo
-        'titulo',               # Título
-        'autor',                # Autor (Estudiante)
-        'tutor',                # Tutor
-        'carrera',              # Carrera
-        'facultad',             # Facultad (heredado de base)
+        'titulo_norm',          # Título (normalizado)
+        'autor_norm',           # Autor (Estudiante, normalizado)
+        'tutor_norm',           # Tutor (normalizado)
+        'carrera_norm',         # Carrera (normalizado)
+        'facultad_norm',        # Facultad (heredado de base, normalizado)
         'modalidad',            # Modalidad
         'ubicacion_seccion',    # Sección
         'ubicacion_repisa',     # Repisa
@@ -130,55 +361,21 @@ class TrabajoGradoViewSet(viewsets.ModelViewSet):
         'observaciones'         # Observaciones
     ]
     
-    filterset_fields = {
-        'codigo_nuevo': ['exact', 'icontains'],
-        'titulo': ['icontains'],
-        'autor': ['icontains'],
-        'carrera': ['icontains'],
-        'tutor': ['icontains'],
-        'modalidad': ['exact'],
-        'estado': ['exact'],
-        'facultad': ['icontains'],
+    # Campos para la consulta dirigida: ?search=tutor:mamani anio:2015..2020 (ver consulta.py)
+    campos_consulta = {
+        'titulo': ('titulo', consulta.TEXTO),
+        'autor': ('autor', consulta.TEXTO),
+        'tutor': ('tutor', consulta.TEXTO),
+        'carrera': ('carrera', consulta.TEXTO),
+        'facultad': ('facultad', consulta.TEXTO),
+        'codigo': ('codigo_nuevo', consulta.CODIGO),
+        'modalidad': ('modalidad', consulta.OPCION),
+        'estado': ('estado', consulta.OPCION),
+        'anio': ('anio', consulta.NUMERO),
     }
     
-    def list(self, request, *args, **kwargs):
-        """
-        Método personalizado de listado con ordenamiento inteligente en Python.
-        Ordena las tesis por código (ADM-0001, ADM-0002, CPU-001, etc.) de forma natural.
-        """
-        # 1. Aplicar filtros de búsqueda primero
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # 2. Convertir a lista para ordenar en Python
-        tesis = list(queryset)
-
-        # 3. Función de clave de ordenamiento inteligente para tesis
-        def llave_ordenamiento_tesis(tesis_item):
-            codigo = tesis_item.codigo_nuevo
-            if not codigo or codigo.strip() == '':
-                # Sin código -> va al final (peso 1)
-                return (1, '', [])
-            
-            # Extraer prefijo (letras) y números
-            # Ej: "ADM-0025" -> prefijo="ADM", numeros=[25]
-            try:
-                # Extraer el prefijo de letras
-                match = re.match(r'([A-Z]+)', codigo.upper())
-                prefijo = match.group(1) if match else ''
-                
-                # Extraer números
-                numeros = [int(n) for n in re.findall(r'\d+', codigo)]
-                
-                return (0, prefijo, numeros)  # Con código -> va al principio (peso 0)
-            except:
-                return (1, '', [])  # Si falla, al final
-
-        # 4. Ordenar en memoria usando Python
-        tesis.sort(key=llave_ordenamiento_tesis)
-
-        # 5. Serializar y devolver
-        serializer = self.get_serializer(tesis, many=True)
-        return Response(serializer.data)
+    # Los filtros de texto comparan contra las columnas normalizadas (ver filtros.py)
+    filterset_class = TrabajoGradoFilter
 
 
 class DashboardStatsView(APIView):
@@ -262,6 +459,32 @@ class DashboardStatsView(APIView):
             )
 
 
+class EstadisticasCirculacionView(APIView):
+    """
+    Reporte de circulación: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD (por defecto, los
+    últimos 30 días) y ?por=dia,carrera,... (dia, tipo_activo, tipo, carrera,
+    facultad, materia). Cada dimensión acepta además un filtro exacto (?tipo=SALA).
+    Lee solo el resumen diario (ver estadisticas.py), no la tabla de préstamos.
+    """
+    def get(self, request):
+        parametros = request.query_params
+        try:
+            hasta = date.fromisoformat(parametros['hasta']) if parametros.get('hasta') else timezone.localdate()
+            desde = date.fromisoformat(parametros['desde']) if parametros.get('desde') else hasta - timedelta(days=29)
+        except ValueError:
+            raise ValidationError({'fecha': 'Use el formato AAAA-MM-DD en desde y hasta.'})
+        agrupaciones = [valor for valor in parametros.get('por', 'dia').split(',') if valor]
+        invalidas = set(agrupaciones) - set(estadisticas.AGRUPACIONES)
+        if invalidas:
+            raise ValidationError({'por': f"Opciones: {', '.join(estadisticas.AGRUPACIONES)}"})
+        filtros = {
+            dimension: parametros[dimension]
+            for dimension in estadisticas.DIMENSIONES if dimension in parametros
+        }
+        datos = estadisticas.reporte(desde, hasta, agrupaciones, filtros)
+        return Response({'desde': desde, 'hasta': hasta, **datos})
+
+
 class HistorialView(APIView):
     """Vista para obtener el historial de auditoría de libros y tesis"""
     def get(self, request):
@@ -443,6 +666,7 @@ class SiguienteCodigoView(APIView):
 
 class ListaSeccionesView(APIView):
     """Vista para obtener todas las secciones/prefijos únicos disponibles (para libros o tesis)"""
+    @method_decorator(respuesta_condicional(LIBROS, TESIS))
     def get(self, request):
         tipo = request.query_params.get('tipo', 'libros')
         secciones = set()
@@ -475,6 +699,20 @@ class ListaSeccionesView(APIView):
         return Response(sorted(list(secciones)))
 
 
+class AutocompletadoView(APIView):
+    """
+    Sugerencias mientras se escribe: ?q=texto&limite=10 (máximo 20).
+    Busca por prefijo en títulos, autores, tutores y códigos (ver autocompletado.py).
+    """
+    def get(self, request):
+        texto = request.query_params.get('q', '')
+        try:
+            limite = int(request.query_params.get('limite', autocompletado.LIMITE_POR_DEFECTO))
+        except (TypeError, ValueError):
+            limite = autocompletado.LIMITE_POR_DEFECTO
+        return Response({'sugerencias': autocompletado.sugerencias(texto, limite)})
+
+
 class PerfilUsuarioView(APIView):
     """
     Vista para gestionar el perfil del usuario autenticado.
@@ -524,31 +762,62 @@ class PerfilUsuarioView(APIView):
         })
 
 
-class ActivoViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivoViewSet(ListaLigeraMixin, viewsets.ReadOnlyModelViewSet):
     """
     Vista de solo lectura para buscar activos bibliográficos (libros y tesis).
     Usada para el selector de préstamos.
     """
     queryset = ActivoBibliografico.objects.all()
+    # El tipo es una columna del activo: sin JOIN con libro/tesis ni hasattr por fila
+    anotaciones_lista = {'tipo': F('tipo_activo')}
     serializer_class = ActivoSelectSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['titulo', 'codigo_nuevo', 'autor']
+    filter_backends = [BusquedaNormalizadaFilter, DjangoFilterBackend]
+    filterset_class = ActivoFilter
+    # Por prefijo sobre columnas con índice (ver BusquedaNormalizadaFilter y el lookup prefijo_codigo)
+    search_fields = ['titulo_norm', 'codigo_nuevo__prefijo_codigo', 'autor_norm']
     pagination_class = None
+    renderer_classes = RENDERIZADORES_LISTA
+
+    @action(detail=False, methods=['get'])
+    def selector(self, request):
+        """
+        Selector del formulario de préstamos: ?q=texto&tipo=LIBRO|TESIS&limite=20 (máximo 50).
+        Código exacto primero, luego prefijo de código y luego palabras del título,
+        con la disponibilidad de cada activo (ver autocompletado.seleccionar_activos).
+        """
+        tipo = request.query_params.get('tipo') or None
+        if tipo and tipo not in dict(ActivoBibliografico.TIPO_CHOICES):
+            raise ValidationError({'tipo': 'Use LIBRO o TESIS.'})
+        try:
+            limite = int(request.query_params.get('limite', autocompletado.LIMITE_SELECTOR))
+        except (TypeError, ValueError):
+            limite = autocompletado.LIMITE_SELECTOR
+        activos, hay_mas = autocompletado.seleccionar_activos(request.query_params.get('q', ''), tipo, limite)
+        return Response({'activos': activos, 'hay_mas': hay_mas})
 
 
-class EstudianteViewSet(viewsets.ModelViewSet):
+class EstudianteViewSet(ListaLigeraMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar estudiantes.
     Permite crear, leer, actualizar y eliminar estudiantes.
+    ?carnet= y ?ci= buscan por prefijo sobre su índice; ?limite= pagina por cursor.
     """
-    queryset = Estudiante.objects.all()
+    cursor_ordering = ('nombre_completo', 'pk')
+    queryset = Estudiante.objects.order_by(*cursor_ordering)
+    # Conteos de préstamos con un JOIN agrupado en la misma consulta de la lista o el detalle
+    anotaciones_lista = {
+        'prestamos_activos': Count('prestamos', filter=Q(prestamos__estado__in=disponibilidad.ESTADOS_PRESTADO)),
+        'prestamos_atrasados': Count('prestamos', filter=Q(prestamos__estado='ATRASADO')),
+    }
     serializer_class = EstudianteSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filterset_class = EstudianteFilter
     search_fields = ['nombre_completo', 'carnet_universitario', 'ci', 'carrera']
-    pagination_class = None
+    pagination_class = OrdenNaturalCursorPagination
+    renderer_classes = RENDERIZADORES_LISTA
 
 
-class PrestamoViewSet(viewsets.ModelViewSet):
+class PrestamoViewSet(ListaLigeraMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar préstamos de libros y tesis.
     Implementa reglas de negocio avanzadas:
@@ -558,7 +827,20 @@ class PrestamoViewSet(viewsets.ModelViewSet):
     - Prevención de doble préstamo
     - Conversión automática de SALA → DOMICILIO para el mismo estudiante
     """
-    queryset = Prestamo.objects.all().order_by('-fecha_prestamo')
+    cursor_ordering = ('-fecha_prestamo', '-pk')
+    # Detalle y respuestas de escritura: activo, estudiante y usuario en el mismo JOIN
+    queryset = Prestamo.objects.select_related('activo', 'estudiante', 'usuario_prestamo').order_by(*cursor_ordering)
+    # La lista lee los datos relacionados como columnas del JOIN (una sola consulta)
+    anotaciones_lista = {
+        'activo_titulo': F('activo__titulo'),
+        'activo_codigo': F('activo__codigo_nuevo'),
+        'activo_tipo': F('activo__tipo_activo'),
+        'estudiante_nombre': F('estudiante__nombre_completo'),
+        'estudiante_carnet': F('estudiante__carnet_universitario'),
+        'estudiante_carrera': F('estudiante__carrera'),
+        'usuario_nombre': F('usuario_prestamo__username'),
+    }
+    acciones_anotadas = ()
     serializer_class = PrestamoSerializer
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = [
@@ -571,15 +853,14 @@ class PrestamoViewSet(viewsets.ModelViewSet):
         'estado': ['exact'],
         'tipo': ['exact'],
     }
-    pagination_class = None
+    pagination_class = OrdenNaturalCursorPagination
+    renderer_classes = RENDERIZADORES_LISTA
 
-    def create(self, request, *args, **kwargs):
+    def resolver_estudiante(self, data):
         """
-        Creación inteligente de préstamos con reglas de negocio avanzadas.
+        Auto-registro inteligente: devuelve el id del estudiante enviado o, si no
+        viene, el del estudiante con `nuevo_ci` (creándolo con `nuevo_nombre`).
         """
-        data = request.data.copy()
-        
-        # --- 1. AUTO-REGISTRO INTELIGENTE DE ESTUDIANTE ---
         estudiante_id = data.get('estudiante')
         
         # Si no viene ID, intentamos buscar por CI o crear nuevo
@@ -608,55 +889,103 @@ class PrestamoViewSet(viewsets.ModelViewSet):
                     estudiante_id = estudiante.id
                 
                 data['estudiante'] = estudiante_id
+        return estudiante_id
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creación inteligente de préstamos con reglas de negocio avanzadas.
+        """
+        data = request.data.copy()
+        
+        # --- 1. AUTO-REGISTRO INTELIGENTE DE ESTUDIANTE ---
+        estudiante_id = self.resolver_estudiante(data)
         
         # --- 2. REGLAS DE NEGOCIO: PREVENIR DOBLE PRÉSTAMO ---
         activo_id = data.get('activo')
         tipo_nuevo = data.get('tipo')
         
-        # Buscar si el libro ya está prestado y vigente
-        prestamo_actual = Prestamo.objects.filter(
-            activo_id=activo_id,
-            estado='VIGENTE'
-        ).first()
-        
-        if prestamo_actual:
-            # CASO ESPECIAL: ¿Es el mismo estudiante cambiando de SALA a DOMICILIO?
-            es_mismo_estudiante = int(prestamo_actual.estudiante.id) == int(estudiante_id)
-            es_cambio_sala_a_domicilio = prestamo_actual.tipo == 'SALA' and tipo_nuevo == 'DOMICILIO'
-            
-            if es_mismo_estudiante and es_cambio_sala_a_domicilio:
-                # ✅ Cerrar automáticamente el préstamo en SALA
-                prestamo_actual.estado = 'DEVUELTO'
-                prestamo_actual.fecha_devolucion_real = timezone.now()
-                obs_adicional = " [Auto-cerrado: Cambio a Domicilio]"
-                prestamo_actual.observaciones = (prestamo_actual.observaciones or '') + obs_adicional
-                prestamo_actual.save()
-                # Permitir continuar con la creación del nuevo préstamo
-            else:
-                # Bloquear: El libro está ocupado por otro estudiante
-                # Determinar el mensaje según el tipo de préstamo
-                if prestamo_actual.tipo == 'SALA':
-                    estado_texto = "está siendo usado en sala de lectura"
-                else:
-                    estado_texto = "fue prestado a domicilio"
-                
-                return Response(
-                    {
-                        "error": f"Libro no disponible: {estado_texto}",
-                        "detalle": f"El libro '{prestamo_actual.activo.titulo}' {estado_texto}",
-                        "tipo_prestamo": prestamo_actual.tipo,
-                        "estudiante": prestamo_actual.estudiante.nombre_completo
-                    },
-                    status=400
+        # La restricción prestamo_activo_unico garantiza un solo préstamo sin devolver
+        # por activo aunque dos mostradores registren a la vez: el que pierde la carrera
+        # recibe el mismo 400 que si el libro ya estuviera prestado.
+        try:
+            with circulacion.transaccion_prestamo():
+                # Buscar si el libro ya está prestado (vigente o atrasado), bloqueando esa fila
+                prestamo_actual = (
+                    Prestamo.objects.select_for_update(of=('self',))
+                    .select_related('activo', 'estudiante')
+                    .filter(activo_id=activo_id, estado__in=disponibilidad.ESTADOS_PRESTADO)
+                    .first()
                 )
-        
-        # Continuar con la creación normal
-        serializer = self.get_serializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+                
+                if prestamo_actual:
+                    # CASO ESPECIAL: ¿Es el mismo estudiante cambiando de SALA a DOMICILIO?
+                    es_mismo_estudiante = int(prestamo_actual.estudiante_id) == int(estudiante_id)
+                    es_cambio_sala_a_domicilio = prestamo_actual.tipo == 'SALA' and tipo_nuevo == 'DOMICILIO'
+                    
+                    if not (es_mismo_estudiante and es_cambio_sala_a_domicilio):
+                        # Bloquear: El libro está ocupado por otro estudiante
+                        return self.respuesta_no_disponible(prestamo_actual)
+                    
+                    # ✅ Cerrar automáticamente el préstamo en SALA (la fila sigue bloqueada
+                    # hasta crear el nuevo, así dos conversiones simultáneas no se pisan)
+                    prestamo_actual.estado = 'DEVUELTO'
+                    prestamo_actual.fecha_devolucion_real = timezone.now()
+                    obs_adicional = " [Auto-cerrado: Cambio a Domicilio]"
+                    prestamo_actual.observaciones = (prestamo_actual.observaciones or '') + obs_adicional
+                    prestamo_actual.save()
+                    eventos.publicar_evento(eventos.DEVUELTO, prestamo_actual)
+                    estadisticas.sumar_devoluciones([prestamo_actual])
+                    # Permitir continuar con la creación del nuevo préstamo
+                
+                # Continuar con la creación normal
+                serializer = self.get_serializer(data=data)
+                serializer.is_valid(raise_exception=True)
+                self.perform_create(serializer)
+        except IntegrityError:
+            # Otro mostrador prestó el mismo activo entre la consulta y el INSERT
+            prestamo_actual = (
+                Prestamo.objects.select_related('activo', 'estudiante')
+                .filter(activo_id=activo_id, estado__in=disponibilidad.ESTADOS_PRESTADO)
+                .first()
+            )
+            if prestamo_actual is None:
+                raise
+            return self.respuesta_no_disponible(prestamo_actual)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=201, headers=headers)
 
+    @action(detail=False, methods=['get'])
+    def vencimientos(self, request):
+        """
+        Préstamos atrasados y por vencer en las próximas ?horas=24, ordenados por
+        fecha límite, con las mismas columnas que la lista (ver vencimientos.py).
+        """
+        try:
+            horas = max(0, min(int(request.query_params.get('horas', 24)), 24 * 30))
+        except (TypeError, ValueError):
+            raise ValidationError({'horas': 'Debe ser un número entero de horas.'})
+        filas = FilasSerializer.para(self.get_serializer_class())
+        campos = filas.campos_solicitados(request)
+        atrasados, por_vencer = vencimientos.vencimientos(horas)
+        return Response({
+            'atrasados': filas.serializar(self.valores_lista(atrasados, campos), campos),
+            'por_vencer': filas.serializar(self.valores_lista(por_vencer, campos), campos),
+        })
+
+    def respuesta_no_disponible(self, prestamo_actual):
+        # Determinar el mensaje según el tipo de préstamo
+        estado_texto = circulacion.texto_estado(prestamo_actual)
+        
+        return Response(
+            {
+                "error": f"Libro no disponible: {estado_texto}",
+                "detalle": f"El libro '{prestamo_actual.activo.titulo}' {estado_texto}",
+                "tipo_prestamo": prestamo_actual.tipo,
+                "estudiante": prestamo_actual.estudiante.nombre_completo
+            },
+            status=400
+        )
+
     def perform_create(self, serializer):
         """
         Validar reglas de negocio al crear un préstamo.
@@ -672,29 +1001,125 @@ class PrestamoViewSet(viewsets.ModelViewSet):
             })
 
         # Asignar usuario que registra el préstamo
-        serializer.save(usuario_prestamo=self.request.user)
+        prestamo = serializer.save(usuario_prestamo=self.request.user)
+        eventos.publicar_evento(eventos.PRESTADO, prestamo)
+        estadisticas.sumar_prestamos([prestamo])
 
     @action(detail=True, methods=['post'])
     def devolver(self, request, pk=None):
         """
         Acción personalizada para marcar un libro como devuelto.
         """
-        prestamo = self.get_object()
-        
-        if prestamo.estado == 'DEVUELTO':
-            return Response(
-                {'error': 'Este material ya fue devuelto'},
-                status=400
-            )
-        
-        prestamo.estado = 'DEVUELTO'
-        prestamo.fecha_devolucion_real = timezone.now()
-        prestamo.save()
+        # get_object() aplica permisos y 404; la fila se vuelve a leer bloqueada para que dos
+        # devoluciones simultáneas no cuenten dos veces en el resumen ni publiquen dos eventos
+        pk = self.get_object().pk
+        with circulacion.transaccion_prestamo():
+            prestamo = Prestamo.objects.select_for_update().get(pk=pk)
+            if prestamo.estado == 'DEVUELTO':
+                return Response(
+                    {'error': 'Este material ya fue devuelto'},
+                    status=400
+                )
+            
+            prestamo.estado = 'DEVUELTO'
+            prestamo.fecha_devolucion_real = timezone.now()
+            prestamo.save()
+            eventos.publicar_evento(eventos.DEVUELTO, prestamo)
+            estadisticas.sumar_devoluciones([prestamo])
         
         # Mensaje según el tipo de garantía
-        if prestamo.tipo == 'SALA':
-            mensaje = 'Material devuelto exitosamente. Entregar Carnet Universitario al estudiante.'
-        else:
-            mensaje = 'Material devuelto exitosamente. Entregar Cédula de Identidad al estudiante.'
-        
-        return Response({'mensaje': mensaje})
+        return Response({'mensaje': circulacion.mensaje_devolucion(prestamo)})
+
+    def lista_del_lote(self, data, campo, convertir):
+        """Lista de ítems `campo` del lote (vacía si no viene), convertida con `convertir`"""
+        valores = data.get(campo) or []
+        try:
+            if not isinstance(valores, list):
+                raise TypeError
+            return [convertir(valor) for valor in valores]
+        except (TypeError, ValueError):
+            raise ValidationError({campo: 'Debe ser una lista de valores válidos.'})
+
+    def validar_tamano_lote(self, *listas):
+        total = sum(len(lista) for lista in listas)
+        if not total:
+            raise ValidationError({'error': 'El lote está vacío.'})
+        if total > circulacion.LIMITE_LOTE:
+            raise ValidationError({'error': f'Como máximo {circulacion.LIMITE_LOTE} ítems por lote.'})
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Préstamo en lote: {estudiante (o nuevo_ci/nuevo_nombre), tipo, codigos: [...], activos: [ids]}.
+        Una sola transacción; responde un resultado por ítem (ver circulacion.py).
+        """
+        data = request.data.copy()
+        codigos = self.lista_del_lote(data, 'codigos', lambda codigo: str(codigo).strip())
+        activos = self.lista_del_lote(data, 'activos', int)
+        self.validar_tamano_lote(codigos, activos)
+        tipo = data.get('tipo')
+        if tipo not in dict(Prestamo.TIPO_CHOICES):
+            raise ValidationError({'tipo': f"Opciones: {', '.join(dict(Prestamo.TIPO_CHOICES))}"})
+        try:
+            estudiante = Estudiante.objects.filter(pk=int(self.resolver_estudiante(data))).first()
+        except (TypeError, ValueError):
+            estudiante = None
+        if estudiante is None:
+            raise ValidationError({'estudiante': 'Indique un estudiante existente o su CI y nombre.'})
+
+        resultados = circulacion.prestar_lote(
+            estudiante, tipo, request.user, codigos=codigos, activos=activos,
+            observaciones=data.get('observaciones') or None,
+        )
+        return Response({
+            'estudiante': estudiante.nombre_completo,
+            'prestados': sum(resultado['ok'] for resultado in resultados),
+            'resultados': resultados,
+        })
+
+    @action(detail=False, methods=['post'], url_path='devolver-lote')
+    def devolver_lote(self, request):
+        """Devolución en lote: {prestamos: [ids]}; un resultado por préstamo"""
+        ids = self.lista_del_lote(request.data, 'prestamos', int)
+        self.validar_tamano_lote(ids)
+        resultados = circulacion.devolver_lote(ids, request.user)
+        return Response({
+            'devueltos': sum(resultado['ok'] for resultado in resultados),
+            'resultados': resultados,
+        })
+
+
+# Endpoints públicos de disponibilidad para el kiosco
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def activos_prestados_publico(request):
+    """
+    Ids de activos prestados (vigentes o atrasados). ?codificacion=rle|bitmap para
+    una respuesta compacta. El conjunto está en caché por versión de préstamos:
+    entre cambios solo se lee la versión, y con If-None-Match se responde 304.
+    """
+    version = versiones.versiones_actuales(PRESTAMOS)[PRESTAMOS]
+    etag = versiones.etag_de(request, (PRESTAMOS,), {PRESTAMOS: version})
+    if versiones.coincide(request, etag):
+        return versiones.marcar(versiones.no_modificado(), etag)
+    codificacion = request.query_params.get('codificacion', 'lista')
+    if codificacion not in disponibilidad.CODIFICACIONES:
+        raise ValidationError({'codificacion': f"Opciones: {', '.join(disponibilidad.CODIFICACIONES)}"})
+    ids = disponibilidad.ids_prestados(version)
+    return versiones.marcar(Response(disponibilidad.codificar(ids, codificacion, version)), etag)
+
+
+@require_GET
+def eventos_prestados_publico(request):
+    """
+    Stream SSE (text/event-stream) con la disponibilidad para el kiosco: una foto
+    inicial y luego solo los préstamos y devoluciones (ver eventos.py).
+    Es una vista de Django y no de DRF porque EventSource pide text/event-stream.
+    """
+    respuesta = StreamingHttpResponse(
+        eventos.stream_prestamos(limite=settings.EVENTOS_STREAMS_POR_PROCESO), content_type='text/event-stream',
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    # Que nginx/Render no acumulen el stream en un buffer
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta